@@ -1,10 +1,8 @@
 import streamlit as st
-import pandas as pd
-import numpy as np
 import os
-import io
 from datetime import datetime
-import base64
+import importlib
+import logging
 import sys
 
 # Конфигурация страницы
@@ -20,62 +18,174 @@ try:
 except NameError:
     BASE_DIR = os.getcwd()
 
-# Отладочная информация
-with st.sidebar:
-    with st.expander("Отладочная информация"):
-        st.write("Текущая директория:", os.getcwd())
-        try:
-            st.write("Содержимое директории:", os.listdir())
-            st.write("BASE_DIR:", BASE_DIR)
-            
-            attached_assets_path = os.path.join(BASE_DIR, "attached_assets")
-            if os.path.exists(attached_assets_path):
-                st.write("Содержимое attached_assets:", os.listdir(attached_assets_path))
-            else:
-                st.write("Папка attached_assets не найдена")
-        except Exception as e:
-            st.write("Ошибка при доступе к файлам:", str(e))
+# Структурированные логи (в том числе длительности этапов из timing.py)
+logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(message)s")
 
 # Добавление пути к текущей директории для импорта
 sys.path.append(BASE_DIR)
 
-# Импорт модулей
+from assets import get_asset_manifest
+from timing import StageTimer
+
+# Манифест статических файлов и логотипы в памяти (строится один раз на процесс)
+asset_manifest = get_asset_manifest()
+
+# Отладочная информация; время выгрузок добавляется в панель в конце скрипта
+debug_panel = st.sidebar.expander("Отладочная информация")
+with debug_panel:
+    st.write("Текущая директория:", os.getcwd())
+    st.write("BASE_DIR:", BASE_DIR)
+    st.write("Содержимое директории:", ", ".join(asset_manifest.project_files))
+    if asset_manifest.asset_files:
+        st.write(f"Файлов в attached_assets: {len(asset_manifest.asset_files)}, "
+                 f"логотипов загружено: {len(asset_manifest.logos)}")
+    else:
+        st.write("Папка attached_assets не найдена или пуста")
+    if asset_manifest.missing_logos:
+        st.write("Не найдены логотипы:", ", ".join(asset_manifest.missing_logos.values()))
+
+# Отложенный импорт модулей обработки
+def lazy_function(module_name, function_name):
+    """
+    Возвращает функцию, которая импортирует модуль при первом вызове.
+    Тяжелые зависимости (pandas, openpyxl, fuzzywuzzy) загружаются только
+    тогда, когда выполняется этап, которому они нужны, а не при старте страницы.
+    """
+    def call(*args, **kwargs):
+        return getattr(importlib.import_module(module_name), function_name)(*args, **kwargs)
+    call.__name__ = function_name
+    return call
+
+convert_table_format = lazy_function("utils", "convert_table_format")
+align_columns_to_marketplace = lazy_function("utils", "align_columns_to_marketplace")
+read_uploaded_table = lazy_function("upload_cache", "read_uploaded_table")
+dataframe_to_excel_bytes = lazy_function("excel_writer", "dataframe_to_excel_bytes")
+convert_frame_to_bytes = lazy_function("stream_convert", "convert_frame_to_bytes")
+convert_to_all_file = lazy_function("fanout_convert", "convert_to_all_file")
+locate_template = lazy_function("template_fill", "locate_template")
+map_to_template = lazy_function("template_fill", "map_to_template")
+preview_template_fill = lazy_function("template_fill", "preview_template_fill")
+fill_template_bytes = lazy_function("template_fill", "fill_template_bytes")
+
+# Длительности этапов замеряются в каждом запуске фрагмента таба (см. ниже);
+# выгрузки выполняются по нажатию кнопки (иногда в отдельном потоке),
+# поэтому их время копится в таймере сессии
+if "export_timer" not in st.session_state:
+    st.session_state["export_timer"] = StageTimer()
+export_timer = st.session_state["export_timer"]
+
+XLSX_MIME = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+ZIP_MIME = "application/zip"
+
+# Начиная с этого размера таблица конвертируется по частям при скачивании:
+# в сессии хранится только превью, а не вся конвертированная таблица
+STREAMING_MIN_ROWS = 100000
+PREVIEW_ROWS = 5
+
+# Новые версии Streamlit умеют формировать файл только при нажатии кнопки скачивания
 try:
-    from marketplace_detection import detect_marketplace
-    from utils import convert_table_format
-    st.sidebar.success("Модули успешно импортированы")
-except Exception as e:
-    st.sidebar.error(f"Ошибка импорта модулей: {str(e)}")
-
-# Функция для создания ссылки скачивания
-def create_download_link(df, filename):
-    """Создает ссылку для скачивания DataFrame как Excel-файла"""
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False)
-    excel_data = output.getvalue()
-    b64 = base64.b64encode(excel_data).decode()
-    href = f'<a href="data:application/vnd.openxmlformats-officedocument.spreadsheetml.sheet;base64,{b64}" download="{filename}">Скачать файл</a>'
-    return href
+    from streamlit.runtime.media_file_manager import MediaFileManager
+    DEFERRED_DOWNLOADS = hasattr(MediaFileManager, "add_deferred")
+except ImportError:
+    DEFERRED_DOWNLOADS = False
+
+# Функция для отображения кнопки скачивания
+def show_download_button(make_file, filename, key, rows, mime=XLSX_MIME):
+    """
+    Показывает кнопку скачивания Excel-файла.
+    Файл формируется функцией make_file только по запросу пользователя
+    и отдается как байты, без base64-ссылки в HTML страницы.
+    """
+    def export():
+        with export_timer.span("export", file=filename, rows=rows):
+            return make_file()
+    
+    if DEFERRED_DOWNLOADS:
+        st.download_button(
+            "Скачать файл",
+            data=export,
+            file_name=filename,
+            mime=mime,
+            on_click="ignore",
+            key=key
+        )
+    elif st.button("Подготовить файл для скачивания", key=f"prepare_{key}"):
+        st.download_button(
+            "Скачать файл",
+            data=export(),
+            file_name=filename,
+            mime=mime,
+            key=key
+        )
+
+# Функция для отображения результата конвертации
+def show_conversion_result(result_key, digest, target_marketplace):
+    """Показывает сохраненный в сессии результат конвертации и кнопку скачивания"""
+    result = st.session_state.get(result_key)
+    if not result or result["digest"] != digest or result["target"] != target_marketplace:
+        return
+    
+    # Отображаем результат
+    st.subheader("Предварительный просмотр конвертированных данных")
+    st.dataframe(result["df"].head(PREVIEW_ROWS))
+    
+    stream = result.get("stream")
+    if stream is not None:
+        st.success(f"Таблица будет конвертирована потоково при скачивании ({result['rows']} строк)")
+        make_file = lambda: convert_frame_to_bytes(stream["df"], result["target"], **stream["options"])
+    else:
+        st.success("Таблица успешно конвертирована!")
+        make_file = lambda: dataframe_to_excel_bytes(result["df"])
+    
+    show_download_button(make_file, result["filename"], key=f"download_{result_key}", rows=result["rows"])
+
+# Функция для отображения архива со всеми форматами
+def show_fanout_result(result_key, digest, df):
+    """Показывает кнопку скачивания ZIP-архива с таблицей во всех целевых форматах"""
+    result = st.session_state.get(result_key)
+    if not result or result["digest"] != digest:
+        return
+    
+    st.success(f"Форматы для архива: {', '.join(result['targets'])}")
+    make_file = lambda: convert_to_all_file(df, result["source"], targets=result["targets"],
+                                            column_mapping=result["column_mapping"])
+    show_download_button(make_file, result["filename"], key=f"download_{result_key}", rows=len(df), mime=ZIP_MIME)
+
+# Функция для заполнения шаблона маркетплейса
+def show_template_fill(template_file, df, marketplace, timer):
+    """
+    Сопоставляет колонки таблицы с загруженным шаблоном, показывает просмотр
+    и кнопку скачивания заполненного шаблона (он формируется при скачивании)
+    """
+    template_data = template_file.getvalue()
+    with timer.span("template", tab=marketplace, file=template_file.name):
+        sheet_name, header_row = locate_template(template_data)
+        column_mapping = map_to_template(df.columns, template_data, sheet_name, header_row)
+    
+    if not column_mapping:
+        st.warning("Ни одна колонка таблицы не сопоставлена с заголовками шаблона")
+        return
+    
+    st.write(f"Лист шаблона: {sheet_name}, строка заголовков: {header_row}")
+    st.dataframe({
+        "Колонка файла": [str(col) for col in column_mapping],
+        "Колонка шаблона": list(column_mapping.values())
+    })
+    st.dataframe(preview_template_fill(df, template_data, sheet_name, header_row, column_mapping))
+    
+    filename = f"{os.path.splitext(template_file.name)[0]}_filled.xlsx"
+    make_file = lambda: fill_template_bytes(df, template_data, column_mapping, sheet_name, header_row)
+    show_download_button(make_file, filename, key=f"download_template_{marketplace}", rows=len(df))
 
 # Функция для отображения логотипа
 def show_logo(marketplace):
     try:
-        logo_map = {
-            "Ozon": "ozon.png",
-            "Wildberries": "wildberries.png",
-            "ЛеманПро": "lemanpro.png",
-            "Яндекс.Маркет": "yandex-market.png",
-            "Все инструменты": "vse-instrumenty.png",
-            "СберМегаМаркет": "sbermegamarket.png"
-        }
-        
-        if marketplace in logo_map:
-            logo_path = os.path.join(BASE_DIR, "attached_assets", logo_map[marketplace])
-            if os.path.exists(logo_path):
-                st.image(logo_path, width=100)
-            else:
-                st.write(f"Логотип {marketplace} не найден по пути: {logo_path}")
+        # Логотип берется из памяти, без обращения к диску
+        logo = asset_manifest.logos.get(marketplace)
+        if logo is not None:
+            st.image(logo, width=100)
+        elif marketplace in asset_manifest.missing_logos:
+            st.write(f"Логотип {marketplace} не найден по пути: {asset_manifest.missing_logos[marketplace]}")
     except Exception as e:
         st.write(f"Ошибка при отображении логотипа: {str(e)}")
 
@@ -86,76 +196,159 @@ st.write("Инструмент для работы с таблицами тов
 # Создаем табы для разных маркетплейсов
 marketplaces = ["Ozon", "Wildberries", "ЛеманПро", "Яндекс.Маркет", "Все инструменты", "СберМегаМаркет"]
 
+# Функция для отображения длительности этапов таба
+def show_stage_times(timer):
+    """Показывает длительности этапов последнего запуска конвейера таба"""
+    if not timer.spans:
+        return
+    with st.expander(f"Время этапов (запуск {timer.run_id}, всего {timer.total_ms()} мс)"):
+        st.dataframe(timer.records())
+
+# Конвейер каждого таба - отдельный фрагмент: при изменении его виджетов
+# перезапускается только он, а не все табы (в старых версиях Streamlit
+# без фрагментов функция выполняется как обычно)
+fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None) or (lambda func: func)
+
+@fragment
+def render_marketplace_pipeline(marketplace):
+    """
+    Конвейер таба со своим таймером этапов. Таблица времени выводится внутри
+    фрагмента, поэтому обновляется и при перезапуске одного фрагмента, когда
+    остальная страница (включая боковую панель) не перерисовывается.
+    """
+    timer = StageTimer()
+    try:
+        run_marketplace_pipeline(marketplace, timer)
+    finally:
+        show_stage_times(timer)
+
+def run_marketplace_pipeline(marketplace, timer):
+    """
+    Загрузка, определение формата, сопоставление колонок и конвертация для одного таба.
+    Результаты тяжелых этапов берутся из кэша загрузки, поэтому полный перезапуск
+    скрипта не повторяет их для уже обработанных файлов.
+    """
+    # Показываем логотип
+    show_logo(marketplace)
+    
+    # Загрузка файла
+    uploaded_file = st.file_uploader(f"Загрузите таблицу товаров {marketplace}", type=["xlsx", "xls"], key=f"upload_{marketplace}")
+    
+    if uploaded_file is None:
+        return
+    
+    try:
+        # Определение формата и чтение Excel-файла (результат кэшируется по хэшу
+        # содержимого; этапы detect и read замеряются только при разборе файла)
+        cached_upload = read_uploaded_table(uploaded_file, timer=timer, tab=marketplace, file=uploaded_file.name)
+        df = cached_upload["df"]
+        
+        if df.empty:
+            st.warning("Загруженный файл не содержит данных")
+            return
+        
+        # Отображаем первые строки
+        st.subheader("Предварительный просмотр данных")
+        if "preview" not in cached_upload:
+            cached_upload["preview"] = df.head()
+        st.dataframe(cached_upload["preview"])
+        
+        # Маркетплейс определен при чтении по первым строкам листов файла
+        detected_marketplace = cached_upload["detected_marketplace"]
+        if detected_marketplace:
+            st.success(f"Обнаружен формат маркетплейса: {detected_marketplace}")
+        else:
+            st.warning("Не удалось определить формат маркетплейса")
+            detected_marketplace = marketplace
+        
+        # Сопоставляем колонки файла с ожидаемыми колонками формата
+        column_mappings = cached_upload.setdefault("column_mappings", {})
+        if detected_marketplace not in column_mappings:
+            with timer.span("align", tab=marketplace, marketplace=detected_marketplace):
+                column_mappings[detected_marketplace] = align_columns_to_marketplace(df.columns, detected_marketplace)
+        proposed_mapping = column_mappings[detected_marketplace]
+        # Нечеткое сопоставление может ошибиться, поэтому переименования
+        # применяются к конвертации только после подтверждения пользователем
+        column_mapping = None
+        if proposed_mapping:
+            with st.expander("Автоматическое сопоставление колонок"):
+                st.dataframe({
+                    "Колонка файла": [str(col) for col in proposed_mapping],
+                    "Колонка формата": list(proposed_mapping.values())
+                })
+                if st.checkbox("Применить это сопоставление при конвертации", value=False,
+                               key=f"apply_mapping_{marketplace}"):
+                    column_mapping = proposed_mapping
+        
+        # Конвертация
+        st.subheader("Конвертация формата таблицы")
+        target_formats = [m for m in marketplaces if m != detected_marketplace]
+        
+        target_marketplace = st.selectbox(
+            "Выберите целевой формат для конвертации:", 
+            target_formats,
+            key=f"target_{marketplace}"
+        )
+        
+        result_key = f"converted_{marketplace}"
+        if st.button("Конвертировать", key=f"convert_{marketplace}"):
+            with st.spinner("Выполняется конвертация..."):
+                try:
+                    # Конвертируем таблицу; результат сохраняется в сессии, чтобы
+                    # скачивание не требовало повторной конвертации. Большие таблицы
+                    # конвертируются по частям при скачивании из уже прочитанной
+                    # таблицы кэша (файл повторно не разбирается), здесь - только превью
+                    streaming = len(df) >= STREAMING_MIN_ROWS
+                    source_df = df.head(PREVIEW_ROWS) if streaming else df
+                    with timer.span("convert", tab=marketplace, source=detected_marketplace,
+                                    target=target_marketplace, rows=len(source_df)):
+                        converted_df = convert_table_format(source_df, detected_marketplace, target_marketplace, column_mapping)
+                    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+                    st.session_state[result_key] = {
+                        "digest": cached_upload["digest"],
+                        "target": target_marketplace,
+                        "df": converted_df,
+                        "rows": len(df),
+                        "stream": {
+                            "df": df,
+                            "options": {"source_marketplace": detected_marketplace, "column_mapping": column_mapping},
+                        } if streaming else None,
+                        "filename": f"converted_{detected_marketplace}_to_{target_marketplace}_{timestamp}.xlsx",
+                    }
+                except Exception as e:
+                    st.error(f"Ошибка конвертации: {str(e)}")
+        
+        show_conversion_result(result_key, cached_upload["digest"], target_marketplace)
+        
+        # Все форматы одним архивом: исходная таблица типизируется один раз,
+        # форматы строятся из нее параллельно при скачивании
+        fanout_key = f"converted_all_{marketplace}"
+        if st.button("Конвертировать во все форматы", key=f"convert_all_{marketplace}"):
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            st.session_state[fanout_key] = {
+                "digest": cached_upload["digest"],
+                "source": detected_marketplace,
+                "targets": target_formats,
+                "column_mapping": column_mapping,
+                "filename": f"converted_{detected_marketplace}_all_formats_{timestamp}.zip",
+            }
+        show_fanout_result(fanout_key, cached_upload["digest"], df)
+        
+        # Перенос данных таблицы в шаблон маркетплейса с сохранением его оформления
+        with st.expander("Заполнить шаблон маркетплейса"):
+            template_file = st.file_uploader("Загрузите шаблон", type=["xlsx"], key=f"template_{marketplace}")
+            if template_file is not None:
+                show_template_fill(template_file, df, marketplace, timer)
+    except Exception as e:
+        st.error(f"Ошибка при обработке файла: {str(e)}")
+
 try:
     tabs = st.tabs(marketplaces)
     
     # Обработка для каждого таба
-    for i, tab in enumerate(tabs):
+    for marketplace, tab in zip(marketplaces, tabs):
         with tab:
-            marketplace = marketplaces[i]
-            
-            # Показываем логотип
-            show_logo(marketplace)
-            
-            # Загрузка файла
-            uploaded_file = st.file_uploader(f"Загрузите таблицу товаров {marketplace}", type=["xlsx", "xls"], key=f"upload_{marketplace}")
-            
-            if uploaded_file is not None:
-                try:
-                    # Чтение Excel-файла
-                    df = pd.read_excel(uploaded_file)
-                    
-                    if df.empty:
-                        st.warning("Загруженный файл не содержит данных")
-                    else:
-                        # Отображаем первые строки
-                        st.subheader("Предварительный просмотр данных")
-                        st.dataframe(df.head())
-                        
-                        # Определяем маркетплейс
-                        try:
-                            detected_marketplace = detect_marketplace(df)
-                            if detected_marketplace:
-                                st.success(f"Обнаружен формат маркетплейса: {detected_marketplace}")
-                            else:
-                                st.warning("Не удалось определить формат маркетплейса")
-                                detected_marketplace = marketplace
-                        except Exception as e:
-                            st.warning(f"Ошибка при определении маркетплейса: {str(e)}")
-                            detected_marketplace = marketplace
-                        
-                        # Конвертация
-                        st.subheader("Конвертация формата таблицы")
-                        target_formats = [m for m in marketplaces if m != detected_marketplace]
-                        
-                        target_marketplace = st.selectbox(
-                            "Выберите целевой формат для конвертации:", 
-                            target_formats,
-                            key=f"target_{marketplace}"
-                        )
-                        
-                        if st.button("Конвертировать", key=f"convert_{marketplace}"):
-                            with st.spinner("Выполняется конвертация..."):
-                                try:
-                                    # Конвертируем таблицу
-                                    converted_df = convert_table_format(df, detected_marketplace, target_marketplace)
-                                    
-                                    # Отображаем результат
-                                    st.subheader("Предварительный просмотр конвертированных данных")
-                                    st.dataframe(converted_df.head())
-                                    
-                                    # Создаем ссылку для скачивания
-                                    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                                    converted_filename = f"converted_{detected_marketplace}_to_{target_marketplace}_{timestamp}.xlsx"
-                                    download_link = create_download_link(converted_df, converted_filename)
-                                    
-                                    if download_link:
-                                        st.markdown(download_link, unsafe_allow_html=True)
-                                        st.success(f"Таблица успешно конвертирована!")
-                                except Exception as e:
-                                    st.error(f"Ошибка конвертации: {str(e)}")
-                except Exception as e:
-                    st.error(f"Ошибка при обработке файла: {str(e)}")
+            render_marketplace_pipeline(marketplace)
 
 except Exception as e:
     # Если не удалось создать табы, используем альтернативный интерфейс
@@ -163,65 +356,7 @@ except Exception as e:
     
     # Выбор маркетплейса через радио-кнопки
     marketplace = st.radio("Выберите маркетплейс:", marketplaces)
-    
-    # Показываем логотип
-    show_logo(marketplace)
-    
-    # Загрузка файла
-    uploaded_file = st.file_uploader(f"Загрузите таблицу товаров {marketplace}", type=["xlsx", "xls"])
-    
-    if uploaded_file is not None:
-        try:
-            # Чтение Excel-файла
-            df = pd.read_excel(uploaded_file)
-            
-            if df.empty:
-                st.warning("Загруженный файл не содержит данных")
-            else:
-                # Отображаем первые строки
-                st.subheader("Предварительный просмотр данных")
-                st.dataframe(df.head())
-                
-                # Определяем маркетплейс
-                try:
-                    detected_marketplace = detect_marketplace(df)
-                    if detected_marketplace:
-                        st.success(f"Обнаружен формат маркетплейса: {detected_marketplace}")
-                    else:
-                        st.warning("Не удалось определить формат маркетплейса")
-                        detected_marketplace = marketplace
-                except Exception as e:
-                    st.warning(f"Ошибка при определении маркетплейса: {str(e)}")
-                    detected_marketplace = marketplace
-                
-                # Конвертация
-                st.subheader("Конвертация формата таблицы")
-                target_formats = [m for m in marketplaces if m != detected_marketplace]
-                
-                target_marketplace = st.selectbox("Выберите целевой формат для конвертации:", target_formats)
-                
-                if st.button("Конвертировать"):
-                    with st.spinner("Выполняется конвертация..."):
-                        try:
-                            # Конвертируем таблицу
-                            converted_df = convert_table_format(df, detected_marketplace, target_marketplace)
-                            
-                            # Отображаем результат
-                            st.subheader("Предварительный просмотр конвертированных данных")
-                            st.dataframe(converted_df.head())
-                            
-                            # Создаем ссылку для скачивания
-                            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                            converted_filename = f"converted_{detected_marketplace}_to_{target_marketplace}_{timestamp}.xlsx"
-                            download_link = create_download_link(converted_df, converted_filename)
-                            
-                            if download_link:
-                                st.markdown(download_link, unsafe_allow_html=True)
-                                st.success(f"Таблица успешно конвертирована!")
-                        except Exception as e:
-                            st.error(f"Ошибка конвертации: {str(e)}")
-        except Exception as e:
-            st.error(f"Ошибка при обработке файла: {str(e)}")
+    render_marketplace_pipeline(marketplace)
 
 # Информация о приложении
 with st.expander("О приложении"):
@@ -246,3 +381,9 @@ with st.expander("О приложении"):
     
     **Версия**: 1.0
     """)
+
+# Время выгрузок в отладочной панели (время этапов обработки - в каждом табе)
+with debug_panel:
+    if export_timer.spans:
+        st.write("Последние выгрузки:")
+        st.dataframe(export_timer.records())
@@ -0,0 +1,106 @@
+import os
+import unicodedata
+from dataclasses import dataclass, field
+from functools import lru_cache
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+ASSETS_DIR = os.path.join(BASE_DIR, "attached_assets")
+
+# Файлы логотипов маркетплейсов в attached_assets
+LOGO_FILES = {
+    "Ozon": "ozon.png",
+    "Wildberries": "wildberries.png",
+    "ЛеманПро": "Лемана про.png",
+    "Яндекс.Маркет": "Яндекс маркет.png",
+    "Все инструменты": "все инструменты.png",
+    "СберМегаМаркет": "сбермегамаркет.png",
+}
+
+TEMPLATE_EXTENSIONS = (".xlsx",)
+
+
+def _name_key(file_name):
+    # Имена с кириллицей бывают в разных нормальных формах Unicode и регистрах
+    return unicodedata.normalize("NFC", file_name).casefold()
+
+
+@dataclass(frozen=True)
+class AssetManifest:
+    """
+    Снимок статических файлов приложения, собранный один раз на процесс.
+
+    Логотипы хранятся в памяти, поэтому перезапуск скрипта Streamlit
+    не сканирует директории и не читает файлы с диска.
+    """
+
+    assets_dir: str
+    project_files: tuple
+    asset_files: tuple
+    logos: dict = field(default_factory=dict)
+    missing_logos: dict = field(default_factory=dict)
+
+    def asset_path(self, file_name):
+        return os.path.join(self.assets_dir, file_name)
+
+    @property
+    def template_files(self):
+        """Пути к Excel-шаблонам в attached_assets"""
+        return [self.asset_path(name) for name in self.asset_files if name.lower().endswith(TEMPLATE_EXTENSIONS)]
+
+
+def _list_files(directory):
+    try:
+        with os.scandir(directory) as entries:
+            return tuple(sorted(entry.name for entry in entries))
+    except OSError:
+        return ()
+
+
+def build_asset_manifest(assets_dir=ASSETS_DIR, project_dir=BASE_DIR, logo_files=None):
+    """
+    Сканирует директории и загружает логотипы в память
+
+    Args:
+        assets_dir: Директория со статическими файлами
+        project_dir: Корневая директория проекта
+        logo_files: Словарь {маркетплейс: имя файла логотипа}
+
+    Returns:
+        AssetManifest: Манифест статических файлов
+    """
+    logo_files = LOGO_FILES if logo_files is None else logo_files
+    asset_files = _list_files(assets_dir)
+    files_by_key = {_name_key(name): name for name in asset_files}
+
+    logos = {}
+    missing_logos = {}
+    for marketplace, file_name in logo_files.items():
+        actual_name = files_by_key.get(_name_key(file_name))
+        if actual_name is None:
+            missing_logos[marketplace] = os.path.join(assets_dir, file_name)
+            continue
+        with open(os.path.join(assets_dir, actual_name), "rb") as f:
+            logos[marketplace] = f.read()
+
+    return AssetManifest(
+        assets_dir=assets_dir,
+        project_files=_list_files(project_dir),
+        asset_files=asset_files,
+        logos=logos,
+        missing_logos=missing_logos,
+    )
+
+
+@lru_cache(maxsize=None)
+def get_asset_manifest(assets_dir=ASSETS_DIR, project_dir=BASE_DIR):
+    """
+    Возвращает манифест статических файлов (строится один раз на процесс)
+
+    Args:
+        assets_dir: Директория со статическими файлами
+        project_dir: Корневая директория проекта
+
+    Returns:
+        AssetManifest: Манифест статических файлов
+    """
+    return build_asset_manifest(assets_dir, project_dir)
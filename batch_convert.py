@@ -0,0 +1,203 @@
+"""
+Пакетная конвертация таблиц товаров без интерфейса Streamlit.
+
+Примеры:
+    python batch_convert.py supplier_files/ --target Ozon --workers 4
+    python batch_convert.py "incoming/*.xlsx" --target Wildberries --output-dir out
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from excel_writer import write_dataframe
+from upload_cache import read_table
+from utils import FULL_COLUMN_MAPS, convert_table_format
+
+# .xls требует xlrd, которого нет в зависимостях проекта
+EXCEL_EXTENSIONS = (".xlsx",)
+
+
+def collect_input_files(inputs):
+    """
+    Собирает список Excel-файлов из директорий, glob-шаблонов и путей
+
+    Args:
+        inputs: Список директорий, шаблонов или путей к файлам
+
+    Returns:
+        list: Отсортированный список путей без повторов
+    """
+    files = set()
+    for item in inputs:
+        if os.path.isdir(item):
+            candidates = [os.path.join(item, name) for name in os.listdir(item)]
+        else:
+            candidates = glob.glob(item)
+        for path in candidates:
+            # Временные файлы Excel (~$...) пропускаем
+            if os.path.isfile(path) and path.lower().endswith(EXCEL_EXTENSIONS) and not os.path.basename(path).startswith("~$"):
+                files.add(os.path.abspath(path))
+    return sorted(files)
+
+
+def output_path_for(path, target_marketplace, output_dir, input_root=None):
+    """
+    Путь результата для исходного файла
+
+    Структура поддиректорий относительно input_root повторяется в output_dir,
+    поэтому файлы с одинаковыми именами из разных директорий не перезаписывают
+    друг друга.
+
+    Args:
+        path: Путь к исходному файлу
+        target_marketplace: Целевой маркетплейс
+        output_dir: Директория для результатов
+        input_root: Общая директория исходных файлов (по умолчанию - директория файла)
+
+    Returns:
+        str: Путь к файлу результата
+    """
+    source_dir = os.path.dirname(os.path.abspath(path))
+    relative_dir = os.path.relpath(source_dir, input_root) if input_root else os.curdir
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return os.path.normpath(os.path.join(output_dir, relative_dir, f"{stem}_converted_to_{target_marketplace}.xlsx"))
+
+
+def convert_file(path, target_marketplace, output_dir, source_marketplace=None, input_root=None):
+    """
+    Конвертирует один файл: чтение, определение маркетплейса, конвертация, запись
+
+    Args:
+        path: Путь к исходному файлу
+        target_marketplace: Целевой маркетплейс
+        output_dir: Директория для результатов
+        source_marketplace: Исходный маркетплейс (если None - определяется автоматически)
+        input_root: Общая директория исходных файлов (см. output_path_for)
+
+    Returns:
+        dict: Запись для итогового отчета; статус "ok", "skipped", "unmapped"
+            (колонки не сопоставлены, файл не записан) или "error"
+    """
+    started = time.perf_counter()
+    result = {
+        "file": path,
+        "status": "ok",
+        "source": source_marketplace,
+        "target": target_marketplace,
+        "rows": 0,
+        "output": None,
+        "error": None,
+    }
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+        df, detected, _, _ = read_table(data)
+        result["rows"] = len(df)
+
+        if result["source"] is None:
+            result["source"] = detected
+        if result["source"] is None:
+            raise ValueError("Не удалось определить формат маркетплейса")
+
+        if result["source"] == target_marketplace:
+            result["status"] = "skipped"
+            result["error"] = "Файл уже в целевом формате"
+        else:
+            converted_df = convert_table_format(df, result["source"], target_marketplace)
+            if "conversion_info" in converted_df.columns:
+                # convert_table_format вернул исходную таблицу с пояснением вместо результата
+                result["status"] = "unmapped"
+                result["error"] = str(converted_df["conversion_info"].iloc[0]) if len(converted_df) else "Колонки не сопоставлены"
+            else:
+                output_path = output_path_for(path, target_marketplace, output_dir, input_root)
+                os.makedirs(os.path.dirname(output_path), exist_ok=True)
+                write_dataframe(converted_df, output_path)
+                result["output"] = output_path
+    except Exception as e:
+        result["status"] = "error"
+        result["error"] = str(e)
+
+    result["seconds"] = round(time.perf_counter() - started, 3)
+    return result
+
+
+def run_batch(files, target_marketplace, output_dir, workers=None, source_marketplace=None):
+    """
+    Конвертирует файлы параллельно в пуле процессов
+
+    Args:
+        files: Список путей к исходным файлам
+        target_marketplace: Целевой маркетплейс
+        output_dir: Директория для результатов
+        workers: Количество процессов (None - по числу ядер)
+        source_marketplace: Исходный маркетплейс для всех файлов (None - автоопределение)
+
+    Returns:
+        list: Записи отчета в порядке исходного списка файлов
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    input_root = os.path.commonpath([os.path.dirname(os.path.abspath(path)) for path in files]) if files else None
+    results = {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(convert_file, path, target_marketplace, output_dir, source_marketplace, input_root): path
+            for path in files
+        }
+        for future in as_completed(futures):
+            item = future.result()
+            results[futures[future]] = item
+            print(f"[{item['status']}] {os.path.basename(item['file'])} ({item['seconds']} с)", file=sys.stderr)
+    return [results[path] for path in files]
+
+
+def main(argv=None):
+    marketplaces = list(FULL_COLUMN_MAPS)
+    parser = argparse.ArgumentParser(description="Пакетная конвертация таблиц товаров между форматами маркетплейсов")
+    parser.add_argument("inputs", nargs="+", help="Директории, glob-шаблоны или пути к Excel-файлам")
+    parser.add_argument("--target", required=True, choices=marketplaces, help="Целевой маркетплейс")
+    parser.add_argument("--source", choices=marketplaces, help="Исходный маркетплейс (по умолчанию определяется автоматически)")
+    parser.add_argument("--output-dir", default="converted", help="Директория для результатов")
+    parser.add_argument("--workers", type=int, default=None, help="Количество процессов (по умолчанию - число ядер)")
+    parser.add_argument("--summary", default=None, help="Путь к JSON-отчету (по умолчанию <output-dir>/summary.json)")
+    args = parser.parse_args(argv)
+
+    files = collect_input_files(args.inputs)
+    if not files:
+        parser.error("Не найдено ни одного Excel-файла")
+
+    # Директория отчета создается до конвертации, чтобы не потерять отчет в конце запуска
+    summary_path = args.summary or os.path.join(args.output_dir, "summary.json")
+    summary_dir = os.path.dirname(os.path.abspath(summary_path))
+    try:
+        os.makedirs(summary_dir, exist_ok=True)
+    except OSError as e:
+        parser.error(f"Не удалось создать директорию отчета {summary_dir}: {e}")
+
+    started = time.perf_counter()
+    results = run_batch(files, args.target, args.output_dir, args.workers, args.source)
+
+    summary = {
+        "target": args.target,
+        "files": len(results),
+        "converted": sum(1 for item in results if item["status"] == "ok"),
+        "skipped": sum(1 for item in results if item["status"] == "skipped"),
+        "unmapped": sum(1 for item in results if item["status"] == "unmapped"),
+        "failed": sum(1 for item in results if item["status"] == "error"),
+        "seconds": round(time.perf_counter() - started, 3),
+        "results": results,
+    }
+    with open(summary_path, "w", encoding="utf-8") as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+
+    print(f"Готово: {summary['converted']} сконвертировано, {summary['skipped']} пропущено, "
+          f"{summary['unmapped']} без сопоставленных колонок, {summary['failed']} с ошибками. "
+          f"Отчет: {summary_path}", file=sys.stderr)
+    return 1 if summary["failed"] or summary["unmapped"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
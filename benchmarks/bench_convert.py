@@ -0,0 +1,82 @@
+"""
+Бенчмарк convert_table_format: время и пиковая память конвертации.
+
+Запуск:
+    python benchmarks/bench_convert.py --rows 100000
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import convert_table_format, get_marketplace_columns
+
+
+def make_catalog(marketplace, n_rows, seed=0):
+    """
+    Генерирует синтетический каталог с колонками указанного маркетплейса
+    
+    Args:
+        marketplace: Название маркетплейса
+        n_rows: Количество строк
+        seed: Зерно генератора случайных чисел
+        
+    Returns:
+        pd.DataFrame: Синтетический каталог
+    """
+    rng = np.random.default_rng(seed)
+    data = {}
+    for i, col in enumerate(get_marketplace_columns(marketplace)):
+        if i % 3 == 0:
+            data[col] = rng.integers(0, 100000, n_rows)
+        elif i % 3 == 1:
+            data[col] = rng.random(n_rows) * 1000
+        else:
+            data[col] = pd.Series(rng.integers(0, 1000, n_rows)).map("{}_значение".format).to_numpy(dtype=object)
+    return pd.DataFrame(data)
+
+
+def run(source, target, n_rows):
+    df = make_catalog(source, n_rows)
+    
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = convert_table_format(df, source, target)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    
+    # Строки объектных колонок не копируются, поэтому сравниваем
+    # пиковую память с размером самих массивов результата
+    output_bytes = int(result.memory_usage(index=False, deep=False).sum())
+    return {
+        "source": source,
+        "target": target,
+        "rows": n_rows,
+        "seconds": round(elapsed, 4),
+        "peak_bytes": peak,
+        "output_bytes": output_bytes,
+        "peak_to_output": round(peak / output_bytes, 2) if output_bytes else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк конвертации таблиц")
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--source", default="Ozon")
+    parser.add_argument("--target", default="Wildberries")
+    args = parser.parse_args()
+    
+    stats = run(args.source, args.target, args.rows)
+    for key, value in stats.items():
+        print(f"{key}: {value}")
+
+
+if __name__ == "__main__":
+    main()
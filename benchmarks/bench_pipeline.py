@@ -0,0 +1,206 @@
+"""
+Бенчмарк всего конвейера на синтетических каталогах: чтение Excel,
+определение маркетплейса, конвертация и выгрузка в XLSX замеряются отдельно.
+
+Каталоги строятся для всех схем из get_marketplace_columns. Результаты
+сохраняются в JSON; при сравнении с базовым файлом этапы, ставшие медленнее
+порога, считаются регрессией (код возврата 1). Если маркетплейс каталога
+определен неверно, запуск прерывается: такие замеры не с чем сравнивать.
+
+Запуск:
+    python benchmarks/bench_pipeline.py --sizes 1000 10000 --save benchmarks/baselines/pipeline.json
+    python benchmarks/bench_pipeline.py --sizes 1000 10000 --compare benchmarks/baselines/pipeline.json
+    python benchmarks/bench_pipeline.py --sizes 1000000 --marketplace Ozon --data-dir /tmp/catalogs
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_convert import make_catalog
+from excel_writer import resolve_backend, write_dataframe
+from marketplace_detection import detect_marketplace_from_file
+from utils import FULL_COLUMN_MAPS, convert_table_format
+
+DEFAULT_SIZES = (1000, 10000, 100000, 1000000)
+STAGES = ("read_excel", "detect", "convert", "export")
+
+# Регрессия - этап медленнее базового на 25% и не меньше чем на 50 мс
+DEFAULT_THRESHOLD = 0.25
+MIN_REGRESSION_SECONDS = 0.05
+
+
+def catalog_path(data_dir, marketplace, n_rows):
+    """
+    Возвращает путь к синтетическому каталогу, создавая файл при первом обращении
+
+    Args:
+        data_dir: Директория для сгенерированных файлов
+        marketplace: Название маркетплейса
+        n_rows: Количество строк
+
+    Returns:
+        str: Путь к XLSX-файлу
+    """
+    path = os.path.join(data_dir, f"{marketplace}_{n_rows}.xlsx")
+    if not os.path.exists(path):
+        write_dataframe(make_catalog(marketplace, n_rows), path)
+    return path
+
+
+def timed(func, *args, repeat=1, setup=None):
+    # Лучшее время из нескольких повторов и результат последнего запуска
+    best = None
+    result = None
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        started = time.perf_counter()
+        result = func(*args)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return round(best, 4), result
+
+
+def run_case(marketplace, n_rows, data_dir, repeat=3):
+    """
+    Замеряет этапы конвейера на одном каталоге
+
+    Args:
+        marketplace: Исходный маркетплейс
+        n_rows: Количество строк каталога
+        data_dir: Директория для сгенерированных файлов
+        repeat: Количество повторов каждого этапа (берется лучшее время)
+
+    Returns:
+        dict: Время этапов в секундах и сведения о каталоге
+    """
+    marketplaces = list(FULL_COLUMN_MAPS)
+    target = marketplaces[(marketplaces.index(marketplace) + 1) % len(marketplaces)]
+    path = catalog_path(data_dir, marketplace, n_rows)
+
+    seconds = {}
+    seconds["read_excel"], df = timed(pd.read_excel, path, repeat=repeat)
+    # Маркетплейс определяется по файлу, как при загрузке в приложении
+    seconds["detect"], (detected, _, _) = timed(detect_marketplace_from_file, path, repeat=repeat)
+    if detected != marketplace:
+        # Замеры конвертации с неверно определенным исходным форматом не имеют смысла
+        raise ValueError(f"{marketplace}: определен как {detected}")
+    seconds["convert"], converted = timed(convert_table_format, df, marketplace, target, repeat=repeat)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        seconds["export"], _ = timed(write_dataframe, converted, os.path.join(tmp, "out.xlsx"), repeat=repeat)
+
+    return {
+        "marketplace": marketplace,
+        "target": target,
+        "rows": n_rows,
+        "columns": len(df.columns),
+        "detected": detected,
+        "seconds": seconds,
+    }
+
+
+def case_key(case):
+    return f"{case['marketplace']}:{case['rows']}"
+
+
+def find_regressions(results, baseline, threshold=DEFAULT_THRESHOLD, min_seconds=MIN_REGRESSION_SECONDS):
+    """
+    Сравнивает результаты с базовыми и находит замедлившиеся этапы
+
+    Args:
+        results: Текущие результаты (формат run_suite)
+        baseline: Базовые результаты в том же формате
+        threshold: Допустимое относительное замедление
+        min_seconds: Минимальное абсолютное замедление, меньшие колебания считаются шумом
+
+    Returns:
+        list: Описания регрессий
+    """
+    baseline_cases = {case_key(case): case for case in baseline["cases"]}
+    regressions = []
+    for case in results["cases"]:
+        base = baseline_cases.get(case_key(case))
+        if base is None:
+            continue
+        for stage in STAGES:
+            current = case["seconds"].get(stage)
+            previous = base["seconds"].get(stage)
+            if current is None or previous is None:
+                continue
+            if current > previous * (1 + threshold) and current - previous >= min_seconds:
+                regressions.append({
+                    "case": case_key(case),
+                    "stage": stage,
+                    "baseline": previous,
+                    "current": current,
+                    "ratio": round(current / previous, 2) if previous else None,
+                })
+    return regressions
+
+
+def run_suite(marketplaces, sizes, data_dir, repeat=3):
+    cases = []
+    for n_rows in sizes:
+        for marketplace in marketplaces:
+            case = run_case(marketplace, n_rows, data_dir, repeat)
+            cases.append(case)
+            stages = " ".join(f"{stage}={case['seconds'][stage]}" for stage in STAGES)
+            print(f"{case_key(case)} {stages}", file=sys.stderr)
+    return {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "platform": platform.platform(),
+        "writer_backend": resolve_backend(),
+        "cases": cases,
+    }
+
+
+def main(argv=None):
+    marketplaces = list(FULL_COLUMN_MAPS)
+    parser = argparse.ArgumentParser(description="Бенчмарк конвейера чтение/определение/конвертация/выгрузка")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES))
+    parser.add_argument("--marketplace", action="append", choices=marketplaces,
+                        help="Исходный маркетплейс (по умолчанию - все схемы)")
+    parser.add_argument("--repeat", type=int, default=3, help="Повторов каждого этапа (берется лучшее время)")
+    parser.add_argument("--data-dir", default=None, help="Директория для сгенерированных каталогов (по умолчанию временная)")
+    parser.add_argument("--save", default=None, help="Сохранить результаты в JSON (новый базовый файл)")
+    parser.add_argument("--compare", default=None, help="Базовый JSON для поиска регрессий")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="Допустимое относительное замедление")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = args.data_dir or tmp
+        os.makedirs(data_dir, exist_ok=True)
+        results = run_suite(args.marketplace or marketplaces, args.sizes, data_dir, args.repeat)
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = find_regressions(results, baseline, args.threshold)
+        for item in regressions:
+            print(f"РЕГРЕССИЯ {item['case']} {item['stage']}: {item['baseline']} с -> {item['current']} с "
+                  f"(x{item['ratio']})", file=sys.stderr)
+        if regressions:
+            return 1
+        print("Регрессий не найдено", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,65 @@
+"""
+Бенчмарк чтения первых строк листов: в текущем процессе и в пуле процессов.
+
+Пул процессов сравнивается с чтением в текущем процессе на тех же файлах;
+в пул передаются байты книги, как при загрузке через Streamlit. Время
+пула включает запуск процессов - так его заплатил бы каждый вызов.
+
+Запуск:
+    python benchmarks/bench_sheet_scan.py attached_assets/*.xlsx --workers 4
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sheet_scan import SHEET_SCAN_ROWS, list_sheet_names, read_sheet_heads
+
+
+def _read_one(data, sheet_name, max_rows):
+    return read_sheet_heads(data, max_rows, [sheet_name])
+
+
+def read_in_pool(data, max_rows, workers):
+    sheet_names = list_sheet_names(data)
+    heads = {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for result in executor.map(_read_one, [data] * len(sheet_names), sheet_names, [max_rows] * len(sheet_names)):
+            heads.update(result)
+    return heads
+
+
+def measure(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - started)
+    return result, round(statistics.median(timings) * 1000, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк чтения первых строк листов XLSX")
+    parser.add_argument("files", nargs="+", help="XLSX-файлы")
+    parser.add_argument("--rows", type=int, default=SHEET_SCAN_ROWS)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    for path in args.files:
+        with open(path, "rb") as f:
+            data = f.read()
+        in_process, in_process_ms = measure(lambda: read_sheet_heads(data, args.rows), args.repeat)
+        pooled, pool_ms = measure(lambda: read_in_pool(data, args.rows, args.workers), args.repeat)
+        if pooled != in_process:
+            raise SystemExit(f"Результаты пула и текущего процесса различаются: {path}")
+        print(f"file={os.path.basename(path)} bytes={len(data)} sheets={len(in_process)} "
+              f"in_process_ms={in_process_ms} pool_ms={pool_ms} workers={args.workers}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Бюджет времени старта: первый рендер app.py без загруженных файлов и импорт
+модулей конвейера, каждый замер - в чистом процессе.
+
+Кроме времени проверяется, что первый рендер не загружает тяжелые модули
+(pandas, openpyxl, fuzzywuzzy...): они должны импортироваться только этапами
+обработки, которым нужны.
+
+Запуск:
+    python benchmarks/bench_startup.py --save benchmarks/baselines/startup.json
+    python benchmarks/bench_startup.py --check benchmarks/baselines/startup.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Модули, которые не должны загружаться при первом рендере
+HEAVY_MODULES = ("pandas", "pyarrow", "openpyxl", "fuzzywuzzy", "Levenshtein", "rapidfuzz", "xlsxwriter")
+
+# Допустимое превышение бюджета
+DEFAULT_TOLERANCE = 0.3
+
+FIRST_RENDER_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+imported = time.perf_counter()
+at = AppTest.from_file({app_path!r}, default_timeout=120).run()
+rendered = time.perf_counter()
+print(json.dumps({{
+    "streamlit_import_ms": round((imported - started) * 1000, 1),
+    "first_render_ms": round((rendered - imported) * 1000, 1),
+    "errors": len(at.exception),
+    "heavy_modules": [name for name in {heavy!r} if name in sys.modules],
+}}))
+"""
+
+PIPELINE_IMPORT_PROBE = """
+import json, sys, time
+sys.path.insert(0, {root!r})
+started = time.perf_counter()
+import marketplace_detection, upload_cache, excel_writer, utils
+print(json.dumps({{"pipeline_import_ms": round((time.perf_counter() - started) * 1000, 1)}}))
+"""
+
+
+def run_probe(code):
+    # Каждый замер - в отдельном интерпретаторе, чтобы импорт был холодным
+    completed = subprocess.run([sys.executable, "-c", code], cwd=ROOT_DIR, capture_output=True,
+                               text=True, check=True)
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def measure(runs=3):
+    """
+    Замеряет время старта (медиана по нескольким запускам)
+
+    Args:
+        runs: Количество запусков каждого замера
+
+    Returns:
+        dict: Время в миллисекундах и модули, загруженные при первом рендере
+    """
+    renders = [run_probe(FIRST_RENDER_PROBE.format(app_path=os.path.join(ROOT_DIR, "app.py"), heavy=HEAVY_MODULES))
+               for _ in range(runs)]
+    imports = [run_probe(PIPELINE_IMPORT_PROBE.format(root=ROOT_DIR)) for _ in range(runs)]
+    return {
+        "streamlit_import_ms": statistics.median(item["streamlit_import_ms"] for item in renders),
+        "first_render_ms": statistics.median(item["first_render_ms"] for item in renders),
+        "pipeline_import_ms": statistics.median(item["pipeline_import_ms"] for item in imports),
+        "errors": max(item["errors"] for item in renders),
+        "heavy_modules": sorted({name for item in renders for name in item["heavy_modules"]}),
+    }
+
+
+def check_budget(result, budget, tolerance=DEFAULT_TOLERANCE):
+    """
+    Проверяет замеры по бюджету
+
+    Args:
+        result: Результат measure
+        budget: Бюджет (сохраненный результат measure)
+        tolerance: Допустимое относительное превышение
+
+    Returns:
+        list: Описания нарушений бюджета
+    """
+    problems = []
+    for key in ("first_render_ms", "pipeline_import_ms"):
+        limit = budget[key] * (1 + tolerance)
+        if result[key] > limit:
+            problems.append(f"{key}: {result[key]} мс > {round(limit, 1)} мс")
+    if result["heavy_modules"]:
+        problems.append(f"при первом рендере загружены тяжелые модули: {', '.join(result['heavy_modules'])}")
+    if result["errors"]:
+        problems.append("первый рендер завершился с ошибкой")
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Бюджет времени старта приложения")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--save", default=None, help="Сохранить замеры как новый бюджет")
+    parser.add_argument("--check", default=None, help="JSON с бюджетом для проверки")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    args = parser.parse_args(argv)
+
+    result = measure(args.runs)
+    print(" ".join(f"{key}={value}" for key, value in result.items()), file=sys.stderr)
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+
+    if args.check:
+        with open(args.check, encoding="utf-8") as f:
+            budget = json.load(f)
+        problems = check_budget(result, budget, args.tolerance)
+        for problem in problems:
+            print(f"ПРЕВЫШЕН БЮДЖЕТ {problem}", file=sys.stderr)
+        if problems:
+            return 1
+        print("Бюджет старта соблюден", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,74 @@
+"""
+Бенчмарк бэкендов записи XLSX: строк в секунду и пиковый RSS процесса.
+
+Каждый бэкенд запускается в отдельном процессе, чтобы пиковый RSS
+одного замера не влиял на другой.
+
+Запуск:
+    python benchmarks/bench_writers.py --rows 100000
+"""
+import argparse
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_convert import make_catalog
+from excel_writer import available_backends, write_dataframe
+
+
+def peak_rss_bytes():
+    # ru_maxrss в Linux - килобайты, в macOS - байты
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def run(backend, marketplace, n_rows):
+    df = make_catalog(marketplace, n_rows)
+    baseline_rss = peak_rss_bytes()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "out.xlsx")
+        started = time.perf_counter()
+        write_dataframe(df, path, backend=backend)
+        elapsed = time.perf_counter() - started
+        file_bytes = os.path.getsize(path)
+
+    peak_rss = peak_rss_bytes()
+    return {
+        "backend": backend,
+        "marketplace": marketplace,
+        "rows": n_rows,
+        "seconds": round(elapsed, 3),
+        "rows_per_second": round(n_rows / elapsed) if elapsed else None,
+        "peak_rss_bytes": peak_rss,
+        "rss_growth_bytes": peak_rss - baseline_rss,
+        "file_bytes": file_bytes,
+    }
+
+
+def run_isolated(backend, marketplace, n_rows):
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(1) as pool:
+        return pool.apply(run, (backend, marketplace, n_rows))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк бэкендов записи XLSX")
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--marketplace", default="Ozon")
+    parser.add_argument("--backend", action="append", choices=available_backends(),
+                        help="Бэкенд для замера (по умолчанию - все доступные)")
+    args = parser.parse_args()
+
+    for backend in args.backend or available_backends():
+        stats = run_isolated(backend, args.marketplace, args.rows)
+        print(" ".join(f"{key}={value}" for key, value in stats.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,383 @@
+"""
+Запись XLSX-файлов через подключаемые бэкенды.
+
+xlsxwriter в режиме constant_memory сбрасывает каждую строку на диск сразу
+после записи и работает быстрее всего; если он не установлен, используется
+write-only книга openpyxl. Оба бэкенда пишут строки последовательно, поэтому
+память не растет с размером выгрузки.
+"""
+import io
+from copy import copy
+
+import openpyxl
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Border, Font, Side
+
+try:
+    import xlsxwriter
+except ImportError:
+    xlsxwriter = None
+
+# Порядок предпочтения бэкендов при автоматическом выборе
+WRITER_BACKENDS = ("xlsxwriter", "openpyxl")
+
+# Сколько строк DataFrame подготавливается к записи за раз
+CHUNK_ROWS = 10000
+
+# Предел числа строк листа Excel (вместе со строкой заголовков)
+EXCEL_MAX_ROWS = 1048576
+
+# Формат дат по умолчанию (как у pandas.ExcelWriter)
+DEFAULT_DATE_FORMAT = "yyyy-mm-dd hh:mm:ss"
+
+# Стили границ openpyxl -> индексы границ xlsxwriter
+XLSXWRITER_BORDERS = {
+    "thin": 1, "medium": 2, "dashed": 3, "dotted": 4, "thick": 5, "double": 6, "hair": 7,
+    "mediumDashed": 8, "dashDot": 9, "mediumDashDot": 10, "dashDotDot": 11,
+    "mediumDashDotDot": 12, "slantDashDot": 13,
+}
+
+# Выравнивание openpyxl -> выравнивание xlsxwriter
+XLSXWRITER_HORIZONTAL = {"centerContinuous": "center_across"}
+XLSXWRITER_VERTICAL = {"center": "vcenter", "top": "top", "bottom": "bottom",
+                       "justify": "vjustify", "distributed": "vdistributed"}
+
+
+def available_backends():
+    """
+    Возвращает бэкенды записи, доступные в текущем окружении
+
+    Returns:
+        list: Названия бэкендов в порядке предпочтения
+    """
+    return [name for name in WRITER_BACKENDS if name != "xlsxwriter" or xlsxwriter is not None]
+
+
+def resolve_backend(backend=None):
+    """
+    Определяет бэкенд записи
+
+    Args:
+        backend: Название бэкенда, None или "auto" - самый быстрый из доступных
+
+    Returns:
+        str: Название бэкенда
+    """
+    available = available_backends()
+    if backend in (None, "auto"):
+        return available[0]
+    if backend not in available:
+        raise ValueError(f"Бэкенд записи XLSX недоступен: {backend} (доступны: {', '.join(available)})")
+    return backend
+
+
+def _check_row_limit(sheet_title, row_count):
+    # Бэкенды молча отбрасывают строки сверх предела Excel, поэтому проверяем сами
+    if row_count > EXCEL_MAX_ROWS:
+        raise ValueError(f"Лист {sheet_title} превышает предел Excel в {EXCEL_MAX_ROWS} строк")
+
+
+def _rgb(color):
+    # Цвет openpyxl в формате AARRGGBB -> #RRGGBB; цвета темы и индексные пропускаем
+    rgb = getattr(color, "rgb", None)
+    if isinstance(rgb, str) and len(rgb) in (6, 8):
+        return "#" + rgb[-6:]
+    return None
+
+
+class OpenpyxlBookWriter:
+    """
+    Запись книги через write-only режим openpyxl
+    """
+
+    name = "openpyxl"
+
+    def __init__(self, output):
+        self.output = output
+        self.workbook = openpyxl.Workbook(write_only=True)
+        self._row_counts = {}
+        self._styles = {}
+        self._header_style = None
+
+    def add_sheet(self, title):
+        sheet = self.workbook.create_sheet(title=title)
+        self._row_counts[sheet.title] = 0
+        return sheet
+
+    def style_from_cell(self, sheet, cell):
+        """
+        Переносит стиль ячейки шаблона (read-only openpyxl) в эту книгу
+
+        Стиль переносится один раз на идентификатор стиля шаблона,
+        дальше ячейкам достается копия готового массива идентификаторов.
+        """
+        style_id = getattr(cell, "_style_id", 0)
+        if not style_id:
+            return None
+        if style_id not in self._styles:
+            prototype = WriteOnlyCell(sheet)
+            prototype.font = copy(cell.font)
+            prototype.fill = copy(cell.fill)
+            prototype.border = copy(cell.border)
+            prototype.alignment = copy(cell.alignment)
+            prototype.protection = copy(cell.protection)
+            prototype.number_format = cell.number_format
+            self._styles[style_id] = prototype._style
+        return self._styles[style_id]
+
+    def header_style(self, sheet):
+        # Оформление заголовка как у pandas: жирный шрифт, рамка, выравнивание по центру
+        if self._header_style is None:
+            prototype = WriteOnlyCell(sheet)
+            prototype.font = Font(bold=True)
+            side = Side(style="thin")
+            prototype.border = Border(left=side, right=side, top=side, bottom=side)
+            prototype.alignment = Alignment(horizontal="center", vertical="top")
+            self._header_style = prototype._style
+        return self._header_style
+
+    def append(self, sheet, values, styles=None):
+        self._row_counts[sheet.title] += 1
+        _check_row_limit(sheet.title, self._row_counts[sheet.title])
+        if styles is None:
+            sheet.append(values)
+            return
+        row = []
+        for value, style in zip(values, styles):
+            if style is None:
+                row.append(value)
+            else:
+                cell = WriteOnlyCell(sheet, value)
+                cell._style = copy(style)
+                row.append(cell)
+        sheet.append(row)
+
+    def close(self):
+        self.workbook.save(self.output)
+
+
+class XlsxWriterBookWriter:
+    """
+    Запись книги через xlsxwriter в режиме constant_memory
+    """
+
+    name = "xlsxwriter"
+
+    def __init__(self, output):
+        self.output = output
+        self.workbook = xlsxwriter.Workbook(output, {
+            "constant_memory": True,
+            "nan_inf_to_errors": True,
+            "default_date_format": DEFAULT_DATE_FORMAT,
+            # Значения записываются как есть, без превращения в формулы и гиперссылки
+            "strings_to_formulas": False,
+            "strings_to_urls": False,
+        })
+        self._next_row = {}
+        self._styles = {}
+        self._header_style = None
+
+    def add_sheet(self, title):
+        sheet = self.workbook.add_worksheet(title)
+        self._next_row[sheet.name] = 0
+        return sheet
+
+    def style_from_cell(self, sheet, cell):
+        """
+        Переводит стиль ячейки шаблона (read-only openpyxl) в формат xlsxwriter
+        """
+        style_id = getattr(cell, "_style_id", 0)
+        if not style_id:
+            return None
+        if style_id not in self._styles:
+            self._styles[style_id] = self.workbook.add_format(self._format_properties(cell))
+        return self._styles[style_id]
+
+    @staticmethod
+    def _format_properties(cell):
+        properties = {}
+
+        font = cell.font
+        if font is not None:
+            if font.name:
+                properties["font_name"] = font.name
+            if font.sz:
+                properties["font_size"] = font.sz
+            if font.b:
+                properties["bold"] = True
+            if font.i:
+                properties["italic"] = True
+            if font.u:
+                properties["underline"] = 2 if font.u == "double" else 1
+            if font.strike:
+                properties["font_strikeout"] = True
+            if _rgb(font.color):
+                properties["font_color"] = _rgb(font.color)
+
+        fill = cell.fill
+        if fill is not None and getattr(fill, "patternType", None) == "solid" and _rgb(fill.fgColor):
+            properties["pattern"] = 1
+            properties["bg_color"] = _rgb(fill.fgColor)
+
+        border = cell.border
+        if border is not None:
+            for side_name in ("left", "right", "top", "bottom"):
+                side = getattr(border, side_name)
+                if side is not None and side.style in XLSXWRITER_BORDERS:
+                    properties[side_name] = XLSXWRITER_BORDERS[side.style]
+                    if _rgb(side.color):
+                        properties[f"{side_name}_color"] = _rgb(side.color)
+
+        alignment = cell.alignment
+        if alignment is not None:
+            if alignment.horizontal and alignment.horizontal != "general":
+                properties["align"] = XLSXWRITER_HORIZONTAL.get(alignment.horizontal, alignment.horizontal)
+            if alignment.vertical in XLSXWRITER_VERTICAL:
+                properties["valign"] = XLSXWRITER_VERTICAL[alignment.vertical]
+            if alignment.wrap_text:
+                properties["text_wrap"] = True
+            if alignment.text_rotation:
+                properties["rotation"] = alignment.text_rotation
+            if alignment.indent:
+                properties["indent"] = int(alignment.indent)
+
+        if cell.number_format and cell.number_format != "General":
+            properties["num_format"] = cell.number_format
+
+        protection = getattr(cell, "protection", None)
+        if protection is not None:
+            if protection.locked is False:
+                properties["locked"] = False
+            if protection.hidden:
+                properties["hidden"] = True
+
+        return properties
+
+    def header_style(self, sheet):
+        if self._header_style is None:
+            self._header_style = self.workbook.add_format({"bold": True, "border": 1, "align": "center", "valign": "top"})
+        return self._header_style
+
+    def append(self, sheet, values, styles=None):
+        row = self._next_row[sheet.name]
+        _check_row_limit(sheet.name, row + 1)
+        self._next_row[sheet.name] = row + 1
+        if styles is None:
+            sheet.write_row(row, 0, values)
+            return
+        for col, (value, style) in enumerate(zip(values, styles)):
+            if value is None:
+                if style is not None:
+                    sheet.write_blank(row, col, None, style)
+            else:
+                sheet.write(row, col, value, style)
+
+    def close(self):
+        self.workbook.close()
+
+
+def open_book_writer(output, backend=None):
+    """
+    Создает объект записи книги
+
+    Args:
+        output: Путь или файловый объект для сохранения результата
+        backend: Название бэкенда (None - автоматический выбор)
+
+    Returns:
+        Объект с методами add_sheet, style_from_cell, header_style, append и close
+    """
+    if resolve_backend(backend) == "xlsxwriter":
+        return XlsxWriterBookWriter(output)
+    return OpenpyxlBookWriter(output)
+
+
+def iter_dataframe_rows(df, chunk_rows=CHUNK_ROWS):
+    """
+    Возвращает строки DataFrame кортежами значений, готовыми к записи
+
+    Пустые значения (NaN, None, NaT) заменяются на None и записываются пустыми
+    ячейками; подготовка идет частями, чтобы не копировать весь DataFrame сразу.
+
+    Args:
+        df: DataFrame с данными
+        chunk_rows: Количество строк в части
+
+    Returns:
+        Generator: Кортежи значений строк
+    """
+    for start in range(0, len(df), chunk_rows):
+        chunk = df.iloc[start:start + chunk_rows].astype(object)
+        chunk = chunk.where(chunk.notna(), None)
+        yield from chunk.itertuples(index=False, name=None)
+
+
+def append_header(writer, sheet, columns):
+    """
+    Записывает строку заголовков в стиле pandas (жирный шрифт, рамка)
+
+    Args:
+        writer: Объект записи книги (open_book_writer)
+        sheet: Лист, созданный writer.add_sheet
+        columns: Названия колонок
+    """
+    header = [str(col) for col in columns]
+    writer.append(sheet, header, [writer.header_style(sheet)] * len(header))
+
+
+def append_dataframe(writer, sheet, df):
+    """
+    Дописывает строки DataFrame в конец листа (без заголовков)
+
+    Args:
+        writer: Объект записи книги (open_book_writer)
+        sheet: Лист, созданный writer.add_sheet
+        df: DataFrame с данными
+
+    Returns:
+        int: Количество записанных строк
+    """
+    rows_written = 0
+    for row in iter_dataframe_rows(df):
+        writer.append(sheet, list(row))
+        rows_written += 1
+    return rows_written
+
+
+def write_dataframe(df, output, sheet_name="Sheet1", backend=None):
+    """
+    Записывает DataFrame в XLSX построчно
+
+    Args:
+        df: DataFrame с данными
+        output: Путь или файловый объект для сохранения результата
+        sheet_name: Имя листа
+        backend: Название бэкенда (None - автоматический выбор)
+
+    Returns:
+        int: Количество записанных строк данных
+    """
+    writer = open_book_writer(output, backend)
+    try:
+        sheet = writer.add_sheet(sheet_name)
+        append_header(writer, sheet, df.columns)
+        rows_written = append_dataframe(writer, sheet, df)
+    finally:
+        writer.close()
+    return rows_written
+
+
+def dataframe_to_excel_bytes(df, backend=None):
+    """
+    Сериализует DataFrame в байты Excel-файла
+
+    Args:
+        df: DataFrame с данными
+        backend: Название бэкенда (None - автоматический выбор)
+
+    Returns:
+        bytes: Содержимое XLSX-файла
+    """
+    output = io.BytesIO()
+    write_dataframe(df, output, backend=backend)
+    return output.getvalue()
@@ -0,0 +1,144 @@
+"""
+Конвертация одной таблицы товаров сразу во все форматы маркетплейсов.
+
+Исходная таблица читается и приводится к унифицированным типам один раз,
+после чего форматы всех целевых маркетплейсов строятся из нее параллельно
+в пуле потоков и записываются в один ZIP-архив в порядке списка форматов.
+
+Примеры:
+    python fanout_convert.py catalog.xlsx
+    python fanout_convert.py catalog.xlsx --source Ozon --targets Wildberries Яндекс.Маркет --output out.zip
+"""
+import argparse
+import io
+import os
+import sys
+import tempfile
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from excel_writer import WRITER_BACKENDS, write_dataframe
+from upload_cache import read_table
+from utils import FULL_COLUMN_MAPS, convert_table_format, prepare_source_frame
+
+# Потоков по умолчанию: по одному на целевой формат, но не больше этого числа
+DEFAULT_WORKERS = 4
+
+
+def target_file_name(source_marketplace, target_marketplace, prefix="converted"):
+    return f"{prefix}_{source_marketplace}_to_{target_marketplace}.xlsx"
+
+
+def _render_target(prepared, source_marketplace, target_marketplace, conversion_date, backend):
+    # Проекция подготовленной таблицы в формат одного маркетплейса и запись XLSX в память
+    converted = convert_table_format(prepared, source_marketplace, target_marketplace,
+                                     conversion_date=conversion_date)
+    output = io.BytesIO()
+    rows = write_dataframe(converted, output, backend=backend)
+    return target_marketplace, output.getvalue(), rows
+
+
+def convert_to_all(df, source_marketplace, output, targets=None, column_mapping=None, workers=None,
+                   backend=None, prefix="converted"):
+    """
+    Конвертирует таблицу во все целевые форматы и записывает результаты в ZIP
+
+    Args:
+        df: Исходная таблица
+        source_marketplace: Исходный маркетплейс
+        output: Путь или файловый объект для ZIP-архива
+        targets: Целевые маркетплейсы (по умолчанию - все, кроме исходного)
+        column_mapping: Необязательное переименование колонок источника
+        workers: Количество потоков (по умолчанию - по числу форматов, не больше DEFAULT_WORKERS)
+        backend: Бэкенд записи XLSX (None - автоматический выбор)
+        prefix: Префикс имен файлов в архиве
+
+    Returns:
+        list: Записи {target, file, rows} в порядке списка целевых маркетплейсов
+    """
+    if targets is None:
+        targets = [marketplace for marketplace in FULL_COLUMN_MAPS if marketplace != source_marketplace]
+    if not targets:
+        raise ValueError("Не выбрано ни одного целевого формата")
+
+    prepared = prepare_source_frame(df, source_marketplace, column_mapping)
+    conversion_date = pd.Timestamp.now().strftime("%Y-%m-%d %H:%M:%S")
+
+    files = {}
+    # XLSX уже сжат, поэтому файлы кладутся в архив без повторного сжатия
+    with zipfile.ZipFile(output, "w", compression=zipfile.ZIP_STORED) as archive:
+        with ThreadPoolExecutor(max_workers=workers or min(len(targets), DEFAULT_WORKERS)) as executor:
+            futures = [
+                executor.submit(_render_target, prepared, source_marketplace, target, conversion_date, backend)
+                for target in targets
+            ]
+            # Файлы пишутся в порядке целевых форматов, а не готовности:
+            # состав и порядок архива не зависят от планировщика потоков
+            for future in futures:
+                target, data, rows = future.result()
+                name = target_file_name(source_marketplace, target, prefix)
+                archive.writestr(name, data)
+                files[target] = {"target": target, "file": name, "rows": rows}
+    return [files[target] for target in targets]
+
+
+def convert_to_all_file(df, source_marketplace, **kwargs):
+    """
+    Конвертация во все форматы с записью ZIP-архива во временный файл
+
+    Архив пишется на диск по мере готовности файлов, а не собирается в памяти.
+    Временный файл удаляется при закрытии возвращенного объекта.
+
+    Args:
+        df: Исходная таблица
+        source_marketplace: Исходный маркетплейс
+        **kwargs: Параметры convert_to_all
+
+    Returns:
+        file: Открытый на чтение временный файл с ZIP-архивом, позиция - в начале
+    """
+    # Небуферизованный файл (io.RawIOBase) принимает st.download_button;
+    # zipfile пишет файлы архива целыми блоками, поэтому буфер не нужен
+    output = tempfile.TemporaryFile(buffering=0)
+    try:
+        convert_to_all(df, source_marketplace, output, **kwargs)
+    except Exception:
+        output.close()
+        raise
+    output.seek(0)
+    return output
+
+
+def main(argv=None):
+    marketplaces = list(FULL_COLUMN_MAPS)
+    parser = argparse.ArgumentParser(description="Конвертация таблицы товаров во все форматы маркетплейсов")
+    parser.add_argument("input", help="Путь к исходному Excel-файлу")
+    parser.add_argument("--source", choices=marketplaces, help="Исходный маркетплейс (по умолчанию определяется автоматически)")
+    parser.add_argument("--targets", nargs="+", choices=marketplaces, help="Целевые маркетплейсы (по умолчанию - все)")
+    parser.add_argument("--output", default=None, help="Путь к ZIP-архиву (по умолчанию <имя>_all_formats.zip)")
+    parser.add_argument("--workers", type=int, default=None, help="Количество потоков")
+    parser.add_argument("--backend", choices=WRITER_BACKENDS, default=None, help="Бэкенд записи XLSX")
+    args = parser.parse_args(argv)
+
+    output = args.output or f"{os.path.splitext(args.input)[0]}_all_formats.zip"
+
+    started = time.perf_counter()
+    with open(args.input, "rb") as f:
+        df, detected, _, _ = read_table(f.read())
+    source = args.source or detected
+    if source is None:
+        print("Не удалось определить формат маркетплейса, укажите --source", file=sys.stderr)
+        return 1
+
+    files = convert_to_all(df, source, output, args.targets, workers=args.workers, backend=args.backend)
+    for item in files:
+        print(f"{item['file']}: {item['rows']} строк", file=sys.stderr)
+    print(f"Готово за {round(time.perf_counter() - started, 3)} с. Архив: {output}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,194 @@
+import json
+import logging
+import os
+import threading
+from dataclasses import replace
+
+logger = logging.getLogger("product_table_manager.mappings")
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MAPPINGS_PATH = os.path.join(BASE_DIR, "data", "mappings.json")
+
+# Названия маркетплейсов в ключах файла маппингов ("Озон → Вайлдберриз")
+MARKETPLACE_ALIASES = {
+    "ozon": "Ozon",
+    "озон": "Ozon",
+    "wildberries": "Wildberries",
+    "вайлдберриз": "Wildberries",
+    "wb": "Wildberries",
+    "вб": "Wildberries",
+    "леманпро": "ЛеманПро",
+    "леман про": "ЛеманПро",
+    "лемана про": "ЛеманПро",
+    "яндекс.маркет": "Яндекс.Маркет",
+    "яндекс маркет": "Яндекс.Маркет",
+    "все инструменты": "Все инструменты",
+    "сбермегамаркет": "СберМегаМаркет",
+    "мегамаркет": "СберМегаМаркет",
+}
+
+PAIR_SEPARATORS = ("→", "->")
+
+
+def parse_pair_key(key):
+    """
+    Разбирает ключ файла маппингов вида "Озон → Вайлдберриз"
+
+    Args:
+        key: Ключ записи
+
+    Returns:
+        tuple: (исходный маркетплейс, целевой маркетплейс) или None
+    """
+    for separator in PAIR_SEPARATORS:
+        if separator in key:
+            source, target = (part.strip().casefold() for part in key.split(separator, 1))
+            source, target = MARKETPLACE_ALIASES.get(source), MARKETPLACE_ALIASES.get(target)
+            if source and target:
+                return source, target
+            return None
+    return None
+
+
+def apply_column_overrides(plan, overrides, version):
+    """
+    Дополняет план конвертации явными соответствиями колонок из файла маппингов
+
+    Явно указанная исходная колонка получает наивысший приоритет. Целевые колонки,
+    которых нет в формате маркетплейса, добавляются в конец как необязательные:
+    они выводятся, только если исходная колонка есть в таблице.
+
+    Args:
+        plan: Базовый ConversionPlan
+        overrides: Словарь {колонка источника: колонка цели}
+        version: Версия набора маппингов
+
+    Returns:
+        ConversionPlan: Новый план
+    """
+    target_columns = list(plan.target_columns)
+    source_candidates = [list(candidates) for candidates in plan.source_candidates]
+    fields = list(plan.fields or (None,) * len(target_columns))
+    unit_factors = list(plan.unit_factors or (None,) * len(target_columns))
+    optional_columns = set(plan.optional_columns)
+
+    # При повторе целевой колонки побеждает последняя запись, как в compile_conversion_plan
+    for src_col, target_col in overrides.items():
+        if target_col in target_columns:
+            idx = target_columns.index(target_col)
+            source_candidates[idx] = [src_col] + [col for col in source_candidates[idx] if col != src_col]
+            # Явное соответствие задает пользователь, значения переносятся без пересчета единиц
+            unit_factors[idx] = None
+        else:
+            target_columns.append(target_col)
+            source_candidates.append([src_col])
+            fields.append(None)
+            unit_factors.append(None)
+            optional_columns.add(target_col)
+
+    return replace(
+        plan,
+        target_columns=tuple(target_columns),
+        source_candidates=tuple(tuple(candidates) for candidates in source_candidates),
+        fields=tuple(fields),
+        unit_factors=tuple(unit_factors),
+        optional_columns=frozenset(optional_columns),
+        version=version,
+    )
+
+
+class MappingStore:
+    """
+    Планы конвертации с учетом пользовательских маппингов из data/mappings.json.
+
+    Файл читается и компилируется в планы только при изменении его mtime
+    (или размера); в остальных вызовах проверяется лишь os.stat. Каждая
+    перезагрузка увеличивает версию, которая записывается в планы.
+    """
+
+    def __init__(self, base_plans, path=MAPPINGS_PATH):
+        self.path = path
+        self.base_plans = dict(base_plans)
+        self.version = 0
+        self._stamp = None
+        self._plans = dict(self.base_plans)
+        self._lock = threading.Lock()
+
+    def _file_stamp(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _read_mappings(self, stamp):
+        if stamp is None:
+            return {}
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                mappings = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning("Не удалось прочитать %s: %s", self.path, e)
+            return None
+        if not isinstance(mappings, dict):
+            logger.warning("Файл %s должен содержать объект {\"A → B\": {колонка: колонка}}", self.path)
+            return None
+        return mappings
+
+    def compile(self, mappings, version):
+        """
+        Компилирует планы для всех пар маркетплейсов
+
+        Args:
+            mappings: Содержимое файла маппингов
+            version: Версия набора планов
+
+        Returns:
+            dict: {(исходный, целевой): ConversionPlan}
+        """
+        plans = {pair: replace(plan, version=version) for pair, plan in self.base_plans.items()}
+        for key, overrides in mappings.items():
+            pair = parse_pair_key(key)
+            if pair is None or pair not in plans or not isinstance(overrides, dict):
+                logger.warning("Пропущена запись маппинга %r", key)
+                continue
+            plans[pair] = apply_column_overrides(plans[pair], overrides, version)
+        return plans
+
+    def refresh(self):
+        """
+        Перечитывает файл маппингов, если он изменился
+
+        Returns:
+            bool: True, если планы были перекомпилированы
+        """
+        stamp = self._file_stamp()
+        if stamp == self._stamp:
+            return False
+        with self._lock:
+            if stamp == self._stamp:
+                return False
+            mappings = self._read_mappings(stamp)
+            # Испорченный файл не перечитывается до следующего изменения,
+            # а конвертации продолжают использовать предыдущие планы
+            self._stamp = stamp
+            if mappings is None:
+                return False
+            self._plans = self.compile(mappings, self.version + 1)
+            self.version += 1
+        logger.info("Маппинги %s загружены, версия %s", self.path, self.version)
+        return True
+
+    def get_plan(self, source_marketplace, target_marketplace):
+        """
+        Возвращает актуальный план конвертации для пары маркетплейсов
+
+        Args:
+            source_marketplace: Исходный маркетплейс
+            target_marketplace: Целевой маркетплейс
+
+        Returns:
+            ConversionPlan или None, если маппинг для пары не найден
+        """
+        self.refresh()
+        return self._plans.get((source_marketplace, target_marketplace))
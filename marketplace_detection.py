@@ -1,55 +1,199 @@
-import pandas as pd
-from fuzzywuzzy import process
+from functools import lru_cache
+from fuzzywuzzy import fuzz
+from fuzzywuzzy import utils as fuzz_utils
+
+from sheet_scan import INDICATOR_MARKETPLACES, header_candidates
+
+# Характерные заголовки для каждого маркетплейса
+MARKETPLACE_HEADERS = {
+    "Ozon": ["ID", "Артикул", "Название", "Цена", "Остаток", "Ссылка на товар"],
+    "Wildberries": ["Номенклатура", "Артикул поставщика", "Баркод", "Цена СП", "Предмет"],
+    "ЛеманПро": ["ID", "Артикул", "Наименование", "Цена", "Количество"],
+    "Яндекс.Маркет": ["marketSku", "title", "categoryName", "price", "vendorCode"],
+    "Все инструменты": ["Код товара", "Наименование", "Цена", "Наличие", "Категория"],
+    "СберМегаМаркет": ["ID", "Артикул", "Наименование", "Цена продажи", "Остаток"]
+}
+
+# Порог схожести и минимальное количество совпавших заголовков
+SCORE_THRESHOLD = 70
+MIN_MATCH_COUNT = 2
+
+# Для определения по файлу без ключевых заголовков шаблона: минимальное число
+# характерных заголовков, совпавших точно (после нормализации)
+MIN_SIGNATURE_MATCHES = 4
+
+
+def normalize_header(header):
+    """
+    Нормализует заголовок так же, как fuzzywuzzy перед сравнением:
+    только буквы и цифры, нижний регистр, без крайних пробелов
+    """
+    return fuzz_utils.full_process(str(header))
+
+
+def _build_signature_index(marketplace_headers):
+    # Нормализованный характерный заголовок -> маркетплейсы, в которых он встречается.
+    # Одинаковые заголовки ("ID", "Цена", "Артикул") сравниваются один раз для всех
+    index = {}
+    for marketplace, expected_headers in marketplace_headers.items():
+        for header in expected_headers:
+            index.setdefault(normalize_header(header), []).append(marketplace)
+    return index
+
+
+# Индекс сигнатур маркетплейсов, строится один раз при импорте
+SIGNATURE_INDEX = _build_signature_index(MARKETPLACE_HEADERS)
+
+
+def score_signatures(headers):
+    """
+    Оценивает совпадение каждой сигнатуры индекса с заголовками таблицы
+
+    Args:
+        headers: Список заголовков таблицы
+
+    Returns:
+        dict: {нормализованная сигнатура: лучшая оценка схожести 0-100}
+    """
+    normalized_headers = {normalize_header(header) for header in headers}
+    # Пустые после нормализации заголовки всегда дают оценку 0
+    normalized_headers.discard("")
+
+    scores = {}
+    leftovers = []
+
+    # Сначала точные совпадения нормализованных заголовков - поиск в множестве
+    for signature in SIGNATURE_INDEX:
+        if signature in normalized_headers:
+            scores[signature] = 100
+        else:
+            leftovers.append(signature)
+
+    # Нечеткое сравнение только для оставшихся сигнатур, по одному проходу на каждую
+    for signature in leftovers:
+        best_score = 0
+        for header in normalized_headers:
+            score = fuzz.WRatio(signature, header, full_process=False)
+            if score > best_score:
+                best_score = score
+        scores[signature] = best_score
+
+    return scores
+
+
+@lru_cache(maxsize=256)
+def detect_marketplace_from_headers(headers):
+    """
+    Определяет маркетплейс по кортежу заголовков (результат кэшируется)
+
+    Args:
+        headers (tuple): Заголовки таблицы в виде строк
+
+    Returns:
+        str: Название маркетплейса или None, если не удалось определить
+    """
+    signature_scores = score_signatures(headers)
+
+    # Определяем схожесть заголовков с каждым маркетплейсом
+    best_match = None
+    highest_score = 0
+
+    for marketplace, expected_headers in MARKETPLACE_HEADERS.items():
+        total_score = 0
+        match_count = 0
+
+        for header in expected_headers:
+            score = signature_scores[normalize_header(header)]
+            if score > SCORE_THRESHOLD:
+                total_score += score
+                match_count += 1
+
+        # Считаем среднюю оценку, если найдено хотя бы одно совпадение
+        if match_count > 0:
+            average_score = total_score / match_count
+            # Требуем минимальное количество совпадений
+            if match_count >= MIN_MATCH_COUNT and average_score > highest_score:
+                highest_score = average_score
+                best_match = marketplace
+
+    return best_match
+
 
 def detect_marketplace(df):
     """
     Определяет маркетплейс на основе заголовков таблицы.
-    
+
     Args:
         df (pd.DataFrame): Таблица с данными товаров
-    
+
     Returns:
         str: Название маркетплейса или None, если не удалось определить
     """
     try:
-        # Получаем заголовки колонок
-        headers = list(df.columns)
-        
-        # Характерные заголовки для каждого маркетплейса
-        marketplace_headers = {
-            "Ozon": ["ID", "Артикул", "Название", "Цена", "Остаток", "Ссылка на товар"],
-            "Wildberries": ["Номенклатура", "Артикул поставщика", "Баркод", "Цена СП", "Предмет"],
-            "ЛеманПро": ["ID", "Артикул", "Наименование", "Цена", "Количество"],
-            "Яндекс.Маркет": ["marketSku", "title", "categoryName", "price", "vendorCode"],
-            "Все инструменты": ["Код товара", "Наименование", "Цена", "Наличие", "Категория"],
-            "СберМегаМаркет": ["ID", "Артикул", "Наименование", "Цена продажи", "Остаток"]
-        }
-        
-        # Определяем схожесть заголовков с каждым маркетплейсом
-        best_match = None
-        highest_score = 0
-        
-        for marketplace, expected_headers in marketplace_headers.items():
-            total_score = 0
-            match_count = 0
-            
-            for header in expected_headers:
-                # Находим лучшее совпадение и его оценку
-                best_header_match, score = process.extractOne(header, headers)
-                if score > 70:  # Порог схожести
-                    total_score += score
-                    match_count += 1
-            
-            # Считаем среднюю оценку, если найдено хотя бы одно совпадение
-            if match_count > 0:
-                average_score = total_score / match_count
-                # Требуем минимальное количество совпадений (например, 2)
-                if match_count >= 2 and average_score > highest_score:
-                    highest_score = average_score
-                    best_match = marketplace
-        
-        return best_match
-    
+        # Отпечаток заголовков - кортеж строк; повторный шаблон берется из кэша
+        headers = tuple(str(col) for col in df.columns)
+        return detect_marketplace_from_headers(headers)
+
     except Exception as e:
         print(f"Ошибка при определении маркетплейса: {str(e)}")
         return None
+
+
+def detect_marketplace_from_signature(headers):
+    """
+    Строгое определение маркетплейса по точным совпадениям характерных заголовков
+
+    В отличие от detect_marketplace_from_headers нечеткое сравнение не
+    используется: общие заголовки ("Артикул", "Цена") и похожие слова в
+    реальных шаблонах дают высокие оценки чужим маркетплейсам.
+
+    Args:
+        headers: Заголовки таблицы
+
+    Returns:
+        str: Маркетплейс, у которого совпало не меньше MIN_SIGNATURE_MATCHES
+            заголовков и больше, чем у любого другого, или None
+    """
+    normalized_headers = {normalize_header(header) for header in headers}
+    counts = {
+        marketplace: sum(1 for header in expected_headers if normalize_header(header) in normalized_headers)
+        for marketplace, expected_headers in MARKETPLACE_HEADERS.items()
+    }
+    ranked = sorted(counts.items(), key=lambda item: -item[1])
+    best_marketplace, best_count = ranked[0]
+    if best_count < MIN_SIGNATURE_MATCHES or (len(ranked) > 1 and ranked[1][1] == best_count):
+        return None
+    return best_marketplace
+
+
+def detect_marketplace_from_file(source):
+    """
+    Определяет маркетплейс, лист и строку заголовков по XLSX-файлу без загрузки
+    книги: читаются только первые строки листов (см. xlsx_sniffer).
+
+    Маркетплейс определяется по ключевым заголовкам шаблонов (оценка
+    header_candidates), а если их нет - строго по характерным заголовкам
+    лучшего кандидата (detect_marketplace_from_signature). Когда уверенности
+    нет, возвращается None, а не ближайший по нечеткому сравнению маркетплейс.
+
+    Args:
+        source: Путь к XLSX-файлу, его байты или файловый объект
+
+    Returns:
+        tuple: (маркетплейс или None, имя_листа, номер_строки_заголовков);
+            (None, None, 1), если файл не удалось прочитать или он пуст
+    """
+    try:
+        candidates = header_candidates(source)
+    except Exception as e:
+        print(f"Ошибка при определении маркетплейса: {str(e)}")
+        return None, None, 1
+    if not candidates:
+        return None, None, 1
+
+    best = candidates[0]
+    if best["marketplace"] is not None:
+        marketplace = INDICATOR_MARKETPLACES[best["marketplace"]]
+    else:
+        marketplace = detect_marketplace_from_signature(header for header in best["headers"] if header)
+    return marketplace, best["sheet"], best["row"]
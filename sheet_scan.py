@@ -0,0 +1,231 @@
+import io
+import os
+
+from xlsx_sniffer import XlsxSniffer
+
+# Ключевые заголовки для выбора листа и строки заголовков маркетплейса. Общие
+# для нескольких форматов заголовки ("Артикул", "Цена", "Наименование") сюда
+# не входят: по ним маркетплейс не отличить
+MARKETPLACE_INDICATORS = {
+    "wildberries": [
+        "Артикул продавца", "Артикул WB", "Баркод",
+        "Номенклатура", "Номер номенклатуры"
+    ],
+    "ozon": [
+        "Артикул*", "Название товара*", "Ссылка на главное фото*", "Бренд*",
+        "Название товара", "Цена, руб.*"
+    ],
+    "yandex": [
+        "Ваш SKU *", "Название товара *", "Ссылка на изображение *", "Описание товара *",
+        "Категория на Маркете *", "Бренд *"
+    ],
+}
+
+# Названия маркетплейсов приложения для ключей MARKETPLACE_INDICATORS
+INDICATOR_MARKETPLACES = {
+    "wildberries": "Wildberries",
+    "ozon": "Ozon",
+    "yandex": "Яндекс.Маркет",
+}
+
+# Строка считается заголовками маркетплейса, если в ней не меньше стольких ключевых заголовков
+MIN_INDICATOR_MATCHES = 2
+
+# В шаблонах Ozon заголовки находятся на второй строке листа "Шаблон"
+OZON_TEMPLATE_SHEET = "Шаблон"
+OZON_TEMPLATE_HEADER_ROW = 2
+
+# Подписи колонок короткие; длинный текст - пояснения и подсказки шаблонов
+MAX_LABEL_LENGTH = 60
+
+# Сколько строк каждого листа просматривается при выборе листа и строки заголовков
+SHEET_SCAN_ROWS = 10
+HEADER_SCAN_ROWS = 30
+
+
+def _open_source(source):
+    # Streamlit UploadedFile и другие файловые объекты читаются как байты
+    if isinstance(source, (str, os.PathLike)):
+        return source
+    if isinstance(source, bytes):
+        return io.BytesIO(source)
+    if hasattr(source, "getvalue"):
+        return io.BytesIO(source.getvalue())
+    source.seek(0)
+    return source
+
+
+def list_sheet_names(source):
+    """
+    Возвращает имена листов по xl/workbook.xml, не загружая книгу
+
+    Args:
+        source: Путь к XLSX-файлу, его байты или файловый объект
+
+    Returns:
+        list: Имена листов в порядке книги
+    """
+    with XlsxSniffer(_open_source(source)) as sniffer:
+        return sniffer.sheetnames
+
+
+def read_sheet_heads(source, max_rows=SHEET_SCAN_ROWS, sheet_names=None):
+    """
+    Читает первые строки листов книги
+
+    Архив открывается один раз, XML листов разбирается только до max_rows,
+    а из sharedStrings.xml - только строки, на которые ссылаются прочитанные
+    ячейки (см. xlsx_sniffer). Пул процессов не используется: чтение одного
+    листа занимает миллисекунды, а запуск процессов и передача им файла -
+    десятки миллисекунд (benchmarks/bench_sheet_scan.py).
+
+    Args:
+        source: Путь к XLSX-файлу, его байты или файловый объект
+        max_rows: Количество строк с начала каждого листа
+        sheet_names: Листы для чтения (по умолчанию - все)
+
+    Returns:
+        dict: {имя листа: список строк (списки строковых значений)} в порядке листов
+    """
+    with XlsxSniffer(_open_source(source)) as sniffer:
+        return sniffer.sheet_rows(sheet_names, max_rows)
+
+
+def _count_markers(markers, row_values):
+    return sum(1 for marker in markers if marker in row_values)
+
+
+def _count_labels(row_values):
+    # Непустые короткие текстовые ячейки (не числа) - похожие на подписи колонок
+    count = 0
+    for value in row_values:
+        if not value or len(value) > MAX_LABEL_LENGTH:
+            continue
+        try:
+            float(value.replace(",", "."))
+        except ValueError:
+            count += 1
+    return count
+
+
+def select_header_row(rows, sheet_name=None):
+    """
+    Выбирает строку заголовков листа по его первым строкам
+
+    Единое правило для выбора листа, строки заголовков и определения маркетплейса:
+    1. Лист "Шаблон" Ozon с ключевыми заголовками на второй строке.
+    2. Строка с наибольшим числом ключевых заголовков маркетплейса
+       (не меньше MIN_INDICATOR_MATCHES).
+    3. Иначе - строка с наибольшим числом коротких текстовых ячеек (не меньше
+       двух), маркетплейс не определяется.
+    При равенстве побеждает более ранняя строка.
+
+    Args:
+        rows: Строки листа (списки строковых значений)
+        sheet_name: Имя листа (для специальной обработки шаблонов Ozon)
+
+    Returns:
+        tuple: (число ключевых заголовков, ключ маркетплейса или None, номер строки начиная с 1)
+    """
+    if sheet_name and sheet_name.lower() == OZON_TEMPLATE_SHEET.lower() and len(rows) >= OZON_TEMPLATE_HEADER_ROW:
+        score = _count_markers(MARKETPLACE_INDICATORS["ozon"], rows[OZON_TEMPLATE_HEADER_ROW - 1])
+        if score >= MIN_INDICATOR_MATCHES:
+            return score, "ozon", OZON_TEMPLATE_HEADER_ROW
+
+    best = (0, None, 1)
+    for row_idx, row_values in enumerate(rows, start=1):
+        for marketplace, markers in MARKETPLACE_INDICATORS.items():
+            score = _count_markers(markers, row_values)
+            if score > best[0]:
+                best = (score, marketplace, row_idx)
+    if best[0] >= MIN_INDICATOR_MATCHES:
+        return best
+
+    label_row, max_labels = 1, 1
+    for row_idx, row_values in enumerate(rows, start=1):
+        labels = _count_labels(row_values)
+        if labels > max_labels:
+            label_row, max_labels = row_idx, labels
+    return best[0], None, label_row
+
+
+def header_row_from_values(rows, sheet_name=None):
+    """
+    Находит строку заголовков по значениям первых строк листа
+
+    Args:
+        rows: Строки листа (списки строковых значений)
+        sheet_name: Имя листа (для специальной обработки шаблонов Ozon)
+
+    Returns:
+        int: Номер строки с заголовками (начиная с 1)
+    """
+    return select_header_row(rows, sheet_name)[2]
+
+
+def header_candidates(source, max_rows=SHEET_SCAN_ROWS):
+    """
+    Строки-кандидаты в заголовки для каждого листа книги
+
+    Листы с ключевыми заголовками маркетплейса идут первыми в порядке убывания
+    числа совпадений, остальные - по убыванию числа подписей в строке
+    заголовков (листы-инструкции уходят в конец). При равенстве сохраняется
+    порядок книги. Пустые листы пропускаются.
+
+    Args:
+        source: Путь к XLSX-файлу, его байты или файловый объект
+        max_rows: Количество просматриваемых строк каждого листа
+
+    Returns:
+        list: Словари {sheet, row, headers, marketplace, score, labels};
+            marketplace - ключ MARKETPLACE_INDICATORS или None
+    """
+    heads = read_sheet_heads(source, max(max_rows, OZON_TEMPLATE_HEADER_ROW))
+
+    candidates = []
+    for sheet_name, rows in heads.items():
+        score, marketplace, row_idx = select_header_row(rows[:max_rows], sheet_name)
+        headers = rows[row_idx - 1] if row_idx <= len(rows) else []
+        if not any(headers):
+            continue
+        if marketplace is None:
+            score = 0
+        candidates.append({"sheet": sheet_name, "row": row_idx, "headers": headers,
+                           "marketplace": marketplace, "score": score,
+                           "labels": _count_labels(headers)})
+    # sorted устойчив, поэтому при равной оценке сохраняется порядок книги
+    return sorted(candidates, key=lambda item: (-item["score"], -item["labels"]))
+
+
+def find_best_marketplace_sheet(source, max_rows=SHEET_SCAN_ROWS):
+    """
+    Ищет в книге Excel лист, наиболее подходящий для маркетплейса
+
+    Args:
+        source: Путь к XLSX-файлу, его байты или файловый объект
+        max_rows: Количество просматриваемых строк каждого листа
+
+    Returns:
+        tuple: (имя_листа, ключ_маркетплейса или "other", строка_с_заголовками)
+    """
+    candidates = header_candidates(source, max_rows)
+    if not candidates:
+        sheet_names = list_sheet_names(source)
+        return (sheet_names[0] if sheet_names else None), "other", 1
+    best = candidates[0]
+    return best["sheet"], best["marketplace"] or "other", best["row"]
+
+
+def find_header_rows(source, max_rows=HEADER_SCAN_ROWS):
+    """
+    Находит строку заголовков на каждом листе книги
+
+    Args:
+        source: Путь к XLSX-файлу, его байты или файловый объект
+        max_rows: Максимальное количество строк для поиска заголовков
+
+    Returns:
+        dict: {имя листа: номер строки с заголовками}
+    """
+    heads = read_sheet_heads(source, max_rows)
+    return {sheet_name: header_row_from_values(rows, sheet_name) for sheet_name, rows in heads.items()}
@@ -1,10 +1,8 @@
 import streamlit as st
-import pandas as pd
-import openpyxl
-import io
-from utils import load_excel_file
 import os
 
+from assets import get_asset_manifest
+
 st.set_page_config(
     page_title="Заголовки шаблонов маркетплейсов",
     page_icon="📋",
@@ -18,13 +16,8 @@ st.markdown("""
 Эта страница показывает заголовки колонок из шаблонов различных маркетплейсов для удобства создания маппингов.
 """)
 
-# Поиск доступных файлов шаблонов
-template_files = []
-assets_dir = "attached_assets"
-if os.path.exists(assets_dir):
-    for file in os.listdir(assets_dir):
-        if file.endswith(".xlsx"):
-            template_files.append(os.path.join(assets_dir, file))
+# Доступные файлы шаблонов (из манифеста, без сканирования директории на каждом запуске)
+template_files = get_asset_manifest().template_files
 
 col1, col2 = st.columns(2)
 
@@ -44,56 +37,60 @@ with col1:
             wb_file = template_files[0]  # Берем первый файл, если не нашли подходящего
         
         if wb_file:
+            # openpyxl и utils импортируются только при чтении шаблона
+            from utils import load_excel_file
+            
             with open(wb_file, "rb") as f:
-                workbook, sheets = load_excel_file(f)
-                
-                # Ищем лист "Товары"
-                target_sheet = None
-                for sheet_name in sheets:
-                    if sheet_name.lower() == "товары":
-                        target_sheet = sheet_name
-                        break
+                workbook, sheets = load_excel_file(f, streaming=True)
+                # Книга закрывается и при ошибке чтения
+                with workbook:
+                    # Ищем лист "Товары"
+                    target_sheet = None
+                    for sheet_name in sheets:
+                        if sheet_name.lower() == "товары":
+                            target_sheet = sheet_name
+                            break
                 
-                if target_sheet is None and len(sheets) > 0:
-                    target_sheet = sheets[0]
+                    if target_sheet is None and len(sheets) > 0:
+                        target_sheet = sheets[0]
                 
-                if target_sheet:
-                    st.success(f"Файл: {os.path.basename(wb_file)}, Лист: {target_sheet}")
+                    if target_sheet:
+                        st.success(f"Файл: {os.path.basename(wb_file)}, Лист: {target_sheet}")
                     
-                    # Получаем заголовки (обычно в 3-й строке для Wildberries)
-                    sheet = workbook[target_sheet]
-                    header_row = 3  # Типичная строка для заголовков Wildberries
+                        # Получаем заголовки (обычно в 3-й строке для Wildberries)
+                        sheet = workbook[target_sheet]
+                        header_row = 3  # Типичная строка для заголовков Wildberries
                     
-                    headers = []
-                    for cell in sheet[header_row]:
-                        if cell.value is not None and str(cell.value).strip() != "":
-                            headers.append(str(cell.value))
+                        headers = []
+                        for value in sheet.header_row(header_row):
+                            if value is not None and str(value).strip() != "":
+                                headers.append(str(value))
                     
-                    # Отображаем заголовки в два столбика
-                    if headers:
-                        st.markdown("#### Заголовки колонок:")
+                        # Отображаем заголовки в два столбика
+                        if headers:
+                            st.markdown("#### Заголовки колонок:")
                         
-                        # Разделяем заголовки на две колонки
-                        half_length = len(headers) // 2 + len(headers) % 2  # Первая колонка может быть на 1 больше
-                        first_half = headers[:half_length]
-                        second_half = headers[half_length:]
+                            # Разделяем заголовки на две колонки
+                            half_length = len(headers) // 2 + len(headers) % 2  # Первая колонка может быть на 1 больше
+                            first_half = headers[:half_length]
+                            second_half = headers[half_length:]
                         
-                        # Создаем колонки
-                        col_a, col_b = st.columns(2)
+                            # Создаем колонки
+                            col_a, col_b = st.columns(2)
                         
-                        # Отображаем первую половину
-                        with col_a:
-                            for i, header in enumerate(first_half, 1):
-                                st.markdown(f"{i}. **{header}**")
+                            # Отображаем первую половину
+                            with col_a:
+                                for i, header in enumerate(first_half, 1):
+                                    st.markdown(f"{i}. **{header}**")
                                 
-                        # Отображаем вторую половину
-                        with col_b:
-                            for i, header in enumerate(second_half, half_length + 1):
-                                st.markdown(f"{i}. **{header}**")
+                            # Отображаем вторую половину
+                            with col_b:
+                                for i, header in enumerate(second_half, half_length + 1):
+                                    st.markdown(f"{i}. **{header}**")
+                        else:
+                            st.warning("Заголовки не найдены. Попробуйте изменить номер строки заголовков.")
                     else:
-                        st.warning("Заголовки не найдены. Попробуйте изменить номер строки заголовков.")
-                else:
-                    st.error("Подходящий лист не найден в файле.")
+                        st.error("Подходящий лист не найден в файле.")
         else:
             st.warning("Файл шаблона Wildberries не найден в директории assets.")
             
@@ -116,56 +113,59 @@ with col2:
             ozon_file = template_files[1]  # Берем второй файл, если не нашли подходящего
         
         if ozon_file:
+            from utils import load_excel_file
+            
             with open(ozon_file, "rb") as f:
-                workbook, sheets = load_excel_file(f)
-                
-                # Ищем лист "Шаблон"
-                target_sheet = None
-                for sheet_name in sheets:
-                    if sheet_name.lower() == "шаблон":
-                        target_sheet = sheet_name
-                        break
+                workbook, sheets = load_excel_file(f, streaming=True)
+                # Книга закрывается и при ошибке чтения
+                with workbook:
+                    # Ищем лист "Шаблон"
+                    target_sheet = None
+                    for sheet_name in sheets:
+                        if sheet_name.lower() == "шаблон":
+                            target_sheet = sheet_name
+                            break
                 
-                if target_sheet is None and len(sheets) > 0:
-                    target_sheet = sheets[0]
+                    if target_sheet is None and len(sheets) > 0:
+                        target_sheet = sheets[0]
                 
-                if target_sheet:
-                    st.success(f"Файл: {os.path.basename(ozon_file)}, Лист: {target_sheet}")
+                    if target_sheet:
+                        st.success(f"Файл: {os.path.basename(ozon_file)}, Лист: {target_sheet}")
                     
-                    # Получаем заголовки (обычно во 2-й строке для Ozon)
-                    sheet = workbook[target_sheet]
-                    header_row = 2  # Типичная строка для заголовков Ozon
+                        # Получаем заголовки (обычно во 2-й строке для Ozon)
+                        sheet = workbook[target_sheet]
+                        header_row = 2  # Типичная строка для заголовков Ozon
                     
-                    headers = []
-                    for cell in sheet[header_row]:
-                        if cell.value is not None and str(cell.value).strip() != "":
-                            headers.append(str(cell.value))
+                        headers = []
+                        for value in sheet.header_row(header_row):
+                            if value is not None and str(value).strip() != "":
+                                headers.append(str(value))
                     
-                    # Отображаем заголовки в два столбика
-                    if headers:
-                        st.markdown("#### Заголовки колонок:")
+                        # Отображаем заголовки в два столбика
+                        if headers:
+                            st.markdown("#### Заголовки колонок:")
                         
-                        # Разделяем заголовки на две колонки
-                        half_length = len(headers) // 2 + len(headers) % 2  # Первая колонка может быть на 1 больше
-                        first_half = headers[:half_length]
-                        second_half = headers[half_length:]
+                            # Разделяем заголовки на две колонки
+                            half_length = len(headers) // 2 + len(headers) % 2  # Первая колонка может быть на 1 больше
+                            first_half = headers[:half_length]
+                            second_half = headers[half_length:]
                         
-                        # Создаем колонки
-                        col_a, col_b = st.columns(2)
+                            # Создаем колонки
+                            col_a, col_b = st.columns(2)
                         
-                        # Отображаем первую половину
-                        with col_a:
-                            for i, header in enumerate(first_half, 1):
-                                st.markdown(f"{i}. **{header}**")
+                            # Отображаем первую половину
+                            with col_a:
+                                for i, header in enumerate(first_half, 1):
+                                    st.markdown(f"{i}. **{header}**")
                                 
-                        # Отображаем вторую половину
-                        with col_b:
-                            for i, header in enumerate(second_half, half_length + 1):
-                                st.markdown(f"{i}. **{header}**")
+                            # Отображаем вторую половину
+                            with col_b:
+                                for i, header in enumerate(second_half, half_length + 1):
+                                    st.markdown(f"{i}. **{header}**")
+                        else:
+                            st.warning("Заголовки не найдены. Попробуйте изменить номер строки заголовков.")
                     else:
-                        st.warning("Заголовки не найдены. Попробуйте изменить номер строки заголовков.")
-                else:
-                    st.error("Подходящий лист не найден в файле.")
+                        st.error("Подходящий лист не найден в файле.")
         else:
             st.warning("Файл шаблона Ozon не найден в директории assets.")
             
@@ -237,8 +237,7 @@ mapping_data.append({
 
 # Отображаем таблицу
 if mapping_data:
-    mapping_df = pd.DataFrame(mapping_data)
-    st.dataframe(mapping_df, use_container_width=True, hide_index=True)
+    st.dataframe(mapping_data, use_container_width=True, hide_index=True)
 
 # Добавляем кнопку для скачивания шаблона маппинга
 st.subheader("📥 Скачать шаблон для маппинга")
@@ -254,6 +253,9 @@ download_col1, download_col2 = st.columns([1, 1])
 with download_col1:
     # Создаем Excel файл с шаблоном маппинга
     def create_mapping_template():
+        import io
+        import pandas as pd
+        
         # Создаем DataFrame для маппинга
         wb_headers = []
         oz_headers = []
@@ -0,0 +1,322 @@
+"""
+Потоковая конвертация таблицы товаров частями фиксированного размера.
+
+Файл читается построчно (openpyxl в режиме read-only), каждая часть строк
+конвертируется скомпилированным планом и сразу дописывается в потоковую
+запись XLSX, поэтому потребление памяти определяется размером части,
+а не размером файла. Уже прочитанная таблица (например, из кэша загрузок)
+конвертируется так же частями через convert_frame, без повторного чтения.
+
+Примеры:
+    python stream_convert.py catalog.xlsx --target Ozon
+    python stream_convert.py big.xlsx --target Wildberries --source Ozon --chunk-rows 5000 --output out.xlsx
+"""
+import argparse
+import io
+import itertools
+import os
+import sys
+import time
+import zipfile
+
+import pandas as pd
+
+from excel_writer import CHUNK_ROWS, WRITER_BACKENDS, append_dataframe, append_header, open_book_writer
+from marketplace_detection import detect_marketplace_from_headers
+from utils import (FULL_COLUMN_MAPS, canonical_column_fields, convert_table_format, get_conversion_plan,
+                   load_excel_file)
+
+
+def _column_names(header):
+    # Названия колонок как у pd.read_excel: пустые - "Unnamed: N", повторы - "X.1", "X.2"
+    while header and header[-1] in (None, ""):
+        header = header[:-1]
+    names = []
+    seen = {}
+    for idx, value in enumerate(header):
+        name = f"Unnamed: {idx}" if value in (None, "") else value
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+
+def _is_xlsx(source):
+    # XLSX - zip-архив; старые .xls openpyxl построчно не читает
+    is_zip = zipfile.is_zipfile(source)
+    if hasattr(source, "seek"):
+        source.seek(0)
+    return is_zip
+
+
+def iter_table_chunks(source, chunk_rows=CHUNK_ROWS, sheet_name=None, header_row=1):
+    """
+    Читает таблицу частями по chunk_rows строк
+
+    Первая часть выдается всегда (пустая, если строк с данными нет), чтобы по
+    ней можно было определить колонки. Полностью пустые строки пропускаются,
+    как и в pd.read_excel.
+
+    Args:
+        source: Путь к файлу или файловый объект
+        chunk_rows: Количество строк в части
+        sheet_name: Имя листа (по умолчанию - первый лист)
+        header_row: Номер строки с заголовками (начиная с 1)
+
+    Returns:
+        Generator: DataFrame с очередной частью строк
+    """
+    if hasattr(source, "seek"):
+        source.seek(0)
+
+    if not _is_xlsx(source):
+        # Для .xls потоковое чтение недоступно: файл читается целиком и отдается частями
+        df = pd.read_excel(source, sheet_name=sheet_name or 0, header=header_row - 1)
+        yield df.iloc[:chunk_rows]
+        for start in range(chunk_rows, len(df), chunk_rows):
+            yield df.iloc[start:start + chunk_rows]
+        return
+
+    workbook, sheets = load_excel_file(source, streaming=True)
+    with workbook:
+        sheet = workbook[sheet_name or sheets[0]]
+        columns = _column_names(sheet.header_row(header_row))
+        width = len(columns)
+        padding = (None,) * width
+
+        rows = (
+            (row + padding)[:width]
+            for row in sheet.data_rows(header_row)
+            if any(value is not None for value in row[:width])
+        )
+        first = True
+        while True:
+            batch = list(itertools.islice(rows, chunk_rows))
+            if not batch and not first:
+                return
+            yield pd.DataFrame.from_records(batch, columns=columns)
+            first = False
+            if len(batch) < chunk_rows:
+                return
+
+
+def convert_chunks(chunks, source_marketplace, target_marketplace, column_mapping=None, conversion_date=None,
+                   column_fields=None):
+    """
+    Конвертирует части таблицы по одному плану
+
+    Приведение типов колонок решается один раз (по умолчанию - по первой части,
+    см. canonical_column_fields) и одинаково применяется ко всем частям, чтобы
+    колонка не оказалась числовой в одних частях и текстовой в других.
+
+    Args:
+        chunks: Итератор DataFrame с частями исходной таблицы
+        source_marketplace: Исходный маркетплейс
+        target_marketplace: Целевой маркетплейс
+        column_mapping: Необязательное переименование колонок источника
+        conversion_date: Дата конвертации (одна на весь файл)
+        column_fields: Приведение типов, решенное для всей таблицы
+
+    Returns:
+        Generator: Конвертированные части
+    """
+    if conversion_date is None:
+        conversion_date = pd.Timestamp.now().strftime("%Y-%m-%d %H:%M:%S")
+    for chunk in chunks:
+        if column_fields is None:
+            column_fields = canonical_column_fields(chunk, source_marketplace, target_marketplace, column_mapping)
+        yield convert_table_format(chunk, source_marketplace, target_marketplace, column_mapping, conversion_date,
+                                   column_fields)
+
+
+def iter_frame_chunks(df, chunk_rows=CHUNK_ROWS):
+    """
+    Делит уже прочитанную таблицу на части по chunk_rows строк (без копирования)
+
+    Как и iter_table_chunks, первая часть выдается всегда.
+
+    Args:
+        df: DataFrame с данными
+        chunk_rows: Количество строк в части
+
+    Returns:
+        Generator: DataFrame с очередной частью строк
+    """
+    yield df.iloc[:chunk_rows]
+    for start in range(chunk_rows, len(df), chunk_rows):
+        yield df.iloc[start:start + chunk_rows]
+
+
+def write_converted_chunks(chunks, output, target_marketplace, source_marketplace=None, column_mapping=None,
+                           backend=None, type_sample=None):
+    """
+    Конвертирует части таблицы и дописывает их в один XLSX-файл
+
+    Args:
+        chunks: Итератор DataFrame с частями исходной таблицы (первая часть обязательна)
+        output: Путь или файловый объект для результата
+        target_marketplace: Целевой маркетплейс
+        source_marketplace: Исходный маркетплейс (None - определяется по заголовкам)
+        column_mapping: Необязательное переименование колонок источника
+        backend: Бэкенд записи XLSX (None - автоматический выбор)
+        type_sample: Таблица, по которой решается приведение типов колонок
+            (по умолчанию - первая часть)
+
+    Returns:
+        dict: Исходный и целевой маркетплейсы, число строк и частей
+    """
+    first = next(chunks)
+    if source_marketplace is None:
+        source_marketplace = detect_marketplace_from_headers(tuple(str(col) for col in first.columns))
+    if source_marketplace is None:
+        raise ValueError("Не удалось определить формат маркетплейса")
+
+    # Ошибки сопоставления выявляются до начала записи, а не в каждой части
+    plan = get_conversion_plan(source_marketplace, target_marketplace)
+    if plan is None:
+        raise ValueError(f"Не удалось найти маппинг для {source_marketplace} или {target_marketplace}")
+    columns = list(first.columns)
+    if column_mapping:
+        columns = [column_mapping.get(col, col) for col in columns]
+    if all(pos is None for pos in plan.resolve(columns)):
+        raise ValueError(f"Ошибка при конвертации из {source_marketplace} в {target_marketplace}: "
+                         f"ни одна колонка не сопоставлена")
+
+    column_fields = canonical_column_fields(first if type_sample is None else type_sample, source_marketplace,
+                                            target_marketplace, column_mapping)
+    stats = {"source": source_marketplace, "target": target_marketplace, "rows": 0, "chunks": 0}
+    converted_chunks = convert_chunks(itertools.chain([first], chunks), source_marketplace,
+                                      target_marketplace, column_mapping, column_fields=column_fields)
+    writer = open_book_writer(output, backend)
+    try:
+        sheet = writer.add_sheet("Sheet1")
+        for converted in converted_chunks:
+            if stats["chunks"] == 0:
+                append_header(writer, sheet, converted.columns)
+            stats["rows"] += append_dataframe(writer, sheet, converted)
+            stats["chunks"] += 1
+    finally:
+        writer.close()
+    return stats
+
+
+def convert_stream(source, output, target_marketplace, source_marketplace=None, column_mapping=None,
+                   sheet_name=None, header_row=1, chunk_rows=CHUNK_ROWS, backend=None):
+    """
+    Конвертирует Excel-файл в формат другого маркетплейса, не загружая его целиком
+
+    Args:
+        source: Путь к исходному файлу или файловый объект
+        output: Путь или файловый объект для результата
+        target_marketplace: Целевой маркетплейс
+        source_marketplace: Исходный маркетплейс (None - определяется по заголовкам)
+        column_mapping: Необязательное переименование колонок источника
+        sheet_name: Имя листа (по умолчанию - первый лист)
+        header_row: Номер строки с заголовками (начиная с 1)
+        chunk_rows: Количество строк в части
+        backend: Бэкенд записи XLSX (None - автоматический выбор)
+
+    Returns:
+        dict: Исходный и целевой маркетплейсы, число строк и частей
+    """
+    chunks = iter_table_chunks(source, chunk_rows, sheet_name, header_row)
+    try:
+        return write_converted_chunks(chunks, output, target_marketplace, source_marketplace, column_mapping, backend)
+    finally:
+        chunks.close()
+
+
+def convert_frame(df, output, target_marketplace, source_marketplace=None, column_mapping=None,
+                  chunk_rows=CHUNK_ROWS, backend=None):
+    """
+    Конвертирует уже прочитанную таблицу частями: в памяти одновременно
+    находится только одна конвертированная часть, а файл повторно не читается
+
+    Args:
+        df: DataFrame с исходной таблицей
+        output: Путь или файловый объект для результата
+        target_marketplace: Целевой маркетплейс
+        source_marketplace: Исходный маркетплейс (None - определяется по заголовкам)
+        column_mapping: Необязательное переименование колонок источника
+        chunk_rows: Количество строк в части
+        backend: Бэкенд записи XLSX (None - автоматический выбор)
+
+    Returns:
+        dict: Исходный и целевой маркетплейсы, число строк и частей
+    """
+    # Таблица уже в памяти, поэтому типы колонок решаются по ней целиком, как при
+    # конвертации без частей
+    return write_converted_chunks(iter_frame_chunks(df, chunk_rows), output, target_marketplace,
+                                  source_marketplace, column_mapping, backend, type_sample=df)
+
+
+def convert_stream_to_bytes(source, target_marketplace, **kwargs):
+    """
+    Потоковая конвертация с результатом в виде байтов XLSX-файла
+
+    Args:
+        source: Путь к исходному файлу или файловый объект
+        target_marketplace: Целевой маркетплейс
+        **kwargs: Параметры convert_stream
+
+    Returns:
+        bytes: Содержимое XLSX-файла
+    """
+    output = io.BytesIO()
+    convert_stream(source, output, target_marketplace, **kwargs)
+    return output.getvalue()
+
+
+def convert_frame_to_bytes(df, target_marketplace, **kwargs):
+    """
+    Конвертация прочитанной таблицы частями с результатом в виде байтов XLSX-файла
+
+    Args:
+        df: DataFrame с исходной таблицей
+        target_marketplace: Целевой маркетплейс
+        **kwargs: Параметры convert_frame
+
+    Returns:
+        bytes: Содержимое XLSX-файла
+    """
+    output = io.BytesIO()
+    convert_frame(df, output, target_marketplace, **kwargs)
+    return output.getvalue()
+
+
+def main(argv=None):
+    marketplaces = list(FULL_COLUMN_MAPS)
+    parser = argparse.ArgumentParser(description="Потоковая конвертация таблицы товаров частями")
+    parser.add_argument("input", help="Путь к исходному Excel-файлу")
+    parser.add_argument("--target", required=True, choices=marketplaces, help="Целевой маркетплейс")
+    parser.add_argument("--source", choices=marketplaces, help="Исходный маркетплейс (по умолчанию определяется автоматически)")
+    parser.add_argument("--output", default=None, help="Путь к результату (по умолчанию <имя>_converted_to_<цель>.xlsx)")
+    parser.add_argument("--sheet", default=None, help="Имя листа (по умолчанию - первый)")
+    parser.add_argument("--header-row", type=int, default=1, help="Номер строки с заголовками")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS, help="Строк в одной части")
+    parser.add_argument("--backend", choices=WRITER_BACKENDS, default=None, help="Бэкенд записи XLSX")
+    args = parser.parse_args(argv)
+
+    output = args.output
+    if output is None:
+        stem = os.path.splitext(args.input)[0]
+        output = f"{stem}_converted_to_{args.target}.xlsx"
+
+    started = time.perf_counter()
+    try:
+        stats = convert_stream(args.input, output, args.target, args.source, sheet_name=args.sheet,
+                               header_row=args.header_row, chunk_rows=args.chunk_rows, backend=args.backend)
+    except Exception as e:
+        print(f"Ошибка конвертации: {e}", file=sys.stderr)
+        return 1
+
+    print(f"Готово: {stats['source']} -> {stats['target']}, {stats['rows']} строк в {stats['chunks']} частях "
+          f"за {round(time.perf_counter() - started, 3)} с. Результат: {output}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
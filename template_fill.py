@@ -0,0 +1,192 @@
+"""
+Заполнение шаблона маркетплейса данными из таблицы товаров.
+
+Лист и строка заголовков шаблона определяются по первым строкам листов
+(см. sheet_scan), колонки сопоставляются автоматически. Небольшие таблицы
+переносятся в загруженную книгу openpyxl - сохраняются объединенные ячейки,
+ширина колонок и проверки данных шаблона. Большие таблицы пишутся в потоковом
+режиме (stream_fill_template): память не растет с числом строк.
+
+Примеры:
+    python template_fill.py catalog.xlsx template.xlsx
+    python template_fill.py catalog.xlsx template.xlsx --sheet Шаблон --header-row 2 --output filled.xlsx
+"""
+import argparse
+import io
+import os
+import sys
+import time
+
+import pandas as pd
+
+from excel_writer import iter_dataframe_rows
+from sheet_scan import find_best_marketplace_sheet, read_sheet_heads
+from upload_cache import read_table
+from utils import (PREVIEW_ROWS, load_excel_file, map_columns_automatically, preview_data,
+                   stream_fill_template, transfer_data_between_tables)
+
+# Начиная с этого числа строк шаблон заполняется потоково
+FILL_STREAMING_MIN_ROWS = 10000
+
+
+def _open(source):
+    # Путь передается как есть, байты и загруженные файлы - через BytesIO
+    if isinstance(source, (str, os.PathLike)):
+        return source
+    if isinstance(source, bytes):
+        return io.BytesIO(source)
+    return io.BytesIO(source.getvalue())
+
+
+def locate_template(template_file):
+    """
+    Находит в шаблоне лист для заполнения и строку заголовков
+
+    Args:
+        template_file: Путь к шаблону, его байты или загруженный файл
+
+    Returns:
+        tuple: (имя листа, номер строки с заголовками начиная с 1)
+    """
+    sheet_name, _, header_row = find_best_marketplace_sheet(_open(template_file))
+    return sheet_name, header_row
+
+
+def template_columns(template_file, sheet_name, header_row):
+    """
+    Заголовки колонок шаблона без загрузки книги
+
+    Args:
+        template_file: Путь к шаблону, его байты или загруженный файл
+        sheet_name: Имя листа
+        header_row: Номер строки с заголовками (начиная с 1)
+
+    Returns:
+        list: Непустые заголовки в порядке колонок
+    """
+    rows = read_sheet_heads(_open(template_file), header_row, [sheet_name])[sheet_name]
+    header = rows[header_row - 1] if len(rows) >= header_row else []
+    return [value for value in header if value]
+
+
+def map_to_template(source_columns, template_file, sheet_name, header_row):
+    """
+    Автоматически сопоставляет колонки таблицы с заголовками шаблона
+
+    Args:
+        source_columns: Колонки исходной таблицы
+        template_file: Путь к шаблону, его байты или загруженный файл
+        sheet_name: Имя листа шаблона
+        header_row: Номер строки с заголовками
+
+    Returns:
+        dict: Соответствие {source_column: target_column}
+    """
+    return map_columns_automatically([str(col) for col in source_columns],
+                                     template_columns(template_file, sheet_name, header_row))
+
+
+def preview_template_fill(df, template_file, sheet_name, header_row, column_mapping, max_rows=PREVIEW_ROWS):
+    """
+    Предварительный просмотр заполненного шаблона: из шаблона читаются только
+    строки под заголовком (подзаголовок сохраняется в просмотре)
+
+    Args:
+        df: Исходная таблица
+        template_file: Путь к шаблону, его байты или загруженный файл
+        sheet_name: Имя листа шаблона
+        header_row: Номер строки с заголовками
+        column_mapping: Соответствие {source_column: target_column}
+        max_rows: Количество строк просмотра
+
+    Returns:
+        DataFrame: Просмотр в колонках шаблона
+    """
+    target_df = pd.read_excel(_open(template_file), sheet_name=sheet_name, header=header_row - 1, nrows=max_rows)
+    return preview_data(df, target_df, column_mapping, max_rows)
+
+
+def fill_template(df, template_file, output, column_mapping, sheet_name, header_row, streaming=None, backend=None):
+    """
+    Заполняет шаблон данными таблицы
+
+    Args:
+        df: Исходная таблица
+        template_file: Путь к шаблону, его байты или загруженный файл
+        output: Путь или файловый объект для результата
+        column_mapping: Соответствие {source_column: target_column}
+        sheet_name: Имя листа шаблона
+        header_row: Номер строки с заголовками
+        streaming: Потоковый режим (None - по размеру таблицы, см. FILL_STREAMING_MIN_ROWS)
+        backend: Бэкенд записи XLSX для потокового режима
+    """
+    if streaming is None:
+        streaming = len(df) >= FILL_STREAMING_MIN_ROWS
+    if streaming:
+        stream_fill_template(df.columns, iter_dataframe_rows(df), _open(template_file),
+                             sheet_name, column_mapping, output, header_row, backend)
+        return
+
+    workbook, _ = load_excel_file(_open(template_file))
+    try:
+        transfer_data_between_tables(df, workbook, sheet_name, column_mapping, header_row)
+        workbook.save(output)
+    finally:
+        workbook.close()
+
+
+def fill_template_bytes(df, template_file, column_mapping, sheet_name, header_row, **kwargs):
+    """
+    Заполнение шаблона с результатом в виде байтов XLSX-файла
+
+    Args:
+        df: Исходная таблица
+        template_file: Путь к шаблону, его байты или загруженный файл
+        column_mapping: Соответствие {source_column: target_column}
+        sheet_name: Имя листа шаблона
+        header_row: Номер строки с заголовками
+        **kwargs: Параметры fill_template
+
+    Returns:
+        bytes: Содержимое XLSX-файла
+    """
+    output = io.BytesIO()
+    fill_template(df, template_file, output, column_mapping, sheet_name, header_row, **kwargs)
+    return output.getvalue()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Заполнение шаблона маркетплейса данными из таблицы товаров")
+    parser.add_argument("input", help="Путь к таблице товаров")
+    parser.add_argument("template", help="Путь к шаблону маркетплейса")
+    parser.add_argument("--sheet", default=None, help="Лист шаблона (по умолчанию определяется автоматически)")
+    parser.add_argument("--header-row", type=int, default=None, help="Строка заголовков шаблона (начиная с 1)")
+    parser.add_argument("--output", default=None, help="Путь к результату (по умолчанию <шаблон>_filled.xlsx)")
+    parser.add_argument("--streaming", action=argparse.BooleanOptionalAction, default=None,
+                        help="Потоковый режим (по умолчанию - по размеру таблицы)")
+    args = parser.parse_args(argv)
+
+    output = args.output or f"{os.path.splitext(args.template)[0]}_filled.xlsx"
+
+    started = time.perf_counter()
+    with open(args.input, "rb") as f:
+        df, _, _, _ = read_table(f.read())
+    sheet_name, header_row = locate_template(args.template)
+    sheet_name = args.sheet or sheet_name
+    header_row = args.header_row or header_row
+
+    column_mapping = map_to_template(df.columns, args.template, sheet_name, header_row)
+    if not column_mapping:
+        print("Ни одна колонка таблицы не сопоставлена с заголовками шаблона", file=sys.stderr)
+        return 1
+    for source_col, target_col in column_mapping.items():
+        print(f"{source_col} -> {target_col}", file=sys.stderr)
+
+    fill_template(df, args.template, output, column_mapping, sheet_name, header_row, args.streaming)
+    print(f"Готово за {round(time.perf_counter() - started, 3)} с: {len(df)} строк таблицы, "
+          f"лист {sheet_name}. Результат: {output}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
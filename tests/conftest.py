@@ -0,0 +1,72 @@
+import os
+import sys
+
+# Модули проекта лежат в корне репозитория
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+ASSETS_DIR = os.path.join(ROOT_DIR, "attached_assets")
+
+
+def make_catalog(marketplace, n_rows):
+    """
+    Небольшой детерминированный каталог в формате маркетплейса: числовые поля
+    записаны строками с десятичной запятой, как в выгрузках поставщиков
+
+    Args:
+        marketplace: Название маркетплейса
+        n_rows: Количество строк
+
+    Returns:
+        pd.DataFrame: Каталог с колонками формата маркетплейса
+    """
+    import pandas as pd
+
+    from utils import CANONICAL_SCHEMA, FULL_COLUMN_MAPS
+
+    data = {}
+    for col, field in FULL_COLUMN_MAPS[marketplace].items():
+        kind = CANONICAL_SCHEMA.get(field, "string")
+        if kind == "float":
+            data[col] = [f"{row * 10},5" for row in range(n_rows)]
+        elif kind == "int":
+            data[col] = [str(row) for row in range(n_rows)]
+        elif kind == "category":
+            data[col] = [f"{field}-{row % 3}" for row in range(n_rows)]
+        else:
+            data[col] = [f"{field}-{row}" for row in range(n_rows)]
+    return pd.DataFrame(data)
+
+
+def make_template(path, n_sample_rows=1):
+    """
+    Шаблон маркетплейса в духе шаблонов Ozon: служебная строка, заголовки во
+    второй строке, строка подсказок и оформленные строки-примеры
+
+    Args:
+        path: Путь для сохранения шаблона
+        n_sample_rows: Количество строк-примеров под подсказками
+
+    Returns:
+        str: Путь к шаблону
+    """
+    import openpyxl
+    from openpyxl.styles import Font, PatternFill
+
+    workbook = openpyxl.Workbook()
+    instructions = workbook.active
+    instructions.title = "Инструкция"
+    instructions.append(["Заполните лист Шаблон"])
+
+    sheet = workbook.create_sheet("Шаблон")
+    sheet.append([None, "Основное"])
+    sheet.append(["Артикул*", "Название товара", "Цена, руб.*", "Бренд*"])
+    sheet.append(["Обязательное поле", None, "Обязательное поле", "Обязательное поле"])
+    for row in range(n_sample_rows):
+        sheet.append([f"SAMPLE-{row}", "Пример", 100 + row, "Бренд"])
+        for cell in sheet[sheet.max_row]:
+            cell.font = Font(bold=True)
+            cell.fill = PatternFill("solid", fgColor="FFFF00")
+        sheet.cell(row=sheet.max_row, column=3).number_format = "0.00"
+    workbook.save(path)
+    return str(path)
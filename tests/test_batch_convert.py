@@ -0,0 +1,103 @@
+import json
+
+import openpyxl
+import pandas as pd
+import pytest
+
+from batch_convert import collect_input_files, main, output_path_for
+from conftest import make_catalog
+
+TARGET = "Wildberries"
+
+
+def _write_catalog(path, marketplace, n_rows=4):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    make_catalog(marketplace, n_rows).to_excel(path, index=False)
+
+
+@pytest.fixture
+def input_tree(tmp_path):
+    root = tmp_path / "incoming"
+    # Файлы с одинаковыми именами в разных поддиректориях
+    _write_catalog(root / "ozon" / "catalog.xlsx", "Ozon", 4)
+    _write_catalog(root / "lemana" / "catalog.xlsx", "ЛеманПро", 3)
+    # Уже в целевом формате
+    _write_catalog(root / "wb.xlsx", "Wildberries", 2)
+
+    # Заголовки шаблона Ozon (определяется Ozon), но ни одна колонка не совпадает с форматом
+    workbook = openpyxl.Workbook()
+    workbook.active.append(["Артикул*", "Бренд*", "Цена, руб.*"])
+    workbook.active.append(["A-1", "Бренд", 100])
+    workbook.save(root / "template.xlsx")
+
+    (root / "broken.xlsx").write_bytes(b"not an excel file")
+    (root / "~$catalog.xlsx").write_bytes(b"lock file")
+    (root / "notes.txt").write_text("не Excel")
+    return root
+
+
+def test_batch_tree(input_tree, tmp_path):
+    output_dir = tmp_path / "out"
+    summary_path = tmp_path / "reports" / "nested" / "summary.json"
+    exit_code = main([str(input_tree / "**" / "*.xlsx"), str(input_tree / "*.xlsx"), "--target", TARGET,
+                      "--output-dir", str(output_dir), "--summary", str(summary_path), "--workers", "2"])
+
+    # Ошибки и несопоставленные файлы дают ненулевой код возврата
+    assert exit_code == 1
+    summary = json.loads(summary_path.read_text(encoding="utf-8"))
+    statuses = {item["file"][len(str(input_tree)) + 1:]: item["status"] for item in summary["results"]}
+    assert statuses == {
+        "broken.xlsx": "error",
+        "lemana/catalog.xlsx": "ok",
+        "ozon/catalog.xlsx": "ok",
+        "template.xlsx": "unmapped",
+        "wb.xlsx": "skipped",
+    }
+    assert (summary["files"], summary["converted"], summary["skipped"], summary["unmapped"], summary["failed"]) == (
+        5, 2, 1, 1, 1)
+
+    # Поддиректории исходных файлов повторяются в директории результатов
+    results = {item["file"]: item for item in summary["results"]}
+    for subdir, source, n_rows in [("ozon", "Ozon", 4), ("lemana", "ЛеманПро", 3)]:
+        item = results[str(input_tree / subdir / "catalog.xlsx")]
+        expected = output_dir / subdir / f"catalog_converted_to_{TARGET}.xlsx"
+        assert item["output"] == str(expected)
+        assert (item["source"], item["rows"]) == (source, n_rows)
+        converted = pd.read_excel(expected)
+        assert len(converted) == n_rows
+        assert converted["Исходный формат"].unique().tolist() == [source]
+
+    # Для пропущенных, несопоставленных и ошибочных файлов результат не пишется
+    written = sorted(path.relative_to(output_dir).as_posix() for path in output_dir.rglob("*.xlsx"))
+    assert written == [f"lemana/catalog_converted_to_{TARGET}.xlsx", f"ozon/catalog_converted_to_{TARGET}.xlsx"]
+    assert results[str(input_tree / "template.xlsx")]["output"] is None
+    assert results[str(input_tree / "broken.xlsx")]["error"]
+
+
+def test_default_summary_in_output_dir(tmp_path):
+    _write_catalog(tmp_path / "in" / "catalog.xlsx", "Ozon")
+    output_dir = tmp_path / "out" / "run"
+    assert main([str(tmp_path / "in"), "--target", TARGET, "--output-dir", str(output_dir), "--workers", "1"]) == 0
+    summary = json.loads((output_dir / "summary.json").read_text(encoding="utf-8"))
+    assert summary["converted"] == 1
+
+
+def test_unwritable_summary_fails_before_conversion(tmp_path):
+    _write_catalog(tmp_path / "in" / "catalog.xlsx", "Ozon")
+    (tmp_path / "file").write_text("")
+    output_dir = tmp_path / "out"
+    with pytest.raises(SystemExit):
+        main([str(tmp_path / "in"), "--target", TARGET, "--output-dir", str(output_dir),
+              "--summary", str(tmp_path / "file" / "summary.json")])
+    assert not output_dir.exists()
+
+
+def test_collect_input_files(input_tree):
+    files = collect_input_files([str(input_tree), str(input_tree / "*.xlsx")])
+    assert [path[len(str(input_tree)) + 1:] for path in files] == ["broken.xlsx", "template.xlsx", "wb.xlsx"]
+
+
+def test_output_path_mirrors_subdirectories(tmp_path):
+    path = tmp_path / "in" / "a" / "b" / "catalog.xlsx"
+    assert output_path_for(str(path), "Ozon", "out", str(tmp_path / "in")) == "out/a/b/catalog_converted_to_Ozon.xlsx"
+    assert output_path_for(str(path), "Ozon", "out") == "out/catalog_converted_to_Ozon.xlsx"
@@ -0,0 +1,89 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils import cast_canonical, convert_table_format
+
+
+def test_float_field_parses_text_numbers():
+    series = pd.Series(["12,5", "1 200", "3 400,25", None, ""], dtype=object)
+    typed = cast_canonical(series, "price")
+    assert typed.dtype == "float64"
+    assert typed.tolist()[:3] == [12.5, 1200.0, 3400.25]
+    assert typed.iloc[3:].isna().all()
+
+
+def test_float_field_keeps_numeric_column():
+    series = pd.Series([1.5, 2.0])
+    assert cast_canonical(series, "weight") is series
+
+
+def test_int_field_uses_nullable_int_for_integral_values():
+    typed = cast_canonical(pd.Series([1.0, np.nan, 3.0]), "stock")
+    assert typed.dtype == "Int64"
+    assert typed.tolist() == [1, pd.NA, 3]
+
+
+def test_int_field_keeps_fractional_values_as_float():
+    typed = cast_canonical(pd.Series(["1,5", "2"], dtype=object), "stock")
+    assert typed.dtype == "float64"
+    assert typed.tolist() == [1.5, 2.0]
+
+
+@pytest.mark.parametrize("values", [
+    # Текст в первых строках и текст после большого числа чисел
+    ["уточняется", "12,5", "3"],
+    ["12,5"] * 1500 + ["по запросу"],
+])
+def test_numeric_field_with_text_is_unchanged(values):
+    series = pd.Series(values, dtype=object)
+    assert cast_canonical(series, "price") is series
+
+
+def test_category_field():
+    typed = cast_canonical(pd.Series(["Бренд", "Бренд", "Другой"]), "brand")
+    assert isinstance(typed.dtype, pd.CategoricalDtype)
+    assert typed.tolist() == ["Бренд", "Бренд", "Другой"]
+
+
+@pytest.mark.parametrize("series", [
+    pd.Series(["SKU-1", "SKU-2"], dtype=object),
+    # Числовые штрихкоды остаются числами, как их прочитал pandas
+    pd.Series([4600000000001, 4600000000002]),
+    pd.Series([4600000000001.0, np.nan]),
+])
+def test_string_field_is_passed_through(series):
+    assert cast_canonical(series, "barcode") is series
+
+
+def test_unknown_field_is_unchanged():
+    series = pd.Series(["12,5"], dtype=object)
+    assert cast_canonical(series, None) is series
+    assert cast_canonical(series, "unknown") is series
+
+
+def test_converted_frame_types():
+    source = pd.DataFrame({
+        "Артикул": ["A-1", "A-2"],
+        "Штрихкод": [4600000000001, 4600000000002],
+        "Цена": ["12,5", "1 200"],
+        "Бренд": ["Бренд", "Бренд"],
+    })
+    converted = convert_table_format(source, "Ozon", "Wildberries")
+
+    text_columns = converted.select_dtypes(include=["string"]).columns
+    assert list(text_columns) == []
+    # Текстовые колонки делят строки с исходной таблицей
+    assert converted["Артикул поставщика"].iloc[0] is source["Артикул"].iloc[0]
+    assert converted["Баркод"].tolist() == [4600000000001, 4600000000002]
+    assert converted["Цена СП"].tolist() == [12.5, 1200.0]
+    assert isinstance(converted["Бренд"].dtype, pd.CategoricalDtype)
+
+
+def test_lenient_cast_keeps_text_values():
+    # strict=False - приведение по решению для всей таблицы (конвертация по частям)
+    series = pd.Series(["1,5", "", "по запросу", None], index=[0, 0, 1, 1], dtype=object)
+    typed = cast_canonical(series, "price", strict=False)
+    assert typed.iloc[0] == 1.5
+    assert typed.iloc[2] == "по запросу"
+    assert pd.isna(typed.iloc[1]) and pd.isna(typed.iloc[3])
@@ -0,0 +1,125 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from utils import map_columns_automatically, normalize_column_name, optimal_assignment, score_column_matrix
+
+
+def _brute_force_best(weights):
+    # Максимальная сумма весов перебором всех назначений
+    n_rows, n_cols = weights.shape
+    if n_rows <= n_cols:
+        return max(sum(weights[row, col] for row, col in enumerate(cols))
+                   for cols in itertools.permutations(range(n_cols), n_rows))
+    return max(sum(weights[row, col] for col, row in enumerate(rows))
+               for rows in itertools.permutations(range(n_rows), n_cols))
+
+
+@pytest.mark.parametrize("shape", [(1, 1), (3, 3), (4, 6), (6, 4), (5, 5), (2, 7)])
+def test_assignment_is_optimal(shape):
+    rng = np.random.default_rng(sum(shape))
+    for _ in range(20):
+        weights = rng.integers(0, 100, size=shape).astype(float)
+        pairs = optimal_assignment(weights)
+
+        assert len(pairs) == min(shape)
+        assert len({row for row, _ in pairs}) == len({col for _, col in pairs}) == len(pairs)
+        assert pairs == sorted(pairs)
+        assert sum(weights[row, col] for row, col in pairs) == _brute_force_best(weights)
+
+
+def test_assignment_beats_greedy():
+    # Жадный выбор взял бы пару (0, 0) с весом 90 и оставил 1 -> 1 с весом 0
+    weights = np.array([[90, 80], [85, 0]])
+    assert optimal_assignment(weights) == [(0, 1), (1, 0)]
+
+
+def test_assignment_empty():
+    assert optimal_assignment(np.zeros((0, 3))) == []
+
+
+def test_score_matrix_shape_and_prefix_bonus():
+    scores = score_column_matrix(["цвет", "вес товара"], ["цвет", "вес упаковки", "бренд"])
+    assert scores.shape == (2, 3)
+    # Полное совпадение короткого названия получает бонус за начало строки
+    assert scores[0, 0] == scores.max()
+    assert scores[1, 1] > scores[1, 2]
+
+
+def test_fuzzy_columns_are_assigned_once():
+    mapping = map_columns_automatically(
+        ["Материал корпуса", "Страна изготовления", "Гарантийный срок"],
+        ["Гарантия, мес", "Материал", "Страна-изготовитель"],
+    )
+    assert mapping == {"Материал корпуса": "Материал", "Страна изготовления": "Страна-изготовитель",
+                       "Гарантийный срок": "Гарантия, мес"}
+    assert len(set(mapping.values())) == len(mapping)
+
+
+def test_threshold_leaves_unrelated_columns_unmapped():
+    mapping = map_columns_automatically(["Артикул продавца", "Штрихкод"], ["Артикул*", "Видео"])
+    assert mapping == {"Артикул продавца": "Артикул*"}
+
+
+# Ожидаемые значения получены вложенной функцией нормализации из
+# map_columns_automatically до ее выноса на уровень модуля
+@pytest.mark.parametrize("col_name, expected", [
+    # Маркеры обязательности и знаки препинания
+    ("Артикул*", "артикул"),
+    ("Артикул!", "артикул"),
+    ("Цена, руб.*", "цена"),
+    ("№ п/п", "п п"),
+    ("Цена+НДС", "ценандс"),
+    ("Описание — полное", "описание полное"),
+    ("Штрих-код", "штрих-код"),
+    ("EAN-13", "ean-"),
+    ("Ед. изм.", "ед. изм."),
+    # Буква ё не заменяется на е
+    ("Ёмкость", "ёмкость"),
+    ("Объём, мл", "объём"),
+    # Единицы измерения через запятую и в скобках
+    ("Вес, г", "вес"),
+    ("Высота, см", "высота"),
+    ("НДС, %", "ндс"),
+    ("Цена со скидкой, ₽", "со скидкой"),
+    ("Вес (кг)", "вес"),
+    ("Ширина (см)", "ширина"),
+    ("Цена (руб.)", "цена"),
+    ("Вес брутто (кг)", "брутто"),
+    ("Размер (RU)", "ru"),
+    ("Цвет (основной)", "цвет основной"),
+    ("Габариты (Д×Ш×В), см", "габариты д ш в"),
+    # Префиксы и суффиксы снимаются по одному разу
+    ("Длина упаковки, мм", "упаковки"),
+    ("Вес товара, г", "товара"),
+    ("Код товара", "код"),
+    ("Тип товара", "тип"),
+    # Повторяющиеся пробелы и переносы строк
+    ("Наименование  товара", "название"),
+    ("Название\nтовара", "название"),
+    ("  Бренд  ", "бренд"),
+    ("Вес   в  упаковке", "в упаковке"),
+    # Сокращения и синонимы
+    ("Кол-во", "количество"),
+    ("Кол во", "количество"),
+    ("Кол. шт", "кол."),
+    ("арт", "артикул"),
+    ("наимен", "название"),
+    ("Наим.", "наим."),
+    ("хар-ки", "характеристики"),
+    ("Фото", "изображение"),
+    ("Штрихкод", "баркод"),
+    ("SKU", "артикул"),
+    ("Остаток", "количество"),
+    ("Производитель", "бренд"),
+    ("Торговая марка", "бренд"),
+    ("Масса", "вес"),
+    ("Розничная цена", "цена"),
+    ("marketSku", "marketsku"),
+    # Не строки
+    (123, "123"),
+    (None, "none"),
+])
+def test_normalize_column_name(col_name, expected):
+    assert normalize_column_name(col_name) == expected
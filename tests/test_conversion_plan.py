@@ -0,0 +1,185 @@
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import utils
+from conftest import make_catalog
+from excel_writer import write_dataframe
+from utils import (CANONICAL_SCHEMA, CONVERSION_PLANS, FULL_COLUMN_MAPS, ConversionPlan, _broadcast_constant,
+                   compile_conversion_plan, convert_table_format)
+
+SOURCE_MAP = {"Код": "product_id", "Артикул": "sku", "Старый артикул": "sku", "Вес, кг": "weight"}
+TARGET_MAP = {"ID": "product_id", "SKU": "sku", "Вес, г": "weight", "Бренд": "brand"}
+
+
+@pytest.fixture
+def plan():
+    return compile_conversion_plan(SOURCE_MAP, TARGET_MAP, "Все инструменты", "Ozon")
+
+
+def test_compiled_plan_layout(plan):
+    assert plan.target_columns == ("ID", "SKU", "Вес, г", "Бренд")
+    assert plan.fields == ("product_id", "sku", "weight", "brand")
+    # При дублировании поля в маппинге приоритет у последней колонки
+    assert plan.source_candidates == (("Код",), ("Старый артикул", "Артикул"), ("Вес, кг",), ())
+    # Вес пересчитывается из кг в г, остальные поля - без пересчета
+    assert plan.unit_factors == (None, None, 1000, None)
+    assert plan.optional_columns == frozenset()
+    assert plan.default_value == ""
+
+
+def test_duplicate_target_field_keeps_last_column():
+    # Как и в обратном маппинге старой конвертации: колонка, указанная последней, побеждает
+    plan = compile_conversion_plan({"A": "sku"}, {"Артикул": "sku", "Артикул продавца": "sku"}, "Ozon", "Ozon")
+    assert plan.target_columns == ("Артикул продавца",)
+
+
+@pytest.mark.parametrize("columns, expected", [
+    (["Код", "Артикул", "Старый артикул", "Вес, кг"], [0, 2, 3, None]),
+    (["Вес, кг", "Артикул", "Код"], [2, 1, 0, None]),
+    (["Старый артикул"], [None, 0, None, None]),
+    ([], [None, None, None, None]),
+    (["Прочее"], [None, None, None, None]),
+])
+def test_resolve_positions(plan, columns, expected):
+    assert plan.resolve(columns) == expected
+
+
+def test_resolve_duplicate_columns_takes_first(plan):
+    assert plan.resolve(["Артикул", "Код", "Артикул"]) == [1, 0, None, None]
+
+
+def test_plan_is_immutable(plan):
+    assert isinstance(plan, ConversionPlan)
+    with pytest.raises(AttributeError):
+        plan.default_value = "-"
+
+
+def test_registry_covers_every_pair():
+    assert set(CONVERSION_PLANS) == {(source, target) for source in FULL_COLUMN_MAPS for target in FULL_COLUMN_MAPS}
+    for (source, target), plan in CONVERSION_PLANS.items():
+        assert (plan.source_marketplace, plan.target_marketplace) == (source, target)
+        assert set(plan.target_columns) == set(FULL_COLUMN_MAPS[target])
+        assert len(plan.source_candidates) == len(plan.fields) == len(plan.unit_factors) == len(plan.target_columns)
+
+
+CONVERSION_DATE = "2024-01-01 00:00:00"
+
+
+def _typed_catalog(marketplace, n_rows):
+    # Числовые поля уже числами: сравнивается только раскладка колонок
+    df = make_catalog(marketplace, n_rows)
+    for col, field in FULL_COLUMN_MAPS[marketplace].items():
+        kind = CANONICAL_SCHEMA.get(field)
+        if kind == "float":
+            df[col] = [row * 10 + 0.5 for row in range(n_rows)]
+        elif kind == "int":
+            df[col] = list(range(n_rows))
+    return df
+
+
+def _legacy_convert(df, source_marketplace, target_marketplace):
+    # convert_table_format до компиляции планов: промежуточная таблица
+    # унифицированных полей и поколоночная сборка результата
+    source_map = FULL_COLUMN_MAPS[source_marketplace]
+    target_reverse_map = {v: k for k, v in FULL_COLUMN_MAPS[target_marketplace].items()}
+
+    df_unified = pd.DataFrame()
+    for src_col, unified_col in source_map.items():
+        if src_col in df.columns:
+            df_unified[unified_col] = df[src_col]
+
+    df_target = pd.DataFrame()
+    for unified_col, target_col in target_reverse_map.items():
+        if unified_col in df_unified.columns:
+            df_target[target_col] = df_unified[unified_col]
+        else:
+            df_target[target_col] = ""
+
+    df_target["Исходный формат"] = source_marketplace
+    df_target["Целевой формат"] = target_marketplace
+    df_target["Дата конвертации"] = CONVERSION_DATE
+    return df_target
+
+
+def _values(df):
+    return df.astype(object).where(df.notna(), None).values.tolist()
+
+
+def _xlsx_frame(df):
+    output = io.BytesIO()
+    write_dataframe(df, output)
+    return pd.read_excel(io.BytesIO(output.getvalue()))
+
+
+@pytest.fixture
+def base_plans(monkeypatch):
+    # Планы без пользовательских маппингов из data/mappings.json, как в старой конвертации
+    monkeypatch.setattr(utils, "get_conversion_plan", lambda source, target: CONVERSION_PLANS.get((source, target)))
+
+
+@pytest.mark.parametrize("source, target, dropped", [
+    ("Ozon", "Wildberries", []),
+    ("Wildberries", "ЛеманПро", ["Бренд", "Вес"]),
+    ("Яндекс.Маркет", "СберМегаМаркет", ["stock", "url", "description"]),
+    ("СберМегаМаркет", "Яндекс.Маркет", ["Категория"]),
+])
+def test_projection_matches_legacy_conversion(base_plans, source, target, dropped):
+    df = _typed_catalog(source, 7).drop(columns=dropped)
+    actual = convert_table_format(df, source, target, conversion_date=CONVERSION_DATE)
+    expected = _legacy_convert(df, source, target)
+
+    assert actual.columns.tolist() == expected.columns.tolist()
+    assert _values(actual) == _values(expected)
+    pd.testing.assert_frame_equal(_xlsx_frame(actual), _xlsx_frame(expected))
+
+
+def test_constant_columns_are_categorical(base_plans):
+    df = _typed_catalog("Wildberries", 5).drop(columns=["Бренд"])
+    converted = convert_table_format(df, "Wildberries", "Ozon", conversion_date=CONVERSION_DATE)
+
+    constant_columns = ["Бренд", "Исходный формат", "Целевой формат", "Дата конвертации"]
+    for col in constant_columns:
+        assert isinstance(converted[col].dtype, pd.CategoricalDtype)
+        assert converted[col].cat.categories.tolist() == [converted[col].iloc[0]]
+    assert converted[constant_columns].astype(object).values.tolist() == [
+        ["", "Wildberries", "Ozon", CONVERSION_DATE]] * 5
+    # Колонки с источником остаются типами источника
+    assert converted["Артикул"].dtype == object
+
+
+def test_optional_columns_follow_source():
+    plan = utils.get_conversion_plan("Ozon", "Wildberries")
+    assert "Цена, руб." in plan.optional_columns
+
+    df = _typed_catalog("Ozon", 3)
+    converted = convert_table_format(df, "Ozon", "Wildberries", conversion_date=CONVERSION_DATE)
+    # Необязательная колонка без источника не выводится, в отличие от обычной ("Размер")
+    assert "Цена, руб." not in converted.columns
+    assert converted["Размер"].astype(object).tolist() == [""] * 3
+    # С источником - выводится на своем месте плана
+    assert converted["Артикул продавца"].tolist() == df["Артикул"].tolist()
+
+    df["Розничная цена"] = [100.0, 200.0, 300.0]
+    converted = convert_table_format(df, "Ozon", "Wildberries", conversion_date=CONVERSION_DATE)
+    assert converted["Цена, руб."].tolist() == [100.0, 200.0, 300.0]
+    assert converted.columns.get_loc("Цена, руб.") < converted.columns.get_loc("Исходный формат")
+
+
+def test_empty_table_keeps_columns(base_plans):
+    df = _typed_catalog("Ozon", 0)
+    converted = convert_table_format(df, "Ozon", "ЛеманПро", conversion_date=CONVERSION_DATE)
+    assert converted.empty
+    assert converted.columns.tolist() == _legacy_convert(df, "Ozon", "ЛеманПро").columns.tolist()
+
+
+@pytest.mark.parametrize("n_rows", [0, 1, 1000])
+def test_broadcast_constant(n_rows):
+    column = _broadcast_constant("Ozon", n_rows)
+    assert isinstance(column, pd.Categorical)
+    assert len(column) == n_rows
+    assert column.categories.tolist() == ["Ozon"]
+    assert column.codes.dtype == np.int8
+    assert list(column) == ["Ozon"] * n_rows
@@ -0,0 +1,60 @@
+import io
+
+import openpyxl
+import pandas as pd
+import pytest
+
+import excel_writer
+from conftest import make_catalog
+from excel_writer import WRITER_BACKENDS, dataframe_to_excel_bytes, write_dataframe
+
+
+def _header_style(cell):
+    return {
+        "bold": cell.font.bold,
+        "border": [side.style for side in (cell.border.left, cell.border.right, cell.border.top, cell.border.bottom)],
+        "horizontal": cell.alignment.horizontal,
+        "vertical": cell.alignment.vertical,
+    }
+
+
+@pytest.fixture
+def frame():
+    df = make_catalog("Ozon", 15)
+    df["Цена"] = [row + 0.5 for row in range(len(df))]
+    df["Остаток"] = pd.array([row if row % 4 else None for row in range(len(df))], dtype="Int64")
+    df.loc[3, "Бренд"] = None
+    return df
+
+
+def test_backends_write_same_values_and_header(frame):
+    files = {backend: dataframe_to_excel_bytes(frame, backend=backend) for backend in WRITER_BACKENDS}
+
+    frames = {backend: pd.read_excel(io.BytesIO(data)) for backend, data in files.items()}
+    pd.testing.assert_frame_equal(frames["xlsxwriter"], frames["openpyxl"])
+    assert frames["openpyxl"].columns.tolist() == frame.columns.tolist()
+    # Пустые значения записываются пустыми ячейками, а не текстом или ошибкой
+    assert frames["openpyxl"]["Бренд"].isna().tolist() == frame["Бренд"].isna().tolist()
+
+    styles = {}
+    for backend, data in files.items():
+        sheet = openpyxl.load_workbook(io.BytesIO(data)).active
+        styles[backend] = [_header_style(cell) for cell in sheet[1]]
+    assert styles["xlsxwriter"] == styles["openpyxl"]
+    assert styles["openpyxl"][0] == {"bold": True, "border": ["thin"] * 4, "horizontal": "center", "vertical": "top"}
+
+
+@pytest.mark.parametrize("backend", WRITER_BACKENDS)
+def test_rows_past_excel_limit_are_rejected(frame, backend, monkeypatch):
+    # Заголовок + 15 строк не помещаются в лист из 10 строк
+    monkeypatch.setattr(excel_writer, "EXCEL_MAX_ROWS", 10)
+    with pytest.raises(ValueError, match="10 строк"):
+        write_dataframe(frame, io.BytesIO(), backend=backend)
+
+
+@pytest.mark.parametrize("backend", WRITER_BACKENDS)
+def test_rows_up_to_excel_limit_are_written(frame, backend, monkeypatch):
+    monkeypatch.setattr(excel_writer, "EXCEL_MAX_ROWS", len(frame) + 1)
+    output = io.BytesIO()
+    assert write_dataframe(frame, output, backend=backend) == len(frame)
+    assert len(pd.read_excel(io.BytesIO(output.getvalue()))) == len(frame)
@@ -0,0 +1,55 @@
+import io
+import zipfile
+
+import pandas as pd
+import pytest
+
+from conftest import make_catalog
+from excel_writer import write_dataframe
+from fanout_convert import convert_to_all, convert_to_all_file, target_file_name
+from utils import FULL_COLUMN_MAPS, convert_table_format
+
+
+def _read_entry(archive, name):
+    return pd.read_excel(io.BytesIO(archive.read(name)))
+
+
+@pytest.mark.parametrize("source", ["Ozon", "Wildberries"])
+def test_archive_matches_single_conversions(source):
+    df = make_catalog(source, 20)
+    output = io.BytesIO()
+    files = convert_to_all(df, source, output, workers=3)
+
+    targets = [marketplace for marketplace in FULL_COLUMN_MAPS if marketplace != source]
+    assert [item["target"] for item in files] == targets
+
+    with zipfile.ZipFile(output) as archive:
+        # Файлы лежат в архиве в порядке целевых форматов
+        assert archive.namelist() == [target_file_name(source, target) for target in targets]
+        for item in files:
+            actual = _read_entry(archive, item["file"])
+            # Дата конвертации общая для всех файлов архива - последняя служебная колонка
+            conversion_date = actual.iloc[0, -1]
+            expected_bytes = io.BytesIO()
+            write_dataframe(convert_table_format(df, source, item["target"], conversion_date=conversion_date),
+                            expected_bytes)
+            expected = pd.read_excel(io.BytesIO(expected_bytes.getvalue()))
+            pd.testing.assert_frame_equal(actual, expected)
+            assert item["rows"] == len(df)
+
+
+def test_archive_file_is_readable_from_start():
+    df = make_catalog("Ozon", 5)
+    targets = ["Wildberries", "Яндекс.Маркет"]
+    archive_file = convert_to_all_file(df, "Ozon", targets=targets)
+    try:
+        assert isinstance(archive_file, io.RawIOBase)
+        with zipfile.ZipFile(io.BytesIO(archive_file.read())) as archive:
+            assert archive.namelist() == [target_file_name("Ozon", target) for target in targets]
+    finally:
+        archive_file.close()
+
+
+def test_no_targets():
+    with pytest.raises(ValueError):
+        convert_to_all(make_catalog("Ozon", 1), "Ozon", io.BytesIO(), targets=[])
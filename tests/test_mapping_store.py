@@ -0,0 +1,99 @@
+import json
+import os
+
+import pytest
+
+from mapping_store import MappingStore, parse_pair_key
+from utils import CONVERSION_PLANS
+
+PAIR = ("Ozon", "Wildberries")
+
+
+@pytest.fixture
+def mappings_path(tmp_path):
+    return tmp_path / "mappings.json"
+
+
+def _write(path, mappings, mtime_ns=None):
+    path.write_text(json.dumps(mappings, ensure_ascii=False), encoding="utf-8")
+    if mtime_ns is not None:
+        # Разные mtime независимо от разрешения часов файловой системы
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+@pytest.mark.parametrize("key, expected", [
+    ("Озон → Вайлдберриз", ("Ozon", "Wildberries")),
+    ("wb -> Яндекс Маркет", ("Wildberries", "Яндекс.Маркет")),
+    ("Озон → Неизвестный", None),
+    ("Озон, Вайлдберриз", None),
+])
+def test_parse_pair_key(key, expected):
+    assert parse_pair_key(key) == expected
+
+
+def test_missing_file_uses_base_plans(mappings_path):
+    store = MappingStore(CONVERSION_PLANS, path=str(mappings_path))
+    assert store.get_plan(*PAIR) is CONVERSION_PLANS[PAIR]
+    assert store.version == 0
+
+
+def test_overrides_are_applied(mappings_path):
+    _write(mappings_path, {"Озон → Вайлдберриз": {"Мой артикул": "Артикул продавца", "Заметка": "Комментарий"}})
+    store = MappingStore(CONVERSION_PLANS, path=str(mappings_path))
+
+    plan = store.get_plan(*PAIR)
+    idx = plan.target_columns.index("Артикул продавца")
+    assert plan.source_candidates[idx][0] == "Мой артикул"
+    # Неизвестная формату колонка добавляется в конец как необязательная
+    assert plan.target_columns[-1] == "Комментарий"
+    assert "Комментарий" in plan.optional_columns
+    assert plan.version == store.version == 1
+    # Остальные пары не меняются, кроме версии
+    assert store.get_plan("Wildberries", "Ozon").target_columns == CONVERSION_PLANS[("Wildberries", "Ozon")].target_columns
+
+
+def test_unchanged_file_is_not_reread(mappings_path, monkeypatch):
+    _write(mappings_path, {"Озон → Вайлдберриз": {"Мой артикул": "Артикул продавца"}})
+    store = MappingStore(CONVERSION_PLANS, path=str(mappings_path))
+    plan = store.get_plan(*PAIR)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("файл маппингов перечитан без изменений")
+
+    monkeypatch.setattr(store, "_read_mappings", fail)
+    assert store.refresh() is False
+    assert store.get_plan(*PAIR) is plan
+
+
+def test_changed_file_is_reloaded(mappings_path):
+    _write(mappings_path, {"Озон → Вайлдберриз": {"Мой артикул": "Артикул продавца"}}, mtime_ns=10 ** 18)
+    store = MappingStore(CONVERSION_PLANS, path=str(mappings_path))
+    store.get_plan(*PAIR)
+
+    _write(mappings_path, {"Озон → Вайлдберриз": {"Другой артикул": "Артикул продавца"}}, mtime_ns=2 * 10 ** 18)
+    plan = store.get_plan(*PAIR)
+
+    assert plan.source_candidates[plan.target_columns.index("Артикул продавца")][0] == "Другой артикул"
+    assert plan.version == store.version == 2
+
+
+def test_broken_file_keeps_previous_plans(mappings_path):
+    _write(mappings_path, {"Озон → Вайлдберриз": {"Мой артикул": "Артикул продавца"}}, mtime_ns=10 ** 18)
+    store = MappingStore(CONVERSION_PLANS, path=str(mappings_path))
+    plan = store.get_plan(*PAIR)
+
+    mappings_path.write_text("{не json", encoding="utf-8")
+    os.utime(mappings_path, ns=(2 * 10 ** 18, 2 * 10 ** 18))
+
+    assert store.refresh() is False
+    assert store.get_plan(*PAIR) is plan
+    assert store.version == 1
+
+
+def test_invalid_entries_are_skipped(mappings_path):
+    _write(mappings_path, {"Неизвестно → Озон": {"A": "B"}, "Озон → Вайлдберриз": ["не словарь"]})
+    store = MappingStore(CONVERSION_PLANS, path=str(mappings_path))
+
+    plan = store.get_plan(*PAIR)
+    assert plan.target_columns == CONVERSION_PLANS[PAIR].target_columns
+    assert plan.version == 1
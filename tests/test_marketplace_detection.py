@@ -0,0 +1,53 @@
+import os
+
+import pandas as pd
+import pytest
+
+from conftest import ASSETS_DIR
+from marketplace_detection import detect_marketplace_from_file, detect_marketplace_from_signature
+from utils import FULL_COLUMN_MAPS
+
+# Файл -> (маркетплейс, лист, строка заголовков)
+EXPECTED = {
+    "15.04.2025_05.04_Общие характеристики одним файлом.xlsx": ("Wildberries", "Товары", 3),
+    "2025-04-01 Тачка садовая.xlsx": ("Ozon", "Шаблон", 2),
+    "АТЁМ ШАБЛОН.xlsx": (None, "Распределительные коробки", 4),
+    "Загрузка контента от 2025-04-18 в 17-41-43.xlsx": (None, "Данные", 2),
+    "Тачки садовые.xlsx": ("Wildberries", "Товары", 3),
+    "файл с товарами.xlsx": ("Яндекс.Маркет", "Список товаров", 2),
+    "шаблон для категории Тачки садовые_11615744_18-04-2025 (1).xlsx": ("Яндекс.Маркет", "Данные о товарах", 4),
+}
+
+
+@pytest.mark.parametrize("file_name", sorted(EXPECTED))
+def test_detect_marketplace_from_file(file_name):
+    assert detect_marketplace_from_file(os.path.join(ASSETS_DIR, file_name)) == EXPECTED[file_name]
+
+
+def test_all_assets_covered():
+    assets = {name for name in os.listdir(ASSETS_DIR) if name.endswith(".xlsx")}
+    assert assets == set(EXPECTED)
+
+
+@pytest.mark.parametrize("marketplace", sorted(FULL_COLUMN_MAPS))
+def test_signature_detects_own_formats(marketplace):
+    assert detect_marketplace_from_signature(FULL_COLUMN_MAPS[marketplace]) == marketplace
+
+
+@pytest.mark.parametrize("marketplace", sorted(FULL_COLUMN_MAPS))
+def test_detect_own_format_file(marketplace, tmp_path):
+    # Файлы, выгруженные приложением, определяются по своим заголовкам
+    path = tmp_path / "catalog.xlsx"
+    pd.DataFrame([["1"] * len(FULL_COLUMN_MAPS[marketplace])], columns=list(FULL_COLUMN_MAPS[marketplace])).to_excel(path, index=False)
+    assert detect_marketplace_from_file(str(path)) == (marketplace, "Sheet1", 1)
+
+
+def test_signature_rejects_shared_headers():
+    # Общих для нескольких маркетплейсов заголовков недостаточно
+    assert detect_marketplace_from_signature(["Артикул", "Наименование", "Цена", "Бренд"]) is None
+    # Похожие, но не совпадающие заголовки не засчитываются
+    assert detect_marketplace_from_signature(["Код", "Артикул продавца", "Наименование товара", "Цена, руб."]) is None
+
+
+def test_unreadable_file():
+    assert detect_marketplace_from_file(b"not a zip") == (None, None, 1)
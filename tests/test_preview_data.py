@@ -0,0 +1,87 @@
+import openpyxl
+import pandas as pd
+
+from conftest import make_template
+from utils import preview_data, transfer_data_between_tables
+
+TARGET_COLUMNS = ["Артикул*", "Название товара", "Цена, руб.*", "Ссылка на главное фото*",
+                  "Ссылки на дополнительные фото"]
+MAPPING = {"Артикул продавца": "Артикул*", "Наименование": "Название товара", "Цена": "Цена, руб.*",
+           "Фото": "Ссылка на главное фото*"}
+
+
+def _source(n_rows, subheader=False):
+    df = pd.DataFrame({
+        "Артикул продавца": [f"A-{row}" for row in range(n_rows)],
+        "Наименование": [f"Товар {row}" if row % 3 else None for row in range(n_rows)],
+        "Цена": [row * 1.5 for row in range(n_rows)],
+        "Фото": [f"http://img/{row}/1.jpg; http://img/{row}/2.jpg" for row in range(n_rows)],
+    })
+    if subheader:
+        head = pd.DataFrame([{"Артикул продавца": "Уникальный артикул", "Наименование": "Название",
+                              "Цена": "Цена в рублях", "Фото": "Ссылки через точку с запятой"}])
+        df = pd.concat([head, df], ignore_index=True)
+    return df
+
+
+def _target(subheader=False):
+    rows = [["Обязательное поле", "Не более 200 символов", "Обязательное поле", "Ссылка", "Ссылки"]] if subheader else []
+    return pd.DataFrame(rows, columns=TARGET_COLUMNS)
+
+
+def test_preview_is_bounded():
+    preview = preview_data(_source(10000), _target(), MAPPING, max_rows=7)
+    assert list(preview.columns) == TARGET_COLUMNS
+    assert len(preview) == 7
+    assert list(preview["Артикул*"]) == [f"A-{row}" for row in range(7)]
+    assert len(preview_data(_source(3), _target(), MAPPING, max_rows=7)) == 3
+
+
+def test_preview_values_are_strings_or_none():
+    preview = preview_data(_source(6), _target(), MAPPING)
+    assert preview["Цена, руб.*"].iloc[2] == "3.0"
+    assert preview["Название товара"].iloc[0] is None
+    # Несопоставленные колонки шаблона остаются пустыми
+    assert preview["Ссылки на дополнительные фото"].isna().all()
+    assert all(value is None or isinstance(value, str) for value in preview.to_numpy().ravel())
+
+
+def test_preview_subheaders():
+    # Подзаголовок источника пропускается, подзаголовок шаблона остается первой строкой
+    preview = preview_data(_source(20, subheader=True), _target(subheader=True), MAPPING, max_rows=5)
+    assert len(preview) == 5
+    assert preview["Артикул*"].iloc[0] == "Обязательное поле"
+    assert list(preview["Артикул*"].iloc[1:]) == ["A-0", "A-1", "A-2", "A-3"]
+
+
+def test_bounded_preview_is_head_of_full_preview():
+    source = _source(50, subheader=True)
+    full = preview_data(source, _target(subheader=True), MAPPING, max_rows=None)
+    bounded = preview_data(source, _target(subheader=True), MAPPING, max_rows=12)
+    assert len(full) == 51
+    pd.testing.assert_frame_equal(bounded, full.head(12))
+
+
+def test_preview_matches_transferred_values(tmp_path):
+    # Просмотр показывает то же, что запишет перенос в шаблон
+    template = make_template(tmp_path / "template.xlsx")
+    mapping = {"Артикул продавца": "Артикул*", "Наименование": "Название товара", "Цена": "Цена, руб.*"}
+    source = _source(8)
+    target_df = pd.read_excel(template, sheet_name="Шаблон", header=1)
+
+    preview = preview_data(source, target_df, mapping, max_rows=None)
+
+    workbook = openpyxl.load_workbook(template)
+    transfer_data_between_tables(source, workbook, "Шаблон", mapping, target_header_row=2)
+    sheet = workbook["Шаблон"]
+    for row_offset in range(len(preview)):
+        for col_idx, column in enumerate(preview.columns, start=1):
+            value = sheet.cell(row=3 + row_offset, column=col_idx).value
+            assert preview[column].iloc[row_offset] == (None if value is None else str(value))
+    workbook.close()
+
+
+def test_preview_splits_photo_links():
+    mapping = {"Фото": "Ссылка на главное фото*", "Артикул продавца": "Артикул*"}
+    preview = preview_data(_source(3), _target(), mapping)
+    assert preview["Ссылка на главное фото*"].iloc[1] == "http://img/1/1.jpg"
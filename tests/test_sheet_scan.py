@@ -0,0 +1,80 @@
+import os
+
+import pytest
+
+from conftest import ASSETS_DIR
+from sheet_scan import find_best_marketplace_sheet, select_header_row
+
+OZON_HEADERS = ["Артикул*", "Название товара", "Цена, руб.*", "Бренд*"]
+WB_HEADERS = ["Артикул продавца", "Баркод", "Номенклатура", "Предмет"]
+YANDEX_HEADERS = ["Ваш SKU *", "Название товара *", "Бренд *", "Штрихкод *"]
+
+
+@pytest.mark.parametrize("sheet_name", ["Шаблон", "шаблон", "ШАБЛОН"])
+def test_ozon_template_shortcut(sheet_name):
+    # На листе "Шаблон" вторая строка с ключевыми заголовками Ozon выбирается сразу,
+    # даже если ниже есть строка с большим числом совпадений
+    rows = [["", "Основное"], OZON_HEADERS[:2], OZON_HEADERS + ["Ссылка на главное фото*"]]
+    assert select_header_row(rows, sheet_name) == (2, "ozon", 2)
+
+
+def test_ozon_shortcut_needs_template_sheet_and_indicators():
+    rows = [["", "Основное"], OZON_HEADERS[:2], OZON_HEADERS]
+    # На другом листе - обычное правило: строка с наибольшим числом совпадений
+    assert select_header_row(rows, "Лист1") == (4, "ozon", 3)
+    # Одного ключевого заголовка на второй строке мало
+    assert select_header_row([["Подсказка"], ["Артикул*", "Прочее"], OZON_HEADERS], "Шаблон") == (4, "ozon", 3)
+
+
+@pytest.mark.parametrize("rows, expected", [
+    ([WB_HEADERS], (3, "wildberries", 1)),
+    ([["Инструкция"], ["Заполните поля ниже"], WB_HEADERS], (3, "wildberries", 3)),
+    ([["Основные параметры"], YANDEX_HEADERS], (3, "yandex", 2)),
+    # При равном числе совпадений побеждает более ранняя строка
+    ([WB_HEADERS[:2], OZON_HEADERS[:2]], (2, "wildberries", 1)),
+    ([WB_HEADERS[:2], OZON_HEADERS], (4, "ozon", 2)),
+])
+def test_indicator_rule(rows, expected):
+    assert select_header_row(rows) == expected
+
+
+@pytest.mark.parametrize("headers", [
+    # Общие для нескольких форматов заголовки маркетплейс не определяют
+    ["Наименование", "Цена", "Артикул", "Бренд"],
+    # Одного ключевого заголовка недостаточно
+    ["Артикул продавца", "Цена", "Остаток"],
+])
+def test_shared_or_single_indicators_do_not_detect(headers):
+    score, marketplace, row = select_header_row([["Каталог поставщика"], headers])
+    assert marketplace is None and row == 2
+
+
+@pytest.mark.parametrize("rows, expected_row", [
+    # Строка с наибольшим числом коротких подписей
+    ([["Примечание: заполните желтые ячейки"], ["GUID", "Наименование", "Бренд"], ["1", "Товар", "Бренд"]], 2),
+    # Длинные пояснения и числа подписями не считаются
+    ([["x" * 61, "y" * 61, "z" * 61], ["Код", "Цена"], ["1", "2,5"]], 2),
+    ([["10", "20", "30"], ["Код", "Цена"]], 2),
+    # При равенстве - более ранняя строка
+    ([["Код", "Цена"], ["Товар", "Бренд"]], 1),
+    # Без строк с двумя подписями - первая строка
+    ([["Каталог"], ["1", "2"], []], 1),
+    ([], 1),
+])
+def test_label_fallback(rows, expected_row):
+    assert select_header_row(rows) == (0, None, expected_row)
+
+
+@pytest.mark.parametrize("file_name, expected", [
+    ("2025-04-01 Тачка садовая.xlsx", ("Шаблон", "ozon", 2)),
+    ("Тачки садовые.xlsx", ("Товары", "wildberries", 3)),
+    ("15.04.2025_05.04_Общие характеристики одним файлом.xlsx", ("Товары", "wildberries", 3)),
+    # Шаблоны Яндекс.Маркета: заголовки под служебными строками
+    ("файл с товарами.xlsx", ("Список товаров", "yandex", 2)),
+    ("шаблон для категории Тачки садовые_11615744_18-04-2025 (1).xlsx", ("Данные о товарах", "yandex", 4)),
+    # Без ключевых заголовков: строка подписей под примечаниями и группой колонок
+    ("АТЁМ ШАБЛОН.xlsx", ("Распределительные коробки", "other", 4)),
+    ("Загрузка контента от 2025-04-18 в 17-41-43.xlsx", ("Данные", "other", 2)),
+])
+def test_best_sheet_on_attached_workbooks(file_name, expected):
+    assert find_best_marketplace_sheet(os.path.join(ASSETS_DIR, file_name)) == expected
@@ -0,0 +1,127 @@
+import io
+
+import pandas as pd
+import pytest
+
+import stream_convert
+from conftest import make_catalog
+from excel_writer import write_dataframe
+from stream_convert import (convert_frame, convert_frame_to_bytes, convert_stream, iter_frame_chunks,
+                            iter_table_chunks, write_converted_chunks)
+from utils import convert_table_format
+
+SOURCE = "Ozon"
+TARGET = "Wildberries"
+
+
+def _xlsx_bytes(df):
+    output = io.BytesIO()
+    write_dataframe(df, output)
+    return output.getvalue()
+
+
+def _full_conversion(df, conversion_date):
+    converted = convert_table_format(df, SOURCE, TARGET, conversion_date=conversion_date)
+    return pd.read_excel(io.BytesIO(_xlsx_bytes(converted)))
+
+
+@pytest.fixture
+def catalog():
+    return make_catalog(SOURCE, 23)
+
+
+@pytest.mark.parametrize("chunk_rows", [1, 5, 23, 100])
+def test_stream_matches_full_conversion(catalog, chunk_rows):
+    output = io.BytesIO()
+    stats = convert_stream(io.BytesIO(_xlsx_bytes(catalog)), output, TARGET, SOURCE, chunk_rows=chunk_rows)
+    actual = pd.read_excel(io.BytesIO(output.getvalue()))
+
+    assert stats["rows"] == len(catalog)
+    # Дата конвертации - последняя служебная колонка, одна на весь файл
+    assert actual.iloc[:, -1].nunique() == 1
+    pd.testing.assert_frame_equal(actual, _full_conversion(pd.read_excel(io.BytesIO(_xlsx_bytes(catalog))),
+                                                           actual.iloc[0, -1]))
+
+
+@pytest.mark.parametrize("chunk_rows", [1, 5, 100])
+def test_frame_chunks_match_full_conversion(catalog, chunk_rows):
+    output = io.BytesIO()
+    stats = convert_frame(catalog, output, TARGET, SOURCE, chunk_rows=chunk_rows)
+    actual = pd.read_excel(io.BytesIO(output.getvalue()))
+
+    assert stats["chunks"] == max(1, -(-len(catalog) // chunk_rows))
+    pd.testing.assert_frame_equal(actual, _full_conversion(catalog, actual.iloc[0, -1]))
+
+
+def test_table_chunks_match_read_excel(catalog):
+    data = _xlsx_bytes(catalog)
+    chunks = list(iter_table_chunks(io.BytesIO(data), chunk_rows=10))
+    assert [len(chunk) for chunk in chunks] == [10, 10, 3]
+    expected = pd.read_excel(io.BytesIO(data), dtype=object)
+    actual = pd.concat(chunks, ignore_index=True)
+    pd.testing.assert_frame_equal(actual.astype(str), expected.astype(str))
+
+
+def test_empty_frame_yields_one_chunk(catalog):
+    chunks = list(iter_frame_chunks(catalog.iloc[:0]))
+    assert len(chunks) == 1 and chunks[0].empty
+
+
+@pytest.mark.parametrize("chunk_rows", [1, 3, 4, 100])
+def test_column_types_do_not_depend_on_chunks(chunk_rows):
+    # Цена записана текстом с запятой, в середине таблицы - нечисловое значение:
+    # колонка остается текстовой во всех частях, как и при конвертации целиком
+    source = "Все инструменты"
+    df = make_catalog(source, 10)
+    df.loc[4, "Цена"] = "по запросу"
+    df.loc[7, "Вес (кг)"] = None
+
+    data = convert_frame_to_bytes(df, "Ozon", source_marketplace=source, chunk_rows=chunk_rows)
+    actual = pd.read_excel(io.BytesIO(data))
+    expected = convert_table_format(df, source, "Ozon", conversion_date=actual.iloc[0, -1])
+
+    assert actual["Цена"].tolist() == df["Цена"].tolist()
+    # Вес без текста разбирается как число и пересчитывается в граммы во всех частях
+    assert actual["Вес упаковки, г"].dropna().tolist() == [row * 10000.0 + 500 for row in range(10) if row != 7]
+    pd.testing.assert_frame_equal(actual, pd.read_excel(io.BytesIO(_xlsx_bytes(expected))))
+
+
+def test_stream_types_are_decided_by_first_chunk():
+    # При чтении файла частями решение принимается по первой части:
+    # текст в поздней части не теряется, остальные значения - числа
+    source = "Все инструменты"
+    df = make_catalog(source, 6)
+    df.loc[4, "Цена"] = "по запросу"
+
+    output = io.BytesIO()
+    convert_stream(io.BytesIO(_xlsx_bytes(df)), output, "Ozon", source, chunk_rows=3)
+    prices = pd.read_excel(io.BytesIO(output.getvalue()))["Цена"].tolist()
+
+    assert prices == [0.5, 10.5, 20.5, 30.5, "по запросу", 50.5]
+
+
+def test_writer_is_closed_on_error(catalog, monkeypatch):
+    writers = []
+    open_book_writer = stream_convert.open_book_writer
+
+    def tracking_writer(output, backend=None):
+        writer = open_book_writer(output, backend)
+        close = writer.close
+        writer.closed = False
+
+        def tracked_close():
+            writer.closed = True
+            close()
+
+        writer.close = tracked_close
+        writers.append(writer)
+        return writer
+
+    def broken_chunks():
+        yield catalog.iloc[:5]
+        raise RuntimeError("файл поврежден")
+
+    monkeypatch.setattr(stream_convert, "open_book_writer", tracking_writer)
+    with pytest.raises(RuntimeError):
+        write_converted_chunks(broken_chunks(), io.BytesIO(), TARGET, SOURCE)
+    assert [writer.closed for writer in writers] == [True]
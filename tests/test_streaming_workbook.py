@@ -0,0 +1,97 @@
+import io
+import re
+import zipfile
+
+import openpyxl
+import pytest
+
+from conftest import make_template
+from utils import LazySheet, StreamingWorkbook, load_excel_file
+
+
+@pytest.fixture
+def template_path(tmp_path):
+    return make_template(tmp_path / "template.xlsx", n_sample_rows=3)
+
+
+def _sheet_values(worksheet):
+    # Без размера листа строки read_only не дополняются пустыми ячейками до ширины листа
+    values = []
+    for row in worksheet.iter_rows(values_only=True):
+        row = list(row)
+        while row and row[-1] is None:
+            row.pop()
+        values.append(row)
+    return values
+
+
+def _with_wrong_dimension(path):
+    # Размер листа "A1", как в шаблонах Ozon
+    output = io.BytesIO()
+    with zipfile.ZipFile(path) as source, zipfile.ZipFile(output, "w") as target:
+        for item in source.infolist():
+            data = source.read(item.filename)
+            if item.filename.startswith("xl/worksheets/"):
+                data = re.sub(rb'<dimension ref="[^"]*"', b'<dimension ref="A1"', data)
+            target.writestr(item, data)
+    return io.BytesIO(output.getvalue())
+
+
+def test_streaming_load_matches_full_load(template_path):
+    full, full_sheets = load_excel_file(template_path)
+    with open(template_path, "rb") as f:
+        streaming, sheets = load_excel_file(f, streaming=True)
+        with streaming:
+            assert isinstance(streaming, StreamingWorkbook)
+            assert sheets == full_sheets == ["Инструкция", "Шаблон"]
+            for sheet in streaming:
+                assert isinstance(sheet, LazySheet)
+                assert _sheet_values(sheet) == _sheet_values(full[sheet.title])
+
+
+def test_header_row_and_data_rows(template_path):
+    workbook, _ = load_excel_file(template_path, streaming=True)
+    with workbook:
+        sheet = workbook["Шаблон"]
+        assert sheet.header_row(2) == ["Артикул*", "Название товара", "Цена, руб.*", "Бренд*"]
+        assert sheet.header_row() == [None, "Основное"]
+        # Строки за концом листа - пустой список, а не ошибка
+        assert sheet.header_row(100) == []
+
+        rows = list(sheet.data_rows(header_row=3))
+        assert [row[0] for row in rows] == ["SAMPLE-0", "SAMPLE-1", "SAMPLE-2"]
+        assert [row[2] for row in rows] == [100, 101, 102]
+
+
+def test_wrong_sheet_dimension_does_not_truncate_rows(template_path):
+    workbook, _ = load_excel_file(_with_wrong_dimension(template_path), streaming=True)
+    with workbook:
+        sheet = workbook["Шаблон"]
+        assert sheet.header_row(2) == ["Артикул*", "Название товара", "Цена, руб.*", "Бренд*"]
+        assert len(list(sheet.data_rows(header_row=3))) == 3
+
+
+def test_rows_with_styles(template_path):
+    workbook, _ = load_excel_file(template_path, streaming=True)
+    with workbook:
+        cells = next(workbook["Шаблон"].iter_rows(min_row=4, max_row=4, values_only=False))
+        assert cells[0].value == "SAMPLE-0"
+        assert cells[0].font.bold
+        assert cells[2].number_format == "0.00"
+
+
+def test_workbook_is_closed(template_path):
+    workbook, _ = load_excel_file(template_path, streaming=True)
+    archive = workbook.workbook._archive
+    with workbook:
+        assert archive.fp is not None
+    assert archive.fp is None
+
+    workbook, _ = load_excel_file(template_path, streaming=True)
+    workbook.close()
+    assert workbook.workbook._archive.fp is None
+
+
+def test_broken_file_error():
+    with pytest.raises(Exception, match="Ошибка при загрузке Excel файла"):
+        load_excel_file(io.BytesIO(b"not an excel file"), streaming=True)
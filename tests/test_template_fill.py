@@ -0,0 +1,104 @@
+import io
+import os
+
+import pandas as pd
+import pytest
+
+from conftest import ASSETS_DIR, make_template
+from template_fill import (fill_template, fill_template_bytes, locate_template, map_to_template,
+                           preview_template_fill)
+from utils import stream_fill_template
+
+MAPPING = {"Артикул продавца": "Артикул*", "Наименование": "Название товара", "Цена": "Цена, руб.*"}
+
+
+@pytest.fixture
+def source_df():
+    return pd.DataFrame({
+        "Артикул продавца": [f"A-{row}" for row in range(30)],
+        "Наименование": [f"Товар {row}" if row % 4 else None for row in range(30)],
+        "Цена": [float(row) * 10 for row in range(30)],
+    })
+
+
+@pytest.fixture
+def template_path(tmp_path):
+    return make_template(tmp_path / "template.xlsx")
+
+
+def _read_sheet(data, sheet_name="Шаблон", header_row=2):
+    return pd.read_excel(io.BytesIO(data), sheet_name=sheet_name, header=header_row - 1)
+
+
+def test_locate_template(template_path):
+    assert locate_template(template_path) == ("Шаблон", 2)
+
+
+def test_streaming_matches_workbook_fill(source_df, template_path):
+    in_memory = fill_template_bytes(source_df, template_path, MAPPING, "Шаблон", 2, streaming=False)
+    streamed = fill_template_bytes(source_df, template_path, MAPPING, "Шаблон", 2, streaming=True)
+
+    expected = _read_sheet(in_memory)
+    pd.testing.assert_frame_equal(_read_sheet(streamed), expected)
+    # Строка подсказок сохраняется, данные идут сразу под ней
+    assert expected["Артикул*"].iloc[0] == "Обязательное поле"
+    assert list(expected["Артикул*"].iloc[1:]) == list(source_df["Артикул продавца"])
+    # Пустые значения источника остаются пустыми ячейками
+    assert expected["Название товара"].iloc[1:].isna().sum() == source_df["Наименование"].isna().sum()
+    # Остальные листы шаблона переносятся
+    assert _read_sheet(streamed, "Инструкция", 1).columns[0] == "Заполните лист Шаблон"
+
+
+@pytest.mark.parametrize("backend", ["openpyxl", "xlsxwriter"])
+def test_stream_fill_backends(source_df, template_path, backend):
+    pytest.importorskip(backend)
+    output = io.BytesIO()
+    rows = stream_fill_template(source_df.columns, source_df.itertuples(index=False, name=None), template_path,
+                                "Шаблон", MAPPING, output, target_header_row=2, backend=backend)
+    assert rows == len(source_df)
+    assert list(_read_sheet(output.getvalue())["Цена, руб.*"].iloc[1:]) == list(source_df["Цена"])
+
+
+def test_stream_fill_closes_template_on_error(template_path):
+    class BrokenRows:
+        def __iter__(self):
+            raise RuntimeError("источник недоступен")
+
+    output = io.BytesIO()
+    with pytest.raises(RuntimeError):
+        stream_fill_template(["Артикул продавца"], BrokenRows(), template_path, "Шаблон", MAPPING, output, 2)
+    # Шаблон закрыт, файл можно удалить и на Windows
+    os.remove(template_path)
+
+
+def test_map_and_preview(source_df, template_path):
+    mapping = map_to_template(source_df.columns, template_path, "Шаблон", 2)
+    assert mapping["Артикул продавца"] == "Артикул*"
+
+    preview = preview_template_fill(source_df, template_path, "Шаблон", 2, MAPPING, max_rows=5)
+    assert list(preview.columns) == ["Артикул*", "Название товара", "Цена, руб.*", "Бренд*"]
+    assert len(preview) == 5
+    # Первая строка просмотра - подсказки шаблона
+    assert preview["Артикул*"].iloc[0] == "Обязательное поле"
+    assert list(preview["Артикул*"].iloc[1:]) == ["A-0", "A-1", "A-2", "A-3"]
+
+
+def test_fill_real_templates():
+    # Товары шаблона Ozon в шаблон Wildberries: оба режима дают одинаковый лист
+    source = os.path.join(ASSETS_DIR, "2025-04-01 Тачка садовая.xlsx")
+    template = os.path.join(ASSETS_DIR, "Тачки садовые.xlsx")
+    df = pd.read_excel(source, sheet_name="Шаблон", header=1)
+    sheet_name, header_row = locate_template(template)
+    mapping = map_to_template(df.columns, template, sheet_name, header_row)
+
+    in_memory = fill_template_bytes(df, template, mapping, sheet_name, header_row, streaming=False)
+    streamed = fill_template_bytes(df, template, mapping, sheet_name, header_row, streaming=True)
+    expected = _read_sheet(in_memory, sheet_name, header_row)
+    pd.testing.assert_frame_equal(_read_sheet(streamed, sheet_name, header_row), expected)
+    assert "KPD-161" in set(expected[mapping["Артикул*"]])
+
+
+def test_fill_template_to_path(source_df, template_path, tmp_path):
+    output = tmp_path / "filled.xlsx"
+    fill_template(source_df, template_path, str(output), MAPPING, "Шаблон", 2)
+    assert len(_read_sheet(output.read_bytes())) == len(source_df) + 1
@@ -0,0 +1,65 @@
+import json
+import logging
+
+import pytest
+
+from timing import StageTimer, stage_span
+
+
+def _logged_records(caplog):
+    return [json.loads(record.getMessage()) for record in caplog.records if record.name == "product_table_manager.timing"]
+
+
+def test_span_is_logged_as_json(caplog):
+    timer = StageTimer(run_id="run1")
+    with caplog.at_level(logging.INFO, logger="product_table_manager.timing"):
+        with timer.span("convert", tab="Ozon", rows=10):
+            pass
+
+    [record] = timer.records()
+    assert record["stage"] == "convert" and record["status"] == "ok"
+    assert record["tab"] == "Ozon" and record["rows"] == 10
+    assert record["ms"] >= 0
+    assert _logged_records(caplog) == [{"event": "stage", "run_id": "run1", **record}]
+
+
+def test_failed_stage_is_recorded_with_error_status(caplog):
+    timer = StageTimer(run_id="run2")
+    with caplog.at_level(logging.INFO, logger="product_table_manager.timing"):
+        with pytest.raises(ValueError):
+            with timer.span("read", file="broken.xlsx"):
+                raise ValueError("файл поврежден")
+
+    assert [record["status"] for record in timer.records()] == ["error"]
+    [logged] = _logged_records(caplog)
+    assert logged["status"] == "error" and logged["stage"] == "read" and logged["file"] == "broken.xlsx"
+
+
+def test_logged_values_are_serialized_as_text(caplog):
+    timer = StageTimer()
+    with caplog.at_level(logging.INFO, logger="product_table_manager.timing"):
+        with timer.span("export", file=object):
+            pass
+
+    [logged] = _logged_records(caplog)
+    assert logged["file"] == str(object)
+    assert logged["run_id"] == timer.run_id
+
+
+def test_spans_are_limited_and_summed():
+    timer = StageTimer(max_spans=2)
+    for stage in ("detect", "read", "align"):
+        with timer.span(stage):
+            pass
+
+    assert [record["stage"] for record in timer.records()] == ["read", "align"]
+    assert timer.total_ms() == round(sum(record["ms"] for record in timer.records()), 1)
+
+
+def test_stage_span_without_timer():
+    with stage_span(None, "read"):
+        pass
+    timer = StageTimer()
+    with stage_span(timer, "read", file="a.xlsx"):
+        pass
+    assert [record["file"] for record in timer.records()] == ["a.xlsx"]
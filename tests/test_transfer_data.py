@@ -0,0 +1,75 @@
+import openpyxl
+import pandas as pd
+import pytest
+from openpyxl.styles import Font
+
+from conftest import make_template
+from utils import transfer_data_between_tables
+
+MAPPING = {"Артикул продавца": "Артикул*", "Цена": "Цена, руб.*"}
+
+
+@pytest.fixture
+def workbook(tmp_path):
+    workbook = openpyxl.load_workbook(make_template(tmp_path / "template.xlsx", n_sample_rows=2))
+    yield workbook
+    workbook.close()
+
+
+@pytest.fixture
+def source_df():
+    return pd.DataFrame({"Артикул продавца": [f"A-{row}" for row in range(50)],
+                         "Цена": [float(row) for row in range(50)]})
+
+
+def _column(sheet, col_idx, first_row, last_row):
+    return [sheet.cell(row=row, column=col_idx) for row in range(first_row, last_row + 1)]
+
+
+def test_filled_cells_share_sample_row_style(workbook, source_df):
+    sheet = workbook["Шаблон"]
+    sample_styles = [list(sheet.cell(row=4, column=col)._style) for col in (1, 3)]
+
+    transfer_data_between_tables(source_df, workbook, "Шаблон", MAPPING, target_header_row=2)
+
+    for col_idx, sample_style in zip((1, 3), sample_styles):
+        cells = _column(sheet, col_idx, 4, 3 + len(source_df))
+        assert all(list(cell._style) == sample_style for cell in cells)
+    assert sheet.cell(row=4, column=1).value == "A-0"
+    assert sheet.cell(row=3 + len(source_df), column=3).value == 49.0
+    assert sheet.cell(row=53, column=3).number_format == "0.00"
+    assert sheet.cell(row=53, column=1).font.b
+
+
+def test_fill_adds_no_new_styles(workbook, source_df):
+    # Ячейки ссылаются на общие шрифты и заливки книги, а не создают свои
+    style_tables = (workbook._fonts, workbook._fills, workbook._number_formats, workbook._cell_styles)
+    sizes = [len(table) for table in style_tables]
+
+    transfer_data_between_tables(source_df, workbook, "Шаблон", MAPPING, target_header_row=2)
+
+    assert [len(table) for table in style_tables] == sizes
+
+
+def test_cell_styles_are_independent(workbook, source_df):
+    # Каждой ячейке достается своя копия массива стиля: изменение одной не задевает соседние
+    sheet = workbook["Шаблон"]
+    transfer_data_between_tables(source_df, workbook, "Шаблон", MAPPING, target_header_row=2)
+
+    sheet.cell(row=5, column=1).font = Font(italic=True)
+
+    assert sheet.cell(row=5, column=1).font.i
+    assert not sheet.cell(row=6, column=1).font.i
+    assert sheet.cell(row=6, column=1).font.b
+
+
+def test_hint_row_is_preserved(workbook, source_df):
+    sheet = workbook["Шаблон"]
+    hint_style = list(sheet.cell(row=3, column=1)._style)
+
+    transfer_data_between_tables(source_df, workbook, "Шаблон", MAPPING, target_header_row=2)
+
+    assert sheet.cell(row=3, column=1).value == "Обязательное поле"
+    assert list(sheet.cell(row=3, column=1)._style) == hint_style
+    # Колонки без сопоставления очищаются от строк-примеров шаблона
+    assert sheet.cell(row=5, column=4).value is None
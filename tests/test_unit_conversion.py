@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils import convert_table_format, convert_units, unit_conversion_factor
+
+
+@pytest.mark.parametrize("field, source, target, expected", [
+    ("weight", "Все инструменты", "Ozon", 1000),
+    ("weight", "Ozon", "Все инструменты", 0.001),
+    ("package_width", "Все инструменты", "ЛеманПро", 10),
+    ("package_length", "Ozon", "Все инструменты", 0.1),
+    # Одинаковые или неизвестные единицы не пересчитываются
+    ("weight", "Ozon", "ЛеманПро", None),
+    ("weight", "Wildberries", "Ozon", None),
+    ("price", "Все инструменты", "Ozon", None),
+])
+def test_unit_conversion_factor(field, source, target, expected):
+    assert unit_conversion_factor(field, source, target) == expected
+
+
+def test_convert_numeric_column():
+    converted = convert_units(pd.Series([1.1, 0.25, np.nan]), 1000)
+    assert converted.tolist()[:2] == [1100.0, 250.0]
+    assert np.isnan(converted.iloc[2])
+
+
+def test_convert_text_numbers():
+    # Десятичная запятая и пробелы-разделители разрядов
+    converted = convert_units(pd.Series(["1,5", "1 200", "2.25"]), 10)
+    assert converted.tolist() == [15.0, 12000.0, 22.5]
+
+
+def test_text_values_are_kept():
+    series = pd.Series(["1,5", "уточняется", None, ""])
+    converted = convert_units(series, 1000)
+    assert converted.tolist()[:2] == [1500.0, "уточняется"]
+    assert converted.iloc[2] is None
+    assert converted.iloc[3] == ""
+
+
+def test_convert_table_between_units():
+    source = pd.DataFrame({"Артикул": ["A-1", "A-2"], "Вес (кг)": ["1,25", "0,4"], "Ширина (см)": [12.5, 3]})
+
+    to_ozon = convert_table_format(source, "Все инструменты", "Ozon")
+    assert to_ozon["Вес упаковки, г"].tolist() == [1250.0, 400.0]
+    assert to_ozon["Ширина упаковки, мм"].tolist() == [125.0, 30.0]
+
+    back = convert_table_format(to_ozon, "Ozon", "Все инструменты")
+    assert back["Вес (кг)"].tolist() == [1.25, 0.4]
+    assert back["Ширина (см)"].tolist() == [12.5, 3.0]
+
+
+def test_no_conversion_without_known_units():
+    source = pd.DataFrame({"Артикул поставщика": ["A-1"], "Вес": [1.25]})
+    converted = convert_table_format(source, "Wildberries", "Ozon")
+    assert converted["Вес упаковки, г"].tolist() == [1.25]
@@ -0,0 +1,110 @@
+import io
+from unittest import mock
+
+import pandas as pd
+import pytest
+
+import upload_cache
+from conftest import make_catalog
+from timing import StageTimer
+from upload_cache import UploadCache, read_uploaded_table
+
+
+def test_lru_eviction_by_entries():
+    cache = UploadCache(max_bytes=1000, max_entries=2)
+    cache.put("a", {"name": "a"}, 10)
+    cache.put("b", {"name": "b"}, 10)
+    # Обращение к "a" делает самой давней запись "b"
+    assert cache.get("a") == {"name": "a"}
+    cache.put("c", {"name": "c"}, 10)
+
+    assert "a" in cache and "c" in cache and "b" not in cache
+    assert len(cache) == 2
+    assert cache.total_bytes == 20
+
+
+def test_eviction_by_size():
+    cache = UploadCache(max_bytes=100, max_entries=10)
+    cache.put("a", {}, 60)
+    cache.put("b", {}, 30)
+    cache.put("c", {}, 50)
+
+    assert list(cache._entries) == ["b", "c"]
+    assert cache.total_bytes == 80
+
+
+def test_oversized_entry_is_not_cached():
+    cache = UploadCache(max_bytes=100, max_entries=10)
+    cache.put("a", {}, 40)
+    cache.put("huge", {}, 101)
+
+    assert "huge" not in cache
+    assert "a" in cache
+    assert cache.total_bytes == 40
+
+
+def test_put_replaces_entry_size():
+    cache = UploadCache(max_bytes=100, max_entries=10)
+    cache.put("a", {"v": 1}, 40)
+    cache.put("a", {"v": 2}, 70)
+
+    assert cache.get("a") == {"v": 2}
+    assert cache.total_bytes == 70
+    assert len(cache) == 1
+
+
+def test_hit_and_miss_counters():
+    cache = UploadCache()
+    assert cache.get("missing") is None
+    cache.put("a", {}, 1)
+    cache.get("a")
+    cache.clear()
+
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert len(cache) == 0 and cache.total_bytes == 0
+
+
+@pytest.fixture
+def upload():
+    output = io.BytesIO()
+    make_catalog("Ozon", 5).to_excel(output, index=False)
+    return io.BytesIO(output.getvalue())
+
+
+def test_read_uploaded_table_parses_once(upload):
+    cache = UploadCache()
+    with mock.patch.object(upload_cache, "read_table", wraps=upload_cache.read_table) as read_table:
+        first = read_uploaded_table(upload, cache)
+        second = read_uploaded_table(io.BytesIO(upload.getvalue()), cache)
+
+    assert read_table.call_count == 1
+    assert second is first
+    assert first["n_rows"] == 5
+    assert first["detected_marketplace"] == "Ozon"
+    assert first["headers"] == [str(col) for col in first["df"].columns]
+    assert cache.total_bytes == upload_cache.estimate_entry_size(first["df"])
+
+
+def test_changed_upload_is_parsed_again(upload):
+    cache = UploadCache()
+    first = read_uploaded_table(upload, cache)
+
+    output = io.BytesIO()
+    make_catalog("Ozon", 7).to_excel(output, index=False)
+    second = read_uploaded_table(output, cache)
+
+    assert second["digest"] != first["digest"]
+    assert second["n_rows"] == 7
+    assert len(cache) == 2
+    pd.testing.assert_frame_equal(first["df"], read_uploaded_table(upload, cache)["df"])
+
+
+def test_detect_and_read_are_timed_separately(upload):
+    cache = UploadCache()
+    timer = StageTimer()
+    read_uploaded_table(upload, cache, timer=timer, file="catalog.xlsx")
+    read_uploaded_table(upload, cache, timer=timer, file="catalog.xlsx")
+
+    # Повторная загрузка берется из кэша и этапов не добавляет
+    assert [(record["stage"], record["file"]) for record in timer.records()] == [
+        ("detect", "catalog.xlsx"), ("read", "catalog.xlsx")]
@@ -0,0 +1,150 @@
+import io
+import os
+import zipfile
+
+import openpyxl
+import pytest
+
+import xlsx_sniffer
+from conftest import ASSETS_DIR
+from xlsx_sniffer import sniff_sheet_rows
+
+N_STRINGS = 3000
+
+WORKBOOK_RELS = """<?xml version="1.0" encoding="UTF-8"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>
+<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/sharedStrings" Target="/xl/sharedStrings.xml"/>
+</Relationships>"""
+
+WORKBOOK = """<?xml version="1.0" encoding="UTF-8"?>
+<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">
+<sheets><sheet name="Товары" sheetId="1" r:id="rId1"/></sheets>
+</workbook>"""
+
+
+def _shared_item(index, prefix):
+    # Разные виды элементов: пустой, с фонетикой, из нескольких фрагментов, со спецсимволами
+    tag = f"{prefix}si"
+    if index % 7 == 3:
+        return f"<{tag}/>"
+    if index % 7 == 5:
+        return (f"<{tag}><{prefix}r><{prefix}t>Часть {index} </{prefix}t></{prefix}r>"
+                f"<{prefix}r><{prefix}t>и &amp; &lt;хвост&gt;</{prefix}t></{prefix}r>"
+                f"<{prefix}rPh sb=\"0\" eb=\"1\"><{prefix}t>фонетика</{prefix}t></{prefix}rPh></{tag}>")
+    return f"<{tag}><{prefix}t xml:space=\"preserve\">Строка {index}\r\n{'x' * (index % 50)}</{prefix}t></{tag}>"
+
+
+def _expected_text(index):
+    if index % 7 == 3:
+        return ""
+    if index % 7 == 5:
+        return f"Часть {index} и & <хвост>"
+    return f"Строка {index}\n{'x' * (index % 50)}".strip()
+
+
+def _make_xlsx(referenced, prefix=""):
+    """
+    XLSX, собранный вручную: первая строка листа ссылается на строки
+    sharedStrings.xml с указанными индексами, вторая - число и логическое значение
+    """
+    namespace = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+    declaration = f'xmlns:{prefix[:-1]}="{namespace}"' if prefix else f'xmlns="{namespace}"'
+    items = "".join(_shared_item(index, prefix) for index in range(N_STRINGS))
+    shared = (f'<?xml version="1.0" encoding="UTF-8"?>\n<{prefix}sst {declaration} count="{N_STRINGS}" '
+              f'uniqueCount="{N_STRINGS}">{items}</{prefix}sst>')
+
+    letters = [chr(65 + col) for col in range(len(referenced))]
+    cells = "".join(f'<c r="{letter}1" t="s"><v>{index}</v></c>' for letter, index in zip(letters, referenced))
+    sheet = (f'<?xml version="1.0" encoding="UTF-8"?>\n<worksheet xmlns="{namespace}"><sheetData>'
+             f'<row r="1">{cells}</row>'
+             f'<row r="3"><c r="B3"><v>12.5</v></c><c r="C3" t="b"><v>1</v></c>'
+             f'<c r="D3" t="inlineStr"><is><t>встроенная</t></is></c></row>'
+             f'</sheetData></worksheet>')
+
+    output = io.BytesIO()
+    with zipfile.ZipFile(output, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("xl/_rels/workbook.xml.rels", WORKBOOK_RELS)
+        archive.writestr("xl/workbook.xml", WORKBOOK)
+        archive.writestr("xl/worksheets/sheet1.xml", sheet)
+        archive.writestr("xl/sharedStrings.xml", shared)
+    output.seek(0)
+    return output
+
+
+REFERENCED = [N_STRINGS - 1, 0, 1500, 3, 5, 1501, 12]
+
+
+@pytest.mark.parametrize("prefix", ["", "x:"])
+@pytest.mark.parametrize("read_bytes", [7, 100, 4096, 64 * 1024])
+def test_shared_strings_across_chunk_boundaries(monkeypatch, prefix, read_bytes):
+    # Маленькие порции режут элементы <si> и закрывающие теги в любом месте
+    monkeypatch.setattr(xlsx_sniffer, "_READ_BYTES", read_bytes)
+    rows = sniff_sheet_rows(_make_xlsx(REFERENCED, prefix))["Товары"]
+
+    assert rows[0] == [_expected_text(index) for index in REFERENCED]
+    assert rows[1] == []
+    assert rows[2] == ["", "12.5", "True", "встроенная"]
+
+
+def test_only_needed_part_of_shared_strings_is_read(monkeypatch):
+    # Разбор sharedStrings.xml останавливается на последней нужной строке
+    monkeypatch.setattr(xlsx_sniffer, "_READ_BYTES", 1024)
+    source = _make_xlsx([0, 10])
+    read_sizes = []
+
+    with xlsx_sniffer.XlsxSniffer(source) as sniffer:
+        open_member = sniffer.archive.open
+
+        def tracking_open(name, *args, **kwargs):
+            stream = open_member(name, *args, **kwargs)
+            if name == sniffer.shared_strings_path:
+                read = stream.read
+
+                def tracked_read(size=-1):
+                    data = read(size)
+                    read_sizes.append(len(data))
+                    return data
+
+                stream.read = tracked_read
+            return stream
+
+        monkeypatch.setattr(sniffer.archive, "open", tracking_open)
+        rows = sniffer.sheet_rows()["Товары"]
+        total = sniffer.archive.getinfo("xl/sharedStrings.xml").file_size
+
+    assert rows[0] == [_expected_text(0), _expected_text(10)]
+    assert sum(read_sizes) < total / 10
+
+
+def _trimmed(rows):
+    # Без пустых ячеек в конце строк и пустых строк в конце листа
+    rows = [list(row) for row in rows]
+    for row in rows:
+        while row and not row[-1]:
+            row.pop()
+    while rows and not rows[-1]:
+        rows.pop()
+    return rows
+
+
+def _openpyxl_rows(path, sheet_name, max_rows):
+    # Значения первых строк листа через openpyxl в формате XlsxSniffer
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        sheet = workbook[sheet_name]
+        sheet.reset_dimensions()
+        rows = []
+        for row in sheet.iter_rows(max_row=max_rows, values_only=True):
+            rows.append(["" if value is None else str(value).strip() for value in row])
+    finally:
+        workbook.close()
+    return _trimmed(rows)
+
+
+@pytest.mark.parametrize("name", sorted(name for name in os.listdir(ASSETS_DIR) if name.endswith(".xlsx")))
+def test_matches_openpyxl_on_attached_files(name):
+    path = os.path.join(ASSETS_DIR, name)
+    sniffed = sniff_sheet_rows(path, max_rows=10)
+    for sheet_name, rows in sniffed.items():
+        assert _trimmed(rows) == _openpyxl_rows(path, sheet_name, 10), sheet_name
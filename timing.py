@@ -0,0 +1,74 @@
+import json
+import logging
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager, nullcontext
+
+# Структурированные записи о длительности этапов: одна JSON-строка на этап
+logger = logging.getLogger("product_table_manager.timing")
+
+# Сколько последних этапов хранит один таймер
+DEFAULT_MAX_SPANS = 200
+
+
+class StageTimer:
+    """
+    Собирает длительности этапов обработки (чтение, определение, конвертация...)
+
+    Один таймер соответствует одному запуску скрипта Streamlit или одной
+    серии операций; каждый этап дополнительно пишется в лог JSON-строкой.
+    """
+
+    def __init__(self, run_id=None, max_spans=DEFAULT_MAX_SPANS):
+        self.run_id = run_id or uuid.uuid4().hex[:12]
+        self.spans = deque(maxlen=max_spans)
+
+    @contextmanager
+    def span(self, stage, **fields):
+        """
+        Замеряет длительность блока кода
+
+        Args:
+            stage: Название этапа (detect, read, align, convert, export)
+            **fields: Дополнительные поля записи (маркетплейс, число строк и т.д.)
+        """
+        started = time.perf_counter()
+        status = "ok"
+        try:
+            yield
+        except Exception:
+            status = "error"
+            raise
+        finally:
+            record = {
+                "stage": stage,
+                "ms": round((time.perf_counter() - started) * 1000, 1),
+                "status": status,
+                **fields,
+            }
+            self.spans.append(record)
+            logger.info(json.dumps({"event": "stage", "run_id": self.run_id, **record}, ensure_ascii=False, default=str))
+
+    def total_ms(self):
+        return round(sum(record["ms"] for record in self.spans), 1)
+
+    def records(self):
+        return list(self.spans)
+
+
+def stage_span(timer, stage, **fields):
+    """
+    Этап таймера или пустой контекст, если таймер не передан
+
+    Args:
+        timer: StageTimer или None
+        stage: Название этапа
+        **fields: Дополнительные поля записи
+
+    Returns:
+        Контекстный менеджер
+    """
+    if timer is None:
+        return nullcontext()
+    return timer.span(stage, **fields)
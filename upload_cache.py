@@ -0,0 +1,171 @@
+import hashlib
+import io
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+from marketplace_detection import detect_marketplace_from_file, detect_marketplace_from_signature
+from timing import stage_span
+
+# Ограничения кэша разобранных файлов (общие для всех сессий процесса)
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+DEFAULT_MAX_ENTRIES = 32
+
+
+def file_digest(data):
+    """
+    Вычисляет SHA-256 содержимого загруженного файла
+
+    Args:
+        data: Байты файла
+
+    Returns:
+        str: Шестнадцатеричный хэш
+    """
+    return hashlib.sha256(data).hexdigest()
+
+
+def estimate_entry_size(df):
+    """
+    Оценивает объем памяти, занимаемый DataFrame
+
+    Args:
+        df: DataFrame с данными
+
+    Returns:
+        int: Размер в байтах
+    """
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+class UploadCache:
+    """
+    LRU-кэш разобранных загрузок, ограниченный по числу записей и объему памяти.
+
+    Ключ записи - SHA-256 байтов файла, значение - словарь с DataFrame,
+    заголовками и результатами определения маркетплейса.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, max_entries=DEFAULT_MAX_ENTRIES):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._sizes = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, entry, size):
+        with self._lock:
+            if key in self._entries:
+                self.total_bytes -= self._sizes.pop(key)
+                del self._entries[key]
+
+            # Запись больше всего кэша не сохраняем, чтобы не вытеснять остальные
+            if size > self.max_bytes:
+                return
+
+            self._entries[key] = entry
+            self._sizes[key] = size
+            self.total_bytes += size
+
+            # Вытесняем самые давно использованные записи
+            while self._entries and (len(self._entries) > self.max_entries or self.total_bytes > self.max_bytes):
+                old_key, _ = self._entries.popitem(last=False)
+                self.total_bytes -= self._sizes.pop(old_key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+            self.total_bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+
+def read_table(data, timer=None, **fields):
+    """
+    Читает таблицу товаров из Excel-файла: лист, строка заголовков и маркетплейс
+    определяются по первым строкам листов (см. detect_marketplace_from_file)
+
+    Args:
+        data: Байты Excel-файла
+        timer: StageTimer для замера этапов detect и read (необязательно)
+        **fields: Дополнительные поля записей таймера
+
+    Returns:
+        tuple: (DataFrame, маркетплейс или None, имя листа или 0 для первого листа,
+            номер строки с заголовками начиная с 1)
+    """
+    with stage_span(timer, "detect", **fields):
+        marketplace, sheet_name, header_row = detect_marketplace_from_file(data)
+    if sheet_name is None:
+        # Не XLSX (например, .xls) - читаем первый лист с заголовками в первой строке,
+        # формат определяется уже по прочитанным заголовкам
+        with stage_span(timer, "read", **fields):
+            df = pd.read_excel(io.BytesIO(data))
+        with stage_span(timer, "detect", signature=True, **fields):
+            marketplace = detect_marketplace_from_signature(str(col) for col in df.columns)
+        return df, marketplace, 0, 1
+
+    with stage_span(timer, "read", **fields):
+        df = pd.read_excel(io.BytesIO(data), sheet_name=sheet_name, header=header_row - 1)
+    return df, marketplace, sheet_name, header_row
+
+
+# Кэш живет на уровне модуля, поэтому переживает перезапуски скрипта Streamlit
+upload_cache = UploadCache()
+
+
+def read_uploaded_table(uploaded_file, cache=upload_cache, timer=None, **fields):
+    """
+    Читает загруженный Excel-файл, используя кэш по хэшу содержимого
+
+    Args:
+        uploaded_file: Загруженный файл (UploadedFile Streamlit или BytesIO)
+        cache: Экземпляр UploadCache
+        timer: StageTimer для замера этапов detect и read (при попадании в кэш
+            этапы не выполняются и не записываются)
+        **fields: Дополнительные поля записей таймера
+
+    Returns:
+        dict: Запись кэша с ключами 'digest', 'df', 'headers', 'n_rows',
+            'sheet_name', 'header_row', 'detected_marketplace' (см. read_table).
+            Дополнительные результаты (например, 'column_mappings')
+            сохраняются в этот же словарь вызывающим кодом.
+    """
+    data = uploaded_file.getvalue()
+    digest = file_digest(data)
+
+    entry = cache.get(digest)
+    if entry is not None:
+        return entry
+
+    df, marketplace, sheet_name, header_row = read_table(data, timer, **fields)
+    entry = {
+        "digest": digest,
+        "df": df,
+        "headers": [str(col) for col in df.columns],
+        "n_rows": len(df),
+        "sheet_name": sheet_name,
+        "header_row": header_row,
+        "detected_marketplace": marketplace,
+    }
+    cache.put(digest, entry, estimate_entry_size(df))
+    return entry
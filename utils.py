@@ -1,192 +1,801 @@
+import itertools
+import re
+from copy import copy
+from dataclasses import dataclass
+from functools import lru_cache
+
 import pandas as pd
 import numpy as np
+import openpyxl
+from fuzzywuzzy import fuzz
+
+from excel_writer import open_book_writer
+from mapping_store import MappingStore
+
+# rapidfuzz (если установлен) считает матрицы схожести целиком в C++
+try:
+    from rapidfuzz import fuzz as rf_fuzz
+    from rapidfuzz import process as rf_process
+    from rapidfuzz import utils as rf_utils
+except ImportError:
+    rf_process = None
+
 
-def convert_table_format(df, source_marketplace, target_marketplace):
+class LazySheet:
     """
-    Конвертирует таблицу из формата одного маркетплейса в другой с сопоставлением колонок.
+    Ленивый дескриптор листа книги, открытой в режиме только для чтения.
     
-    Args:
-        df (pd.DataFrame): Исходная таблица
-        source_marketplace (str): Исходный маркетплейс
-        target_marketplace (str): Целевой маркетплейс
+    Строки читаются из XML листа по мере запроса, поэтому потребление памяти
+    зависит только от количества реально прочитанных строк.
+    """
+    
+    def __init__(self, worksheet):
+        # Размер листа в файле (<dimension>) бывает неверным - например, "A1" в
+        # шаблонах Ozon, - а в режиме read_only openpyxl обрезает по нему строки.
+        # Сбрасываем его, чтобы строки читались целиком
+        if hasattr(worksheet, "reset_dimensions"):
+            worksheet.reset_dimensions()
+        self.worksheet = worksheet
+        self.title = worksheet.title
+    
+    def iter_rows(self, min_row=1, max_row=None, values_only=True):
+        """
+        Возвращает генератор кортежей значений строк листа
+        
+        Args:
+            min_row: Номер первой строки (начиная с 1)
+            max_row: Номер последней строки или None для чтения до конца листа
+            values_only: Если False, возвращаются сами ячейки (вместе со стилями)
+            
+        Returns:
+            Generator: Кортежи значений (или ячеек) строки
+        """
+        return self.worksheet.iter_rows(min_row=min_row, max_row=max_row, values_only=values_only)
+    
+    def header_row(self, row_idx=1):
+        """
+        Читает одну строку заголовков, не загружая остальные строки листа
+        
+        Args:
+            row_idx: Номер строки с заголовками (начиная с 1)
+            
+        Returns:
+            list: Значения ячеек строки (пустой список, если строки нет)
+        """
+        for row in self.iter_rows(min_row=row_idx, max_row=row_idx):
+            return list(row)
+        return []
+    
+    def data_rows(self, header_row=1):
+        """
+        Возвращает генератор строк с данными, расположенных ниже строки заголовков
+        
+        Args:
+            header_row: Номер строки с заголовками (начиная с 1)
+            
+        Returns:
+            Generator: Кортежи значений ячеек
+        """
+        return self.iter_rows(min_row=header_row + 1)
+
+
+class StreamingWorkbook:
+    """
+    Обертка над книгой openpyxl в режиме read_only, выдающая ленивые листы.
+    
+    Книга держит открытым исходный файл, поэтому ее нужно закрывать
+    через close() или использовать как контекстный менеджер.
+    """
+    
+    def __init__(self, workbook):
+        self.workbook = workbook
+        self.sheetnames = workbook.sheetnames
+    
+    def __getitem__(self, sheet_name):
+        return LazySheet(self.workbook[sheet_name])
+    
+    def __iter__(self):
+        for sheet_name in self.sheetnames:
+            yield self[sheet_name]
+    
+    def close(self):
+        self.workbook.close()
     
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def load_excel_file(file, streaming=False):
+    """
+    Загружает Excel файл и возвращает объект рабочей книги и список листов
+    
+    Args:
+        file: Загруженный файл в формате BytesIO или путь к файлу
+        streaming: Если True, книга открывается в режиме только для чтения
+            и возвращается StreamingWorkbook с ленивыми листами
+        
     Returns:
-        pd.DataFrame: Конвертированная таблица
-    """
-    # Создаем копию исходной таблицы для работы
-    df_source = df.copy()
-    
-    # Словари соответствия колонок для каждого маркетплейса
-    marketplace_column_maps = {
-        "Ozon": {
-            "ID товара": "product_id",
-            "Артикул": "sku",
-            "Название": "title",
-            "Цена": "price",
-            "Остаток": "stock",
-            "Бренд": "brand",
-            "Категория": "category",
-            "Описание": "description",
-            "Изображение": "image_url",
-            "Штрихкод": "barcode"
-        },
-        "Wildberries": {
-            "Номенклатура": "product_id",
-            "Артикул поставщика": "sku",
-            "Предмет": "title",
-            "Цена СП": "price",
-            "Остаток": "stock",
-            "Бренд": "brand",
-            "Категория": "category",
-            "Описание": "description",
-            "Медиафайлы": "image_url",
-            "Баркод": "barcode"
-        },
-        "ЛеманПро": {
-            "ID товара": "product_id",
-            "Артикул": "sku",
-            "Наименование": "title",
-            "Цена": "price",
-            "Количество": "stock",
-            "Бренд": "brand",
-            "Категория": "category",
-            "Описание товара": "description",
-            "Фото": "image_url",
-            "Штрихкод": "barcode"
-        },
-        "Яндекс.Маркет": {
-            "marketSku": "product_id",
-            "vendorCode": "sku",
-            "title": "title",
-            "price": "price",
-            "stock": "stock",
-            "vendor": "brand",
-            "categoryName": "category",
-            "description": "description",
-            "imageUrl": "image_url",
-            "barcode": "barcode"
-        },
-        "Все инструменты": {
-            "Код товара": "product_id",
-            "Артикул": "sku",
-            "Наименование": "title",
-            "Цена": "price",
-            "Наличие": "stock",
-            "Производитель": "brand",
-            "Категория": "category",
-            "Описание": "description",
-            "Изображение": "image_url",
-            "Штрихкод": "barcode"
-        },
-        "СберМегаМаркет": {
-            "ID": "product_id",
-            "Артикул": "sku",
-            "Наименование": "title",
-            "Цена продажи": "price",
-            "Остаток": "stock",
-            "Бренд": "brand",
-            "Категория": "category",
-            "Описание": "description",
-            "Ссылка на изображение": "image_url",
-            "Штрихкод": "barcode"
-        }
+        Tuple: (workbook, list_of_sheets)
+    """
+    try:
+        if streaming:
+            workbook = StreamingWorkbook(openpyxl.load_workbook(file, read_only=True, data_only=True))
+        else:
+            workbook = openpyxl.load_workbook(file, data_only=False)
+        sheets = workbook.sheetnames
+        return workbook, sheets
+    except Exception as e:
+        error_str = str(e)
+        if "expected <class 'openpyxl.worksheet.cell_range.MultiCellRange'>" in error_str:
+            # Специальная обработка для ошибки шаблонов Wildberries
+            raise Exception("⚠️ Пожалуйста, пересохраните файл перед загрузкой. Файлы шаблонов Wildberries могут содержать специальные форматы, требующие пересохранения.")
+        else:
+            raise Exception(f"Ошибка при загрузке Excel файла: {error_str}")
+
+
+# Словари соответствия колонок для каждого маркетплейса
+MARKETPLACE_COLUMN_MAPS = {
+    "Ozon": {
+        "ID товара": "product_id",
+        "Артикул": "sku",
+        "Название": "title",
+        "Цена": "price",
+        "Остаток": "stock",
+        "Бренд": "brand",
+        "Категория": "category",
+        "Описание": "description",
+        "Изображение": "image_url",
+        "Штрихкод": "barcode"
+    },
+    "Wildberries": {
+        "Номенклатура": "product_id",
+        "Артикул поставщика": "sku",
+        "Предмет": "title",
+        "Цена СП": "price",
+        "Остаток": "stock",
+        "Бренд": "brand",
+        "Категория": "category",
+        "Описание": "description",
+        "Медиафайлы": "image_url",
+        "Баркод": "barcode"
+    },
+    "ЛеманПро": {
+        "ID товара": "product_id",
+        "Артикул": "sku",
+        "Наименование": "title",
+        "Цена": "price",
+        "Количество": "stock",
+        "Бренд": "brand",
+        "Категория": "category",
+        "Описание товара": "description",
+        "Фото": "image_url",
+        "Штрихкод": "barcode"
+    },
+    "Яндекс.Маркет": {
+        "marketSku": "product_id",
+        "vendorCode": "sku",
+        "title": "title",
+        "price": "price",
+        "stock": "stock",
+        "vendor": "brand",
+        "categoryName": "category",
+        "description": "description",
+        "imageUrl": "image_url",
+        "barcode": "barcode"
+    },
+    "Все инструменты": {
+        "Код товара": "product_id",
+        "Артикул": "sku",
+        "Наименование": "title",
+        "Цена": "price",
+        "Наличие": "stock",
+        "Производитель": "brand",
+        "Категория": "category",
+        "Описание": "description",
+        "Изображение": "image_url",
+        "Штрихкод": "barcode"
+    },
+    "СберМегаМаркет": {
+        "ID": "product_id",
+        "Артикул": "sku",
+        "Наименование": "title",
+        "Цена продажи": "price",
+        "Остаток": "stock",
+        "Бренд": "brand",
+        "Категория": "category",
+        "Описание": "description",
+        "Ссылка на изображение": "image_url",
+        "Штрихкод": "barcode"
     }
-    
-    # Дополнительные колонки, которые могут отличаться в разных маркетплейсах
-    additional_columns = {
-        "Ozon": {
-            "Вес упаковки, г": "weight",
-            "Ширина упаковки, мм": "package_width",
-            "Высота упаковки, мм": "package_height",
-            "Длина упаковки, мм": "package_length",
-            "Ссылка на товар": "product_url"
-        },
-        "Wildberries": {
-            "Вес": "weight",
-            "Ширина": "package_width",
-            "Высота": "package_height",
-            "Длина": "package_length",
-            "Ссылка": "product_url",
-            "Размер": "size"
-        },
-        "ЛеманПро": {
-            "Вес, г": "weight",
-            "Ширина, мм": "package_width",
-            "Высота, мм": "package_height",
-            "Длина, мм": "package_length",
-            "Ссылка на товар": "product_url"
-        },
-        "Яндекс.Маркет": {
-            "weight": "weight",
-            "width": "package_width",
-            "height": "package_height",
-            "length": "package_length",
-            "url": "product_url"
-        },
-        "Все инструменты": {
-            "Вес (кг)": "weight",
-            "Ширина (см)": "package_width",
-            "Высота (см)": "package_height",
-            "Длина (см)": "package_length",
-            "Ссылка на карточку": "product_url"
-        },
-        "СберМегаМаркет": {
-            "Вес": "weight",
-            "Ширина": "package_width",
-            "Высота": "package_height",
-            "Длина": "package_length",
-            "Ссылка": "product_url"
-        }
+}
+
+# Дополнительные колонки, которые могут отличаться в разных маркетплейсах
+ADDITIONAL_COLUMNS = {
+    "Ozon": {
+        "Вес упаковки, г": "weight",
+        "Ширина упаковки, мм": "package_width",
+        "Высота упаковки, мм": "package_height",
+        "Длина упаковки, мм": "package_length",
+        "Ссылка на товар": "product_url"
+    },
+    "Wildberries": {
+        "Вес": "weight",
+        "Ширина": "package_width",
+        "Высота": "package_height",
+        "Длина": "package_length",
+        "Ссылка": "product_url",
+        "Размер": "size"
+    },
+    "ЛеманПро": {
+        "Вес, г": "weight",
+        "Ширина, мм": "package_width",
+        "Высота, мм": "package_height",
+        "Длина, мм": "package_length",
+        "Ссылка на товар": "product_url"
+    },
+    "Яндекс.Маркет": {
+        "weight": "weight",
+        "width": "package_width",
+        "height": "package_height",
+        "length": "package_length",
+        "url": "product_url"
+    },
+    "Все инструменты": {
+        "Вес (кг)": "weight",
+        "Ширина (см)": "package_width",
+        "Высота (см)": "package_height",
+        "Длина (см)": "package_length",
+        "Ссылка на карточку": "product_url"
+    },
+    "СберМегаМаркет": {
+        "Вес": "weight",
+        "Ширина": "package_width",
+        "Высота": "package_height",
+        "Длина": "package_length",
+        "Ссылка": "product_url"
     }
+}
+
+# Единицы измерения унифицированных полей веса и габаритов. Указаны только
+# для маркетплейсов, у которых единица явно следует из названия колонки;
+# для остальных значения переносятся без пересчета
+FIELD_UNITS = {
+    "Ozon": {"weight": "g", "package_width": "mm", "package_height": "mm", "package_length": "mm"},
+    "ЛеманПро": {"weight": "g", "package_width": "mm", "package_height": "mm", "package_length": "mm"},
+    "Все инструменты": {"weight": "kg", "package_width": "cm", "package_height": "cm", "package_length": "cm"},
+}
+
+# Множители перевода в базовую единицу величины (грамм, миллиметр)
+UNIT_FACTORS = {
+    "g": ("mass", 1),
+    "kg": ("mass", 1000),
+    "mm": ("length", 1),
+    "cm": ("length", 10),
+    "m": ("length", 1000),
+}
+
+# Знаков после запятой при пересчете единиц (убирает хвосты вида 1100.0000000000002)
+UNIT_DECIMALS = 6
+
+
+def unit_conversion_factor(field, source_marketplace, target_marketplace):
+    """
+    Возвращает множитель пересчета значения поля между маркетплейсами
+    
+    Args:
+        field: Унифицированное поле (weight, package_width...)
+        source_marketplace: Исходный маркетплейс
+        target_marketplace: Целевой маркетплейс
+        
+    Returns:
+        float или None, если пересчет не нужен или единицы неизвестны
+    """
+    source_unit = FIELD_UNITS.get(source_marketplace, {}).get(field)
+    target_unit = FIELD_UNITS.get(target_marketplace, {}).get(field)
+    if source_unit is None or target_unit is None or source_unit == target_unit:
+        return None
+    source_kind, source_factor = UNIT_FACTORS[source_unit]
+    target_kind, target_factor = UNIT_FACTORS[target_unit]
+    if source_kind != target_kind:
+        return None
+    return source_factor / target_factor
+
+
+# Сколько неразобранных значений проверяется перед очисткой всей колонки
+NUMBER_PROBE_ROWS = 1000
+
+
+def _parse_number_text(series):
+    # Пробелы-разделители разрядов убираются, десятичная запятая становится точкой.
+    # str.replace на каждом значении быстрее цепочки .str с регулярным выражением
+    text = [
+        str(value).replace(",", ".").replace(" ", "").replace("\u00a0", "").replace("\u202f", "").strip()
+        for value in series.tolist()
+    ]
+    return pd.Series(pd.to_numeric(text, errors="coerce"), index=series.index, dtype="float64")
+
+
+def _has_text(series):
+    # Есть ли непустые значения, которые не разбираются как числа
+    values = series.dropna()
+    return bool((_parse_number_text(values).isna() & (values.astype(str).str.strip() != "")).any())
+
+
+def _parse_numbers(series, strict=False):
+    """
+    Разбирает колонку как числа
     
-    # Объединяем основные и дополнительные колонки
-    for marketplace in marketplace_column_maps:
-        marketplace_column_maps[marketplace].update(additional_columns.get(marketplace, {}))
+    Сначала работает быстрый разбор pandas, текстовая очистка применяется только
+    к значениям, которые он не разобрал.
     
-    # Получаем маппинги для исходного и целевого маркетплейсов
-    source_map = marketplace_column_maps.get(source_marketplace, {})
-    target_map = marketplace_column_maps.get(target_marketplace, {})
+    Args:
+        series: Колонка со значениями
+        strict: Вернуть None, если в колонке есть непустые нечисловые значения
+        
+    Returns:
+        pd.Series (float, NaN на месте пустых и нечисловых значений) или None
+    """
+    probe = series.iloc[:NUMBER_PROBE_ROWS]
+    if strict and _has_text(probe):
+        # Быстрый отказ для текстовых колонок по первым строкам
+        return None
     
-    # Если не удалось найти маппинги, возвращаем исходную таблицу с информацией
-    if not source_map or not target_map:
-        df_source["conversion_info"] = f"Не удалось найти маппинг для {source_marketplace} или {target_marketplace}"
-        return df_source
+    if pd.api.types.is_object_dtype(series) and pd.to_numeric(probe, errors="coerce").isna().sum() * 2 > probe.notna().sum():
+        # Числа в основном записаны текстом ("12,5"): неудачный быстрый разбор
+        # всей колонки стоил бы дороже самой текстовой очистки
+        numeric = _parse_number_text(series)
+        failed = numeric.isna() & series.notna()
+        if strict and failed.any() and (series[failed].astype(str).str.strip() != "").any():
+            return None
+        return numeric
     
-    # Создаем словарь для обратного маппинга целевого маркетплейса
-    target_reverse_map = {v: k for k, v in target_map.items()}
+    numeric = pd.to_numeric(series, errors="coerce").astype("float64")
+    failed = numeric.isna() & series.notna()
+    if not failed.any():
+        return numeric
+    
+    leftovers = series[failed]
+    parsed = _parse_number_text(leftovers)
+    unparsed = parsed.isna()
+    if strict and unparsed.any() and (leftovers[unparsed].astype(str).str.strip() != "").any():
+        return None
+    numeric[failed] = parsed
+    return numeric
+
+
+def convert_units(series, factor):
+    """
+    Пересчитывает колонку в другую единицу измерения целиком, без обхода строк
+    
+    Строковые числа (в том числе с десятичной запятой) тоже пересчитываются;
+    пустые и нечисловые значения остаются как есть.
+    
+    Args:
+        series: Колонка со значениями
+        factor: Множитель пересчета
+        
+    Returns:
+        pd.Series: Пересчитанная колонка
+    """
+    if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+        return (series * factor).round(UNIT_DECIMALS)
+    
+    numeric = _parse_numbers(series)
+    converted = (numeric * factor).round(UNIT_DECIMALS)
+    if numeric.notna().all():
+        return converted
+    return converted.astype(object).where(numeric.notna(), series)
+
+
+# Типы унифицированных полей каталога: числа и счетчики - числовые колонки
+# (nullable Int64 для остатков), повторяющиеся бренды и категории - категории.
+# Идентификаторы, штрихкоды и тексты ("string") переносятся как есть: объектные
+# колонки делят строки с исходной таблицей, а копия в StringDtype занимает
+# больше памяти и времени
+CANONICAL_SCHEMA = {
+    "product_id": "string",
+    "sku": "string",
+    "title": "string",
+    "price": "float",
+    "stock": "int",
+    "brand": "category",
+    "category": "category",
+    "description": "string",
+    "image_url": "string",
+    "barcode": "string",
+    "weight": "float",
+    "package_width": "float",
+    "package_height": "float",
+    "package_length": "float",
+    "product_url": "string",
+    "size": "string",
+}
+
+
+def _integral_numbers(series):
+    # Целые значения из float-колонки (например, остатки 12.0 с пропусками) без дробной части
+    if pd.api.types.is_float_dtype(series) and (series.dropna() % 1 == 0).all():
+        return series.astype("Int64")
+    return series
+
+
+def cast_canonical(series, field, strict=True):
+    """
+    Приводит колонку к типу унифицированного поля
+    
+    Приводятся только числовые и категориальные поля; текстовые поля
+    (идентификаторы, штрихкоды, описания) возвращаются без изменений.
+    Числовые поля, в которых есть непустые нечисловые значения, тоже остаются
+    без изменений, чтобы не терять данные (strict=False - разбираются
+    поэлементно, нечисловые значения остаются как есть).
+    
+    Это меняет выгрузку по сравнению с переносом колонок как есть: числа в
+    текстовом виде ("12,5", "1 200") в числовых полях записываются в XLSX
+    числовыми ячейками.
+    
+    Args:
+        series: Колонка со значениями
+        field: Унифицированное поле (price, stock, brand...)
+        strict: Оставлять без изменений числовые поля с нечисловыми значениями
+        
+    Returns:
+        pd.Series: Типизированная колонка
+    """
+    kind = CANONICAL_SCHEMA.get(field)
+    if kind is None:
+        return series
     
-    # Создаем промежуточный DataFrame с унифицированными колонками
-    df_unified = pd.DataFrame()
+    if kind == "category":
+        return series if isinstance(series.dtype, pd.CategoricalDtype) else series.astype("category")
+    
+    if kind == "string":
+        return series
+    
+    # Числовые поля (уже приведенные колонки возвращаются как есть)
+    if pd.api.types.is_bool_dtype(series) or series.dtype == ("Int64" if kind == "int" else "float64"):
+        return series
+    numeric = series if pd.api.types.is_numeric_dtype(series) else _parse_numbers(series, strict=strict)
+    if numeric is None:
+        return series
+    if not strict:
+        text = (numeric.isna() & series.notna()).to_numpy()
+        if text.any():
+            # Пустые строки - пропуски, а не текст
+            positions = np.flatnonzero(text)
+            text[positions[(series.iloc[positions].astype(str).str.strip() == "").to_numpy()]] = False
+        if text.any():
+            return numeric.astype(object).where(~text, series)
+    if kind == "int":
+        return _integral_numbers(numeric.astype("float64"))
+    return numeric.astype("float64")
+
+
+# Метрики rapidfuzz, соответствующие метрикам fuzzywuzzy при сопоставлении колонок.
+# Токенные метрики fuzzywuzzy предварительно обрабатывают строки, ratio и partial_ratio - нет
+if rf_process is not None:
+    _RAPIDFUZZ_METRICS = [
+        (rf_fuzz.ratio, None),
+        (rf_fuzz.partial_ratio, None),
+        (rf_fuzz.token_sort_ratio, rf_utils.default_process),
+        (rf_fuzz.token_set_ratio, rf_utils.default_process),
+        (rf_fuzz.partial_token_sort_ratio, rf_utils.default_process),
+    ]
+
+# Служебные колонки, которые добавляются к каждой конвертированной таблице
+METADATA_COLUMNS = ("Исходный формат", "Целевой формат", "Дата конвертации")
+
+
+@dataclass(frozen=True)
+class ConversionPlan:
+    """
+    Скомпилированный план конвертации из одного маркетплейса в другой.
+    
+    Для каждой целевой колонки хранится кортеж исходных колонок в порядке
+    приоритета: при выполнении берется первая, присутствующая в таблице.
+    Если ни одной нет, колонка заполняется значением по умолчанию, а
+    необязательная колонка (из файла маппингов) не выводится. Для полей
+    с разными единицами измерения хранится множитель пересчета, для каждой
+    колонки - унифицированное поле, определяющее ее тип.
+    """
+    source_marketplace: str
+    target_marketplace: str
+    target_columns: tuple
+    source_candidates: tuple
+    fields: tuple = ()
+    unit_factors: tuple = ()
+    default_value: str = ""
+    metadata_columns: tuple = METADATA_COLUMNS
+    optional_columns: frozenset = frozenset()
+    version: int = 0
+    
+    def resolve(self, columns):
+        """
+        Сопоставляет план с колонками конкретной таблицы
+        
+        Args:
+            columns: Колонки исходного DataFrame
+            
+        Returns:
+            list: Для каждой целевой колонки - позиция исходной колонки или None
+        """
+        # При повторяющихся названиях берется первая колонка с таким именем
+        positions = {}
+        for idx, col in enumerate(columns):
+            positions.setdefault(col, idx)
+        
+        resolved = []
+        for candidates in self.source_candidates:
+            resolved.append(next((positions[col] for col in candidates if col in positions), None))
+        return resolved
+
+
+def compile_conversion_plan(source_map, target_map, source_marketplace, target_marketplace):
+    """
+    Компилирует план конвертации по маппингам колонок в унифицированные поля
     
-    # Маппим колонки из исходного формата в унифицированный
+    Args:
+        source_map: Словарь {колонка источника: унифицированное поле}
+        target_map: Словарь {колонка цели: унифицированное поле}
+        source_marketplace: Исходный маркетплейс
+        target_marketplace: Целевой маркетплейс
+        
+    Returns:
+        ConversionPlan: Скомпилированный план
+    """
+    # Для каждого унифицированного поля - исходные колонки по приоритету
+    # (при дублировании поля в маппинге побеждает последняя колонка)
+    sources_by_field = {}
     for src_col, unified_col in source_map.items():
-        if src_col in df_source.columns:
-            df_unified[unified_col] = df_source[src_col]
+        sources_by_field.setdefault(unified_col, []).insert(0, src_col)
     
-    # Создаем результирующий DataFrame с колонками целевого маркетплейса
-    df_target = pd.DataFrame()
+    # Обратный маппинг целевого маркетплейса: унифицированное поле -> колонка
+    target_reverse_map = {v: k for k, v in target_map.items()}
     
-    # Маппим из унифицированного формата в целевой
-    for unified_col, target_col in target_reverse_map.items():
-        if unified_col in df_unified.columns:
-            df_target[target_col] = df_unified[unified_col]
-        else:
-            # Если унифицированная колонка отсутствует, заполняем значением по умолчанию
-            df_target[target_col] = ""
+    return ConversionPlan(
+        source_marketplace=source_marketplace,
+        target_marketplace=target_marketplace,
+        target_columns=tuple(target_reverse_map.values()),
+        source_candidates=tuple(tuple(sources_by_field.get(field, ())) for field in target_reverse_map),
+        fields=tuple(target_reverse_map),
+        unit_factors=tuple(unit_conversion_factor(field, source_marketplace, target_marketplace)
+                           for field in target_reverse_map),
+    )
+
+
+def _build_conversion_plans(column_maps):
+    plans = {}
+    for source_marketplace, source_map in column_maps.items():
+        for target_marketplace, target_map in column_maps.items():
+            plans[(source_marketplace, target_marketplace)] = compile_conversion_plan(
+                source_map, target_map, source_marketplace, target_marketplace
+            )
+    return plans
+
+
+# Полные маппинги маркетплейсов (основные и дополнительные колонки)
+FULL_COLUMN_MAPS = {
+    marketplace: {**columns, **ADDITIONAL_COLUMNS.get(marketplace, {})}
+    for marketplace, columns in MARKETPLACE_COLUMN_MAPS.items()
+}
+
+# Реестр планов конвертации для всех пар маркетплейсов, собирается при импорте
+CONVERSION_PLANS = _build_conversion_plans(FULL_COLUMN_MAPS)
+
+# Планы с пользовательскими маппингами из data/mappings.json (перечитываются при изменении файла)
+mapping_store = MappingStore(CONVERSION_PLANS)
+
+
+def _broadcast_constant(value, n_rows):
+    """
+    Создает колонку из одного повторяющегося значения
     
-    # Добавляем информационные колонки
-    df_target["Исходный формат"] = source_marketplace
-    df_target["Целевой формат"] = target_marketplace
-    df_target["Дата конвертации"] = pd.Timestamp.now().strftime("%Y-%m-%d %H:%M:%S")
+    Категориальная колонка хранит значение один раз и по байту кода на строку,
+    вместо объектной колонки с указателем на строку в каждой ячейке.
+    В XLSX записываются те же значения, что и у объектной колонки; отличается
+    только dtype в DataFrame (category вместо object).
+    """
+    return pd.Categorical.from_codes(np.zeros(n_rows, dtype=np.int8), categories=[value])
+
+
+def get_conversion_plan(source_marketplace, target_marketplace):
+    """
+    Возвращает скомпилированный план конвертации для пары маркетплейсов
+    с учетом текущей версии файла маппингов
+    
+    Args:
+        source_marketplace: Исходный маркетплейс
+        target_marketplace: Целевой маркетплейс
+        
+    Returns:
+        ConversionPlan или None, если маппинг для пары не найден
+    """
+    return mapping_store.get_plan(source_marketplace, target_marketplace)
+
+
+def _plan_layout(plan, source_columns):
+    """
+    Раскладка плана по колонкам конкретной таблицы
+    
+    Args:
+        plan: ConversionPlan
+        source_columns: Колонки исходной таблицы (после переименования)
+        
+    Returns:
+        tuple: (раскладка - кортежи (колонка, позиция источника или None, поле, множитель)
+            без необязательных колонок без источника; пары (индекс в раскладке, позиция
+            источника) для колонок с источником)
+    """
+    n_columns = len(plan.target_columns)
+    fields = plan.fields or (None,) * n_columns
+    unit_factors = plan.unit_factors or (None,) * n_columns
+    layout = [(col, pos, field, factor)
+              for col, pos, field, factor in zip(plan.target_columns, plan.resolve(source_columns), fields, unit_factors)
+              if pos is not None or col not in plan.optional_columns]
+    present = [(idx, pos) for idx, (_, pos, _, _) in enumerate(layout) if pos is not None]
+    return layout, present
+
+
+def canonical_column_fields(df, source_marketplace, target_marketplace, column_mapping=None):
+    """
+    Один раз решает, какие колонки конвертированной таблицы приводятся к типам
+    CANONICAL_SCHEMA
+    
+    Решение принимается так же, как при конвертации всей таблицы: числовое поле
+    с нечисловыми значениями остается без приведения. При конвертации по частям
+    (см. stream_convert) оно применяется к каждой части одинаково, поэтому
+    результат не зависит от границ частей.
+    
+    Args:
+        df (pd.DataFrame): Исходная таблица или ее первая часть
+        source_marketplace (str): Исходный маркетплейс
+        target_marketplace (str): Целевой маркетплейс
+        column_mapping (dict): Необязательное переименование колонок источника
+        
+    Returns:
+        dict: {целевая колонка: унифицированное поле или None, если колонка не приводится};
+            пустой словарь, если план для пары не найден
+    """
+    plan = get_conversion_plan(source_marketplace, target_marketplace)
+    if plan is None:
+        return {}
+    source_columns = df.columns
+    if column_mapping:
+        source_columns = [column_mapping.get(col, col) for col in source_columns]
+    
+    layout, present = _plan_layout(plan, source_columns)
+    source_fields = FULL_COLUMN_MAPS.get(source_marketplace, {})
+    column_fields = {}
+    for idx, pos in present:
+        col, _, field, _ = layout[idx]
+        if field is None:
+            field = source_fields.get(source_columns[pos])
+        if CANONICAL_SCHEMA.get(field) in ("float", "int"):
+            series = df.iloc[:, pos]
+            typed = cast_canonical(series, field)
+            # Числовое поле с текстом остается как есть - и во всех частях
+            if typed is series and not pd.api.types.is_numeric_dtype(series):
+                field = None
+        column_fields[col] = field
+    return column_fields
+
+
+def convert_table_format(df, source_marketplace, target_marketplace, column_mapping=None, conversion_date=None,
+                         column_fields=None):
+    """
+    Конвертирует таблицу из формата одного маркетплейса в другой с сопоставлением колонок.
+    
+    Args:
+        df (pd.DataFrame): Исходная таблица
+        source_marketplace (str): Исходный маркетплейс
+        target_marketplace (str): Целевой маркетплейс
+        column_mapping (dict): Необязательное переименование колонок источника
+            {колонка файла: колонка формата}, например из align_columns_to_marketplace
+        conversion_date (str): Дата конвертации для служебной колонки (по умолчанию - текущая);
+            при конвертации по частям задается одна на весь файл
+        column_fields (dict): Приведение типов, решенное заранее для всей таблицы
+            (см. canonical_column_fields); по умолчанию решается по этой таблице
+    
+    Returns:
+        pd.DataFrame: Конвертированная таблица. Колонки без источника и служебные
+            колонки ("Исходный формат", "Целевой формат", "Дата конвертации") -
+            категориальные константы. Сопоставленные колонки приведены к типам
+            CANONICAL_SCHEMA (см. cast_canonical): числа в текстовом виде в числовых
+            полях становятся числами, текстовые поля переносятся как есть
+    """
+    # Получаем скомпилированный план для пары маркетплейсов
+    plan = get_conversion_plan(source_marketplace, target_marketplace)
+    
+    # Если не удалось найти маппинги, возвращаем исходную таблицу с информацией
+    if plan is None:
+        return df.assign(conversion_info=f"Не удалось найти маппинг для {source_marketplace} или {target_marketplace}")
+    
+    # Определяем позиции исходных колонок для каждой целевой
+    source_columns = df.columns
+    if column_mapping:
+        source_columns = [column_mapping.get(col, col) for col in source_columns]
+    layout, present = _plan_layout(plan, source_columns)
     
     # Проверяем соответствие структуры, чтобы избежать ошибок
-    if df_target.empty and not df_source.empty:
-        # Если что-то пошло не так, возвращаем исходную таблицу с информацией
-        df_source["conversion_info"] = f"Ошибка при конвертации из {source_marketplace} в {target_marketplace}"
-        return df_source
+    if not present and not df.empty:
+        # Если ни одна колонка не сопоставлена, возвращаем исходную таблицу с информацией
+        return df.assign(conversion_info=f"Ошибка при конвертации из {source_marketplace} в {target_marketplace}")
+    
+    # Выбираем нужные колонки одной операцией take по блокам исходной таблицы,
+    # без предварительной копии всего источника
+    # (необязательные колонки без источника пропускаются)
+    df_target = df.iloc[:, [pos for _, pos in present]]
+    df_target.columns = [layout[idx][0] for idx, _ in present]
+    
+    # Приведение к типам унифицированной схемы и пересчет единиц (г/кг, мм/см)
+    # целыми колонками. Колонки из файла маппингов типизируются по полю
+    # исходной колонки, как в prepare_source_frame
+    source_fields = FULL_COLUMN_MAPS.get(source_marketplace, {})
+    for col_idx, (idx, pos) in enumerate(present):
+        col, _, field, factor = layout[idx]
+        if column_fields is not None:
+            # Решение принято для всей таблицы: значения приводятся поэлементно
+            field, strict = column_fields.get(col), False
+        else:
+            strict = True
+            if field is None:
+                field = source_fields.get(source_columns[pos])
+        series = df_target.iloc[:, col_idx]
+        typed = cast_canonical(series, field, strict) if field is not None else series
+        if factor is not None:
+            typed = convert_units(typed, factor)
+        if typed is not series:
+            df_target.isetitem(col_idx, typed)
+    
+    # Недостающие колонки вставляются на свои места как константы
+    n_rows = len(df_target)
+    for idx, (col, pos, _, _) in enumerate(layout):
+        if pos is None:
+            df_target.insert(idx, col, _broadcast_constant(plan.default_value, n_rows))
+    
+    # Добавляем информационные колонки
+    if conversion_date is None:
+        conversion_date = pd.Timestamp.now().strftime("%Y-%m-%d %H:%M:%S")
+    metadata_values = (source_marketplace, target_marketplace, conversion_date)
+    for col_name, value in zip(plan.metadata_columns, metadata_values):
+        df_target.insert(len(df_target.columns), col_name, _broadcast_constant(value, n_rows))
     
     return df_target
 
+
+def prepare_source_frame(df, source_marketplace, column_mapping=None):
+    """
+    Один раз применяет переименование колонок и типы унифицированной схемы
+    к исходной таблице
+    
+    Подготовленную таблицу можно конвертировать в несколько форматов подряд:
+    convert_table_format не будет повторно разбирать и приводить колонки.
+    
+    Args:
+        df (pd.DataFrame): Исходная таблица
+        source_marketplace (str): Исходный маркетплейс
+        column_mapping (dict): Необязательное переименование колонок источника
+        
+    Returns:
+        pd.DataFrame: Таблица с колонками в терминах формата маркетплейса и типизированными полями
+    """
+    prepared = df.copy(deep=False)
+    if column_mapping:
+        prepared.columns = [column_mapping.get(col, col) for col in df.columns]
+    
+    fields = FULL_COLUMN_MAPS.get(source_marketplace, {})
+    for idx, col in enumerate(prepared.columns):
+        field = fields.get(col)
+        if field is not None:
+            series = prepared.iloc[:, idx]
+            typed = cast_canonical(series, field)
+            if typed is not series:
+                prepared.isetitem(idx, typed)
+    return prepared
+
+
 def get_marketplace_columns(marketplace):
     """
     Возвращает список ожидаемых колонок для указанного маркетплейса.
@@ -231,3 +840,1184 @@ def get_marketplace_columns(marketplace):
     }
     
     return marketplace_columns.get(marketplace, [])
+
+
+# Распространенные суффиксы названий колонок (удаляются по порядку списка)
+COLUMN_SUFFIXES = [
+    " товара", " продукта", " позиции", " изделия", " шт", " г", " кг", " мл", " л",
+    " см", " мм", " м", " руб", " rub", " ₽", " %", " руб."
+]
+
+# Общие префиксы названий колонок (удаляются по порядку списка)
+COLUMN_PREFIXES = [
+    "код ", "номер ", "ид ", "тип ", "название ", "наименование ", "цена ", "стоимость ",
+    "размер ", "вес ", "масса ", "ширина ", "высота ", "глубина ", "длина "
+]
+
+# Сокращения и их полные формы (проверяются по порядку, применяется первое)
+COLUMN_ABBREVIATIONS = {
+    "артик": "артикул",
+    "наим": "название",
+    "наимен": "название",
+    "описан": "описание",
+    "кол-во": "количество",
+    "кол во": "количество",
+    "колво": "количество",
+    "кол": "количество",
+    "хар-ки": "характеристики",
+    "хар ки": "характеристики",
+    "харки": "характеристики",
+    "хар-ка": "характеристика",
+    "хар ка": "характеристика",
+    "харка": "характеристика",
+    "спец": "спецификация",
+    "габар": "габариты",
+    "разм": "размер",
+    "фото": "изображение",
+    "изобр": "изображение",
+    "изобрa": "изображение",
+    "картин": "изображение",
+    "шир": "ширина",
+    "дл": "длина",
+    "выс": "высота",
+    "глуб": "глубина"
+}
+
+# Стандартизация распространенных названий колонок для маркетплейсов
+COLUMN_ALIASES = {
+    # Ключевые атрибуты
+    "артикул": ["арт", "артик", "код товара", "номер артикула", "skuмагазина", "sku", "id товара", 
+              "код позиции", "wb sku", "артикул wb", "ozon id", "артикул продавца"],
+    "название": ["наименование", "имя", "наимен", "назв", "имя товара", "заголовок", "title", 
+               "наименование товара", "название товара", "наименование позиции", "полное название"],
+    "цена": ["стоимость", "розн цена", "цена продажи", "price", "розничная цена", "прайс", 
+            "цена товара", "цена со скидкой", "розничная", "цена розничная", "руб"],
+    "описание": ["описание товара", "полное описание", "detail", "детальное описание", "description", 
+                "расширенное описание", "контент", "content", "информация о товаре", "товар описание"],
+    "категория": ["раздел", "группа", "группа товаров", "category", "тип товара", "тип изделия", 
+                "категория товара", "родительская категория", "товарная категория", "предметная группа"],
+    "бренд": ["брэнд", "марка", "производитель", "brand", "изготовитель", "торговая марка", "тм", 
+             "товарный знак", "компания производитель", "марка производитель"],
+
+    # Габаритные характеристики
+    "вес": ["масса", "вес товара", "вес в упаковке", "вес без упаковки", "вес брутто", "вес нетто", 
+           "weight", "масса товара", "масса в упаковке", "объемный вес"],
+    "ширина": ["width", "ширина товара", "ширина упаковки", "ширина изделия", "ширина габарит",
+              "ширина в упаковке", "ширина без упаковки", "габариты ширина"],
+    "высота": ["height", "высота товара", "высота упаковки", "высота изделия", "высота габарит",
+              "высота в упаковке", "высота без упаковки", "габариты высота"],
+    "длина": ["length", "глубина", "длина товара", "длина упаковки", "длина изделия", "длина габарит",
+             "длина в упаковке", "длина без упаковки", "габариты длина", "глубина габарит"],
+
+    # Логистика и наличие
+    "количество": ["кол-во", "остаток", "остатки", "наличие", "колво", "qty", "quantity", 
+                  "количество штук", "доступное количество", "количество в наличии"],
+    "баркод": ["штрихкод", "шк", "баркод товара", "ean", "ean13", "gtin", "upc", "код товара", 
+              "штрих код", "barcode", "штрихкод товара"],
+
+    # Дополнительные атрибуты
+    "материал": ["состав", "материал изготовления", "материал товара", "материал изделия", 
+                "основной материал", "material", "ткань", "основа", "сырье"],
+    "цвет": ["color", "расцветка", "цвет товара", "цвет изделия", "основной цвет", 
+            "цветовой тон", "оттенок", "цвет и оттенок", "цветовое решение"],
+    "размер": ["габариты", "size", "размерный ряд", "размер товара", "размер изделия", 
+              "линейные размеры", "типоразмер", "размерность", "габаритные размеры"]
+}
+
+# Предкомпилированные шаблоны нормализации
+_MARKER_RE = re.compile(r'[*!№\+]')
+_SPECIAL_CHARS_RE = re.compile(r'[^\w\s\-\.]')
+_WHITESPACE_RE = re.compile(r'\s+')
+_TRAILING_DIGITS_RE = re.compile(r'\d+$')
+
+# Суффиксы снимаются последовательно в порядке списка, поэтому в хвосте строки
+# они стоят в обратном порядке: один якорный шаблон с необязательными группами
+# от последнего суффикса к первому эквивалентен проходу по списку
+_SUFFIXES_RE = re.compile(
+    "(?:" + ")?(?:".join(re.escape(suffix) for suffix in reversed(COLUMN_SUFFIXES)) + ")?$"
+)
+_PREFIXES_RE = re.compile(
+    "^(?:" + ")?(?:".join(re.escape(prefix) for prefix in COLUMN_PREFIXES) + ")?"
+)
+# Альтернативы проверяются в порядке словаря, как и при переборе
+_ABBREVIATIONS_RE = re.compile(
+    "^(?:" + "|".join(re.escape(abbr) for abbr in COLUMN_ABBREVIATIONS) + ")(?= |$)"
+)
+
+
+def _build_alias_index(aliases):
+    # Обратный индекс {название или синоним: стандартное имя};
+    # при совпадении в нескольких группах побеждает первая, как при переборе
+    index = {}
+    for standard, names in aliases.items():
+        index.setdefault(standard, standard)
+        for name in names:
+            index.setdefault(name, standard)
+    return index
+
+
+COLUMN_ALIAS_INDEX = _build_alias_index(COLUMN_ALIASES)
+
+# Ключевые атрибуты, которые приоритетно распознаются у обязательных колонок (со звездочкой)
+_KEY_FIELD_ALIASES = {key: COLUMN_ALIASES[key] for key in ('артикул', 'название', 'цена')}
+
+
+@lru_cache(maxsize=8192)
+def normalize_column_name(col_name):
+    """
+    Нормализует название колонки для сопоставления между маркетплейсами
+    
+    Args:
+        col_name: Название колонки
+        
+    Returns:
+        str: Нормализованное название (стандартное имя, если найден синоним)
+    """
+    if not isinstance(col_name, str):
+        return str(col_name).lower()
+    
+    # Удаляем специальные маркеры из заголовков маркетплейсов: звездочки, восклицательные знаки и т.д.
+    normalized = _MARKER_RE.sub('', col_name)
+    
+    # Удаляем спецсимволы и лишние пробелы (переносы строк тоже становятся пробелами)
+    normalized = _SPECIAL_CHARS_RE.sub(' ', normalized)
+    normalized = _WHITESPACE_RE.sub(' ', normalized).strip().lower()
+    
+    # Удаляем распространенные суффиксы и общие префиксы
+    normalized = _SUFFIXES_RE.sub('', normalized, count=1).strip()
+    normalized = _PREFIXES_RE.sub('', normalized, count=1)
+    
+    # Преобразуем сокращения в полные формы
+    match = _ABBREVIATIONS_RE.match(normalized)
+    if match:
+        normalized = COLUMN_ABBREVIATIONS[match.group(0)] + normalized[match.end():]
+    
+    # Проверяем, соответствует ли нормализованное имя одному из стандартных имён
+    standard = COLUMN_ALIAS_INDEX.get(normalized)
+    if standard is not None:
+        return standard
+    
+    # Для оригинальных имен колонок с маркерами обязательности (звездочка и др.)
+    # добавляем повышенный приоритет для ключевых атрибутов
+    if '*' in col_name or '!' in col_name:
+        for key_field, aliases in _KEY_FIELD_ALIASES.items():
+            for alias in aliases:
+                if alias in normalized or normalized in alias:
+                    return key_field
+    
+    # Если колонка содержит цифры (например, Артикул1, Артикул2), очищаем от них
+    return _TRAILING_DIGITS_RE.sub('', normalized).strip()
+
+
+def _common_prefix_lengths(source_strings, target_strings):
+    """
+    Считает длины общих префиксов для всех пар строк
+    
+    Returns:
+        np.ndarray: Матрица размером (len(source_strings), len(target_strings))
+    """
+    width = max(1, max(len(s) for s in source_strings), max(len(t) for t in target_strings))
+    # Строки фиксированной ширины как матрицы кодов символов
+    source_codes = np.array(source_strings, dtype=f"<U{width}").view(np.uint32).reshape(len(source_strings), width)
+    target_codes = np.array(target_strings, dtype=f"<U{width}").view(np.uint32).reshape(len(target_strings), width)
+    target_lengths = np.array([len(t) for t in target_strings])
+    
+    prefix = np.empty((len(source_strings), len(target_strings)), dtype=np.int64)
+    for i, src in enumerate(source_strings):
+        mismatch = source_codes[i] != target_codes
+        # Позиция первого несовпадения (или ширина, если совпадают все символы)
+        first_mismatch = np.where(mismatch.any(axis=1), mismatch.argmax(axis=1), width)
+        prefix[i] = np.minimum(first_mismatch, np.minimum(target_lengths, len(src)))
+    return prefix
+
+
+def score_column_matrix(source_norms, target_norms):
+    """
+    Считает взвешенные оценки схожести для всех пар нормализованных названий колонок
+    
+    Оценка пары - максимум из пяти метрик fuzz плюс бонусы за совпадение
+    начала строки (как в прежнем попарном сравнении).
+    
+    Args:
+        source_norms: Нормализованные названия исходных колонок
+        target_norms: Нормализованные названия целевых колонок
+        
+    Returns:
+        np.ndarray: Матрица оценок размером (len(source_norms), len(target_norms))
+    """
+    if rf_process is not None:
+        # Все пары считаются в C++ за один вызов на метрику
+        metrics = [
+            rf_process.cdist(source_norms, target_norms, scorer=scorer, processor=processor, workers=-1)
+            for scorer, processor in _RAPIDFUZZ_METRICS
+        ]
+        base = np.rint(np.maximum.reduce(metrics)).astype(np.int64)
+    else:
+        base = np.array([
+            [
+                max(
+                    fuzz.ratio(src, tgt),
+                    fuzz.partial_ratio(src, tgt),
+                    fuzz.token_sort_ratio(src, tgt),
+                    fuzz.token_set_ratio(src, tgt),
+                    fuzz.partial_token_sort_ratio(src, tgt)
+                )
+                for tgt in target_norms
+            ]
+            for src in source_norms
+        ], dtype=np.int64).reshape(len(source_norms), len(target_norms))
+    
+    source_lengths = np.array([len(s) for s in source_norms])[:, None]
+    target_lengths = np.array([len(t) for t in target_norms])[None, :]
+    prefix = _common_prefix_lengths(source_norms, target_norms)
+    
+    # Для коротких строк повышаем значимость совпадения первых трех символов
+    source_head = np.minimum(source_lengths, 3)
+    target_head = np.minimum(target_lengths, 3)
+    same_head = (source_head == target_head) & (prefix >= source_head)
+    short = (source_lengths < 6) | (target_lengths < 6)
+    exact_match_bonus = np.where(short & same_head, 30, 0)
+    
+    # 5 бонусных баллов за каждый совпадающий символ в начале (от трех символов)
+    prefix_bonus = np.where(prefix >= 3, prefix * 5, 0)
+    
+    return base + exact_match_bonus + prefix_bonus
+
+
+def optimal_assignment(weights):
+    """
+    Находит назначение строк столбцам с максимальной суммой весов (венгерский алгоритм)
+    
+    Args:
+        weights: Матрица весов (строки - исходные колонки, столбцы - целевые)
+        
+    Returns:
+        list: Пары (строка, столбец), отсортированные по строке
+    """
+    weights = np.asarray(weights, dtype=float)
+    if weights.size == 0:
+        return []
+    
+    # Алгоритм работает при числе строк не больше числа столбцов
+    transposed = weights.shape[0] > weights.shape[1]
+    if transposed:
+        weights = weights.T
+    n_rows, n_cols = weights.shape
+    cost = weights.max() - weights
+    
+    # Потенциалы строк и столбцов, p[j] - строка, назначенная столбцу j (нумерация с 1)
+    u = np.zeros(n_rows + 1)
+    v = np.zeros(n_cols + 1)
+    p = np.zeros(n_cols + 1, dtype=np.int64)
+    way = np.zeros(n_cols + 1, dtype=np.int64)
+    
+    for row in range(1, n_rows + 1):
+        p[0] = row
+        j0 = 0
+        minv = np.full(n_cols + 1, np.inf)
+        used = np.zeros(n_cols + 1, dtype=bool)
+        
+        # Поиск кратчайшего увеличивающего пути, внутренний цикл по столбцам векторизован
+        while True:
+            used[j0] = True
+            i0 = p[j0]
+            free = ~used[1:]
+            reduced = cost[i0 - 1] - u[i0] - v[1:]
+            improved = free & (reduced < minv[1:])
+            minv[1:][improved] = reduced[improved]
+            way[1:][improved] = j0
+            
+            candidates = np.where(free, minv[1:], np.inf)
+            j1 = int(candidates.argmin()) + 1
+            delta = candidates[j1 - 1]
+            
+            used_cols = np.nonzero(used)[0]
+            u[p[used_cols]] += delta
+            v[used_cols] -= delta
+            minv[1:][free] -= delta
+            
+            j0 = j1
+            if p[j0] == 0:
+                break
+        
+        # Разворачиваем найденный путь
+        while j0:
+            j1 = way[j0]
+            p[j0] = p[j1]
+            j0 = j1
+    
+    pairs = [(int(p[j]) - 1, j - 1) for j in range(1, n_cols + 1) if p[j] != 0]
+    if transposed:
+        pairs = [(col, row) for row, col in pairs]
+    return sorted(pairs)
+
+
+def map_columns_automatically(source_columns, target_columns, threshold=70):
+    """
+    Автоматически сопоставляет колонки на основе схожести названий
+    
+    Args:
+        source_columns: Список колонок исходной таблицы
+        target_columns: Список колонок целевой таблицы
+        threshold: Порог схожести для сопоставления (0-100)
+        
+    Returns:
+        Dict: Словарь соответствия {source_column: target_column}
+    """
+    # Готовые словари соответствия между маркетплейсами
+    # Словарь WB -> Ozon
+    wb_to_ozon = {
+        'Артикул продавца': 'Артикул*',
+        'Наименование': 'Название товара*',
+        'Бренд': 'Бренд*',
+        'Описание': 'Аннотация',
+        'Фото': 'Ссылка на главное фото*',
+        'Вес с упаковкой (кг)': 'Вес в упаковке, г*',
+        'Цвет': 'Цвет товара*',
+        'Цена': 'Цена, руб.*',
+        'Вес без упаковки (кг)': 'Вес товара, г',
+        'Высота упаковки': 'Высота упаковки, мм*',
+        'Длина упаковки': 'Длина упаковки, мм*',
+        'Ширина упаковки': 'Ширина упаковки, мм*',
+        'Комплектация': 'Комплектация',
+        'Страна производства': 'Страна-изготовитель',
+        'Материал изделия': 'Материал'
+        # Убраны проблемные соответствия по указанию пользователя
+        # 'Количество в упаковке, шт': 'Код упаковки',
+        # 'Видео': 'Вид выпуска товара',
+        # 'ИКПУ': 'Артикул фото',
+        # 'Артикул WB': 'Ozon ID',
+        # '18+': 'N°'
+    }
+    
+    # Словарь Ozon -> WB
+    ozon_to_wb = {
+        'Артикул*': 'Артикул продавца',
+        'Название товара*': 'Наименование',
+        'Бренд*': 'Бренд',
+        'Аннотация': 'Описание',
+        'Ссылка на главное фото*': 'Фото',
+        'Вес в упаковке, г*': 'Вес с упаковкой (кг)',
+        'Цвет товара*': 'Цвет',
+        'Цена, руб.*': 'Цена',
+        'Вес товара, г': 'Вес без упаковки (кг)',
+        'Высота упаковки, мм*': 'Высота упаковки',
+        'Длина упаковки, мм*': 'Длина упаковки',
+        'Ширина упаковки, мм*': 'Ширина упаковки',
+        'Комплектация': 'Комплектация',
+        'Страна-изготовитель': 'Страна производства',
+        'Материал': 'Материал изделия'
+        # Убраны проблемные соответствия по указанию пользователя
+        # 'Код упаковки': 'Количество в упаковке, шт',
+        # 'Вид выпуска товара': 'Видео',
+        # 'Артикул фото': 'ИКПУ',
+        # 'Ozon ID': 'Артикул WB',
+        # 'N°': '18+'
+    }
+    
+    mapping = {}
+    used_target_columns = set()
+    
+    # Функция для определения типа маркетплейса только по столбцам
+    def detect_marketplace_from_columns(columns):
+        if not columns:
+            return 'unknown'
+            
+        # Характерные колонки для Wildberries
+        wb_indicators = ['Артикул продавца', 'Артикул WB', 'Наименование', 'Бренд', 'Вес с упаковкой (кг)', 
+                         'Высота упаковки', 'Ширина упаковки', 'Длина упаковки']
+        
+        # Характерные колонки для Ozon с маркером обязательности (*)
+        ozon_indicators = ['Артикул*', 'Название товара*', 'Бренд*', 'Ссылка на главное фото*', 
+                          'Вес в упаковке, г*', 'Высота упаковки, мм*', 'Длина упаковки, мм*', 'Ширина упаковки, мм*']
+        
+        wb_matches = sum(1 for col in columns if col in wb_indicators)
+        ozon_matches = sum(1 for col in columns if col in ozon_indicators)
+        
+        if wb_matches >= 4:
+            return 'wildberries'
+        elif ozon_matches >= 4:
+            return 'ozon'
+        else:
+            return 'unknown'
+            
+    # Сначала нормализуем все колонки
+    source_normalized = {col: normalize_column_name(col) for col in source_columns}
+    target_normalized = {col: normalize_column_name(col) for col in target_columns}
+    
+    # Создаем индекс нормализованных значений для более быстрого поиска
+    target_by_norm = {}
+    for tgt_col, tgt_norm in target_normalized.items():
+        if tgt_norm not in target_by_norm:
+            target_by_norm[tgt_norm] = []
+        target_by_norm[tgt_norm].append(tgt_col)
+    
+    # Сначала сопоставляем ключевые колонки (артикул, название, цена)
+    key_columns = {'артикул': [], 'название': [], 'цена': []}
+    
+    # Находим ключевые колонки в исходной таблице
+    for src_col, src_norm in source_normalized.items():
+        if src_norm in key_columns:
+            key_columns[src_norm].append(src_col)
+    
+    # Сопоставляем ключевые колонки первыми
+    for key, src_cols in key_columns.items():
+        if src_cols and key in target_by_norm:
+            for src_col in src_cols:
+                if src_col not in mapping:
+                    for tgt_col in target_by_norm[key]:
+                        if tgt_col not in used_target_columns:
+                            mapping[src_col] = tgt_col
+                            used_target_columns.add(tgt_col)
+                            break
+    
+    # Сначала ищем точные совпадения нормализованных имён
+    for src_col, src_norm in source_normalized.items():
+        if src_col not in mapping and src_norm in target_by_norm:
+            for tgt_col in target_by_norm[src_norm]:
+                if tgt_col not in used_target_columns:
+                    mapping[src_col] = tgt_col
+                    used_target_columns.add(tgt_col)
+                    break
+    
+    # Затем ищем по полному совпадению оригинальных названий
+    for src_col in source_columns:
+        if src_col not in mapping:
+            for tgt_col in target_columns:
+                if src_col == tgt_col and tgt_col not in used_target_columns:
+                    mapping[src_col] = tgt_col
+                    used_target_columns.add(tgt_col)
+                    break
+    
+    # Применяем предопределенные сопоставления если определены маркетплейсы
+    source_marketplace = detect_marketplace_from_columns(source_columns)
+    target_marketplace = detect_marketplace_from_columns(target_columns)
+    
+    # Если определены маркетплейсы, используем готовые словари
+    if source_marketplace == 'wildberries' and target_marketplace == 'ozon':
+        # Маппинг WB -> Ozon
+        for src_col in source_columns:
+            if src_col not in mapping:  # Пропускаем уже сопоставленные колонки
+                # Проверяем наличие колонки в словаре точных соответствий
+                if src_col in wb_to_ozon and wb_to_ozon[src_col] is not None:
+                    target_col = wb_to_ozon[src_col]
+                    if target_col in target_columns and target_col not in used_target_columns:
+                        mapping[src_col] = target_col
+                        used_target_columns.add(target_col)
+    
+    elif source_marketplace == 'ozon' and target_marketplace == 'wildberries':
+        # Маппинг Ozon -> WB
+        for src_col in source_columns:
+            if src_col not in mapping:  # Пропускаем уже сопоставленные колонки
+                # Проверяем наличие колонки в словаре точных соответствий
+                if src_col in ozon_to_wb and ozon_to_wb[src_col] is not None:
+                    target_col = ozon_to_wb[src_col]
+                    if target_col in target_columns and target_col not in used_target_columns:
+                        mapping[src_col] = target_col
+                        used_target_columns.add(target_col)
+    
+    # Ищем по частичному совпадению после нормализации
+    for src_col, src_norm in source_normalized.items():
+        if src_col not in mapping:
+            best_match = None
+            longest_common = 0
+            
+            for tgt_col, tgt_norm in target_normalized.items():
+                if tgt_col not in used_target_columns:
+                    # Если один является вложенным в другой
+                    if (src_norm in tgt_norm or tgt_norm in src_norm) and len(min(src_norm, tgt_norm, key=len)) > 3:
+                        common_length = len(min(src_norm, tgt_norm, key=len))
+                        if common_length > longest_common:
+                            longest_common = common_length
+                            best_match = tgt_col
+            
+            if best_match:
+                mapping[src_col] = best_match
+                used_target_columns.add(best_match)
+    
+    # Нечеткое сопоставление оставшихся колонок: матрица оценок всех пар
+    # и глобально оптимальное назначение вместо жадного выбора
+    remaining_source = [col for col in source_columns if col not in mapping]
+    remaining_target = [col for col in target_columns if col not in used_target_columns]
+    
+    if remaining_source and remaining_target:
+        scores = score_column_matrix(
+            [source_normalized[col] for col in remaining_source],
+            [target_normalized[col] for col in remaining_target]
+        )
+        # Пары ниже порога не участвуют в назначении
+        weights = np.where(scores >= threshold, scores, 0)
+        
+        for src_idx, tgt_idx in optimal_assignment(weights):
+            if weights[src_idx, tgt_idx] > 0:
+                mapping[remaining_source[src_idx]] = remaining_target[tgt_idx]
+                used_target_columns.add(remaining_target[tgt_idx])
+    
+    return mapping
+
+
+def _detect_hint_rows(existing_values, header_row):
+    """
+    Находит строки с пояснениями/подсказками под заголовками шаблона
+    
+    Args:
+        existing_values: Словарь {номер строки: {колонка: значение}} для строк под заголовком
+        header_row: Номер строки с заголовками
+        
+    Returns:
+        list: Номера строк с подсказками
+    """
+    hint_rows = []
+    for row_idx, row_data in existing_values.items():
+        # Проверка 1: Строка непосредственно после заголовка может быть подсказкой
+        if row_idx == header_row + 1:
+            # Проверяем, достаточно ли похожа строка на подсказку
+            text_only = True
+            hint_pattern = False
+            long_text_count = 0
+            
+            for col_name, val in row_data.items():
+                if val is not None:
+                    val_str = str(val) if not isinstance(val, str) else val
+                    if len(val_str) > 15:  # Длинный текст может быть подсказкой
+                        long_text_count += 1
+                    if isinstance(val, (int, float)) or (isinstance(val, str) and val.isdigit()):
+                        text_only = False
+                    # Проверяем если текст содержит типичные слова-маркеры подсказок
+                    hint_markers = ["заполнить", "заполняйте", "указать", "указывать", "используйте", 
+                                   "только для", "вводите", "укажите", "обязательно", "не более"]
+                    if isinstance(val, str) and any(marker in val.lower() for marker in hint_markers):
+                        hint_pattern = True
+            
+            # Если это первая строка и у неё есть признаки подсказок, признаем её подсказкой
+            if (text_only and long_text_count > 0) or hint_pattern:
+                hint_rows.append(row_idx)
+                continue
+        
+        # Проверка 2: Стандартное обнаружение строк с подсказками (текстовые строки без чисел)
+        text_only = True
+        has_content = False
+        long_text_found = False
+        
+        for col_name, val in row_data.items():
+            if val is not None:
+                has_content = True
+                if isinstance(val, str) and len(val) > 15:
+                    long_text_found = True
+                
+                # Если значение содержит цифры и не выглядит как подсказка, то это не подсказка
+                if isinstance(val, (int, float)) or (isinstance(val, str) and any(c.isdigit() for c in val)):
+                    # Проверяем, может ли строка с цифрами всё же быть подсказкой
+                    # (например, "минимум 5 символов" или "не более 100 знаков")
+                    if not isinstance(val, str) or not any(marker in val.lower() for marker in 
+                                                          ["минимум", "максимум", "не более", "не менее", 
+                                                           "до", "от", "символов", "знаков"]):
+                        text_only = False
+                        break
+        
+        # Строка считается подсказкой если: 
+        # - содержит только текст
+        # - имеет содержимое (не пустая)
+        # - содержит достаточно длинный текст (более вероятно для подсказок)
+        if has_content and text_only and long_text_found:
+            hint_rows.append(row_idx)
+    
+    return hint_rows
+
+
+def _count_row_kinds(values):
+    """
+    Считает числовые значения и описательные строки (без цифр) в строке таблицы
+    
+    Args:
+        values: Значения ячеек строки
+        
+    Returns:
+        tuple: (количество чисел, количество описательных строк)
+    """
+    numeric_values = 0
+    string_descriptors = 0
+    
+    for val in values:
+        if isinstance(val, (int, float)) and not pd.isna(val):
+            numeric_values += 1
+        elif isinstance(val, str) and not any(c.isdigit() for c in val):
+            string_descriptors += 1
+    
+    return numeric_values, string_descriptors
+
+
+def _is_numeric_row(values):
+    """
+    Проверяет, похожа ли первая строка исходной таблицы на данные, а не на подзаголовок
+    
+    Args:
+        values: Значения ячеек строки
+        
+    Returns:
+        bool: True, если числовых значений больше, чем описательных строк без цифр
+    """
+    numeric_values, string_descriptors = _count_row_kinds(values)
+    
+    # Если в строке больше нечисловых описательных значений, это может быть подзаголовок
+    return numeric_values > string_descriptors
+
+
+def _is_subheader_row(values):
+    """
+    Проверяет, является ли строка подзаголовком: описательных строк больше, чем чисел
+    
+    Args:
+        values: Значения ячеек строки
+        
+    Returns:
+        bool: True, если строка похожа на подзаголовок
+    """
+    numeric_values, string_descriptors = _count_row_kinds(values)
+    return string_descriptors > numeric_values
+
+
+def _prepare_transfer_value(source_col, target_col, value, get_source_value, source_columns, column_mapping):
+    """
+    Готовит значение исходной ячейки к записи в целевую колонку шаблона
+    
+    Args:
+        source_col: Исходная колонка
+        target_col: Целевая колонка
+        value: Значение исходной ячейки
+        get_source_value: Функция (колонка, значение по умолчанию) -> значение из той же строки
+        source_columns: Колонки исходной таблицы
+        column_mapping: Словарь соответствия колонок {source_column: target_column}
+        
+    Returns:
+        tuple: (значение для записи, признак того, что запись нужно пропустить)
+    """
+    # Обработка типов данных для обеспечения совместимости
+    if value is not None:
+        # Преобразуем все значения в строки для большей совместимости
+        if isinstance(value, (int, float)):
+            # Числовые значения не конвертируем, оставляем как есть
+            pass
+        elif not isinstance(value, str):
+            # Для других типов данных делаем строковое представление
+            value = str(value)
+
+    # Специальная обработка для фотографий
+    # WB -> Ozon: поле "Фото" переносится в "Ссылка на главное фото*" (первая ссылка) и "Ссылки на дополнительные фото"
+    if source_col == "Фото" and (target_col == "Ссылка на главное фото*" or target_col == "Ссылки на дополнительные фото"):
+        if value and isinstance(value, str):
+            # Разделяем строку с фотографиями по новым строкам и другим разделителям
+            photo_links = re.split(r'[\n\r,;]+', value.strip())
+            photo_links = [link.strip() for link in photo_links if link and link.strip().startswith('http')]
+
+            if photo_links:
+                if target_col == "Ссылка на главное фото*":
+                    # Берем только первую ссылку для главного фото
+                    value = photo_links[0]
+                elif target_col == "Ссылки на дополнительные фото" and len(photo_links) > 1:
+                    # Для дополнительных фото берем все кроме первой, склеиваем через точку с запятой
+                    value = '\n'.join(photo_links[1:])
+
+    # Ozon -> WB: объединяем "Ссылка на главное фото*" и "Ссылки на дополнительные фото" в поле "Фото"
+    if (source_col == "Ссылка на главное фото*" or source_col == "Ссылки на дополнительные фото") and target_col == "Фото":
+        # Если мы обрабатываем главное фото
+        if source_col == "Ссылка на главное фото*":
+            # Преобразуем значение в строку, чтобы избежать ошибок конкатенации
+            main_photo = str(value) if value else ""
+
+            # Ищем дополнительные фото в этой же строке
+            additional_photos_col = "Ссылки на дополнительные фото"
+            if additional_photos_col in source_columns:
+                additional_photos = get_source_value(additional_photos_col, "")
+                if additional_photos and isinstance(additional_photos, str):
+                    # Разбиваем дополнительные фото, которые могут быть с переносом строки
+                    add_photos_split = re.split(r'[\n\r,;]+', additional_photos.strip())
+                    add_photos_clean = [p.strip() for p in add_photos_split if p and p.strip().startswith('http')]
+
+                    # Объединяем фото с правильным разделителем - перенос строки для WB
+                    if main_photo:
+                        all_photos = [main_photo] + add_photos_clean
+                        value = '\n'.join(all_photos)
+                    else:
+                        value = '\n'.join(add_photos_clean) if add_photos_clean else ""
+
+        # Если мы обрабатываем дополнительные фото, то пропускаем обработку,
+        # так как они уже обработаны вместе с главным фото
+        elif source_col == "Ссылки на дополнительные фото":
+            # Проверяем, обрабатывали ли мы уже эту пару колонок через главное фото
+            main_photo_col = "Ссылка на главное фото*"
+            if main_photo_col in source_columns and main_photo_col in column_mapping:
+                return value, True  # Пропускаем, так как эти данные уже должны быть обработаны через главное фото
+    
+    return value, False
+
+
+# Сколько строк показывает предварительный просмотр по умолчанию
+PREVIEW_ROWS = 10
+
+# Пары колонок с фотографиями, значения которых разбираются по ссылкам построчно
+PHOTO_TRANSFERS = {
+    ("Фото", "Ссылка на главное фото*"),
+    ("Фото", "Ссылки на дополнительные фото"),
+    ("Ссылка на главное фото*", "Фото"),
+}
+
+
+def _preview_cell(value):
+    """
+    Приводит значение к строке для отображения (пустые значения - None)
+    """
+    if value is None:
+        return None
+    try:
+        if pd.isna(value):
+            return None
+    except (TypeError, ValueError):
+        pass
+    return str(value)
+
+
+def preview_data(source_df, target_df, column_mapping, max_rows=PREVIEW_ROWS):
+    """
+    Создает предварительный просмотр того, как данные будут выглядеть после переноса
+    
+    Вычисляется только отображаемая часть: исходная таблица обрезается до
+    max_rows строк, колонки переносятся одним переименованием и reindex,
+    а в строки преобразуется только этот срез. Время не зависит от размера
+    исходной таблицы.
+    
+    Args:
+        source_df: DataFrame с исходными данными
+        target_df: DataFrame целевой таблицы
+        column_mapping: Словарь соответствия колонок {source_column: target_column}
+        max_rows: Сколько строк показать (включая подзаголовок целевой таблицы),
+            None - всю таблицу
+        
+    Returns:
+        DataFrame: DataFrame с предварительным просмотром (значения - строки или None)
+    """
+    result_columns = target_df.columns
+    
+    # Пропускаем подзаголовок исходной таблицы, если он есть
+    data_start_idx = 0
+    if len(source_df) > 0 and _is_subheader_row(list(source_df.iloc[0])):
+        data_start_idx = 1
+    
+    # Подзаголовок целевой таблицы сохраняем первой строкой просмотра
+    head_df = target_df.iloc[:0]
+    if len(target_df) > 0 and _is_subheader_row(list(target_df.iloc[0])):
+        head_df = target_df.iloc[[0]]
+    
+    n_rows = len(source_df) - data_start_idx
+    if max_rows is not None:
+        n_rows = min(n_rows, max(max_rows - len(head_df), 0))
+    body = source_df.iloc[data_start_idx:data_start_idx + n_rows]
+    
+    # Для каждой целевой колонки - исходная колонка (при повторах побеждает последняя пара),
+    # дополнительные фото не перезаписывают уже объединенное с ними главное фото
+    target_sources = {}
+    for src, tgt in column_mapping.items():
+        if tgt not in result_columns or src not in body.columns:
+            continue
+        _, skip = _prepare_transfer_value(src, tgt, None, lambda col, default=None: default,
+                                          body.columns, column_mapping)
+        if not skip:
+            target_sources[tgt] = src
+    
+    # Одно переименование и reindex вместо построчной сборки
+    mapped = body[list(target_sources.values())].astype(object)
+    mapped.columns = list(target_sources.keys())
+    
+    # Ссылки на фото разбираются построчно, но только в отображаемом срезе
+    for tgt, src in target_sources.items():
+        if (src, tgt) not in PHOTO_TRANSFERS:
+            continue
+        column_values = []
+        for position, value in enumerate(body[src]):
+            value = None if _preview_cell(value) is None else value
+            value, _ = _prepare_transfer_value(
+                src, tgt, value,
+                lambda col, default=None, position=position: body[col].iat[position] if col in body.columns else default,
+                body.columns, column_mapping
+            )
+            column_values.append(value)
+        mapped[tgt] = column_values
+    
+    mapped = mapped.reindex(columns=result_columns)
+    result_df = pd.concat([head_df.astype(object), mapped], ignore_index=True) if len(head_df) else mapped.reset_index(drop=True)
+    
+    # Преобразуем в строки только отображаемый срез
+    for col in result_df.columns:
+        result_df[col] = result_df[col].map(_preview_cell).astype(object)
+    
+    return result_df
+
+
+def transfer_data_between_tables(source_df, target_workbook, target_sheet_name, column_mapping, target_header_row=1):
+    """
+    Переносит данные из исходного DataFrame в целевую таблицу, сохраняя форматирование
+    
+    Args:
+        source_df: DataFrame с исходными данными
+        target_workbook: Объект целевой рабочей книги openpyxl
+        target_sheet_name: Имя целевого листа
+        column_mapping: Словарь соответствия колонок {source_column: target_column}
+        target_header_row: Номер строки с заголовками в целевой таблице (по умолчанию 1)
+        
+    Returns:
+        Объект рабочей книги openpyxl с обновленными данными
+    """
+    # Получаем целевой лист
+    target_sheet = target_workbook[target_sheet_name]
+    
+    # Находим индексы колонок в целевой таблице
+    header_row = target_header_row  # Используем переданный номер строки с заголовками
+    # Читаем только строку заголовков, а не материализуем все строки листа
+    header_cells = target_sheet[header_row]
+    
+    target_column_indices = {}
+    for cell in header_cells:
+        if cell.value:
+            target_column_indices[str(cell.value)] = cell.column
+    
+    # Сохраняем информацию о форматировании и подзаголовках в целевой таблице
+    style_info = {}
+    subheader_info = {}
+    first_data_row = header_row + 1  # Первая строка с данными (после заголовка)
+    
+    # Проверяем наличие подзаголовков или дополнительной информации непосредственно под заголовками
+    has_subheaders = False
+    subheader_row = target_sheet.cell(row=first_data_row, column=1).value
+    if subheader_row is not None and isinstance(subheader_row, str) and not any(char.isdigit() for char in subheader_row):
+        has_subheaders = True
+        # Сохраняем подзаголовки для каждой колонки
+        for col_name, col_idx in target_column_indices.items():
+            subheader_cell = target_sheet.cell(row=first_data_row, column=col_idx)
+            if subheader_cell.value:
+                subheader_info[col_name] = {
+                    'value': subheader_cell.value,
+                    'style': copy(subheader_cell._style),
+                }
+        # Смещаем первую строку с данными, если есть подзаголовки
+        first_data_row += 1
+    
+    # Сохраняем все существующие данные в целевой таблице для анализа
+    existing_data = {}
+    max_row = min(target_sheet.max_row, header_row + 20)  # Ограничиваем для производительности
+    
+    for row_idx in range(header_row + 1, max_row + 1):
+        row_data = {}
+        for col_name, col_idx in target_column_indices.items():
+            cell = target_sheet.cell(row=row_idx, column=col_idx)
+            row_data[col_name] = {
+                'value': cell.value,
+                'style': copy(cell._style),
+            }
+        existing_data[row_idx] = row_data
+    
+    # Выявляем строки с пояснениями/подсказками
+    hint_rows = _detect_hint_rows(
+        {row_idx: {col_name: info['value'] for col_name, info in row_data.items()}
+         for row_idx, row_data in existing_data.items()},
+        header_row
+    )
+    
+    # Определяем последнюю строку с подсказками
+    last_hint_row = max(hint_rows) if hint_rows else header_row
+    
+    # Сначала определим строку, которая точно содержит данные, а не подсказки
+    # Ищем первую строку с числовыми данными после заголовков
+    data_sample_row = None
+    for row_idx in range(header_row + 1, min(target_sheet.max_row + 1, header_row + 20)):
+        has_numeric_data = False
+        for col_name, col_idx in target_column_indices.items():
+            cell_value = target_sheet.cell(row=row_idx, column=col_idx).value
+            if isinstance(cell_value, (int, float)) or (isinstance(cell_value, str) and any(c.isdigit() for c in cell_value)):
+                has_numeric_data = True
+                break
+        
+        if has_numeric_data and row_idx not in hint_rows:
+            data_sample_row = row_idx
+            break
+    
+    # Если не нашли строку с данными, берем последнюю строку после подсказок
+    if data_sample_row is None:
+        data_sample_row = last_hint_row + 1
+        
+    # Сохраняем стили форматирования из найденной строки с данными (не из подсказок).
+    # Стиль ячейки openpyxl - это набор идентификаторов общих шрифтов, заливок и т.д.
+    # книги, поэтому один раз запоминаем его для колонки и затем только ссылаемся на него
+    for col_name, col_idx in target_column_indices.items():
+        # Берем ячейку из строки с данными для сохранения стиля
+        template_cell = target_sheet.cell(row=data_sample_row, column=col_idx)
+        style_info[col_name] = copy(template_cell._style)
+    
+    # Восстанавливаем все подсказки в ячейках из полученной ранее информации
+    for row_idx in hint_rows:
+        for col_name, col_idx in target_column_indices.items():
+            if row_idx in existing_data and col_name in existing_data[row_idx]:
+                cell_info = existing_data[row_idx][col_name]
+                cell = target_sheet.cell(row=row_idx, column=col_idx)
+                cell.value = cell_info['value']
+                
+                # Восстанавливаем форматирование
+                cell._style = copy(cell_info['style'])
+    
+    # Удаляем только строки с числовыми данными, сохраняя подсказки
+    for row_idx in range(header_row + 1, target_sheet.max_row + 1):
+        if row_idx not in hint_rows:
+            for col_name, col_idx in target_column_indices.items():
+                target_sheet.cell(row=row_idx, column=col_idx).value = None
+    
+    # Пропускаем первые строки в исходной таблице, если они содержат подзаголовки
+    data_start_idx = 0
+    first_row_is_numeric = False
+    
+    if len(source_df) > 0:
+        # Проверяем, является ли первая строка числовой (для Pandas индексация с 0)
+        first_row = source_df.iloc[0]
+        first_row_is_numeric = _is_numeric_row([first_row[col] for col in source_df.columns])
+        
+        if not first_row_is_numeric:
+            data_start_idx = 1  # Пропускаем первую строку при переносе данных
+    
+    # Определяем, где начинать вставку данных в целевой таблице
+    # Должно быть после всех строк с подсказками
+    data_insertion_start = last_hint_row + 1
+    
+    # Для каждой строки в source_df (начиная с индекса data_start_idx) 
+    # создаем набор значений для записи в целевую таблицу
+    for idx, source_row in source_df.iloc[data_start_idx:].iterrows():
+        # Вычисляем индекс строки в целевой таблице
+        row_offset = idx - data_start_idx if data_start_idx > 0 else idx
+        target_row_idx = row_offset + data_insertion_start
+        
+        # Переносим данные в соответствии с маппингом
+        for source_col, target_col in column_mapping.items():
+            if target_col in target_column_indices:
+                target_col_idx = target_column_indices[target_col]
+                
+                # Получаем значение из исходной таблицы
+                value = source_row.get(source_col)
+                
+                value, skip = _prepare_transfer_value(
+                    source_col, target_col, value, source_row.get, source_df.columns, column_mapping
+                )
+                if skip:
+                    continue
+                
+                # Записываем значение в целевую таблицу
+                cell = target_sheet.cell(row=target_row_idx, column=target_col_idx)
+                cell.value = value
+                
+                # Применяем сохраненное форматирование из образца данных (не из подсказок):
+                # ячейке достается копия массива идентификаторов, без новых объектов стилей
+                if target_col in style_info:
+                    cell._style = copy(style_info[target_col])
+    
+    # Восстанавливаем подзаголовки в целевой таблице, если они были
+    if has_subheaders:
+        for col_name, col_idx in target_column_indices.items():
+            if col_name in subheader_info:
+                subheader_cell = target_sheet.cell(row=header_row + 1, column=col_idx)
+                subheader_cell.value = subheader_info[col_name]['value']
+                
+                # Восстанавливаем форматирование подзаголовка
+                subheader_cell._style = copy(subheader_info[col_name]['style'])
+    
+    return target_workbook
+
+
+
+def stream_fill_template(source_columns, source_rows, template_file, target_sheet_name, column_mapping,
+                         output, target_header_row=1, backend=None):
+    """
+    Заполняет шаблон маркетплейса данными в потоковом режиме
+    
+    В отличие от transfer_data_between_tables шаблон не загружается целиком:
+    из целевого листа читаются только заголовок и строки подсказок под ним,
+    а строки данных сразу дописываются в выходной файл
+    потоковым писателем (xlsxwriter в режиме constant_memory или write-only openpyxl). Память не растет
+    с числом строк, поэтому режим подходит для выгрузок любого размера.
+    
+    Ограничения режима: переносятся значения и стили ячеек, но не
+    объединенные ячейки, ширина колонок, проверки данных и формулы
+    (вместо формул записываются сохраненные значения). Строки-примеры
+    шаблона после подсказок не копируются.
+    
+    Args:
+        source_columns: Колонки исходной таблицы
+        source_rows: Итерируемый набор строк исходной таблицы (кортежи значений
+            в порядке source_columns, пустые значения - None), например
+            excel_writer.iter_dataframe_rows(df)
+        template_file: Путь к файлу шаблона или файловый объект
+        target_sheet_name: Имя целевого листа
+        column_mapping: Словарь соответствия колонок {source_column: target_column}
+        output: Путь или файловый объект для сохранения результата
+        target_header_row: Номер строки с заголовками в целевой таблице (по умолчанию 1)
+        backend: Бэкенд записи XLSX (см. excel_writer; None - самый быстрый из доступных)
+        
+    Returns:
+        int: Количество записанных строк данных
+    """
+    header_row = target_header_row
+    source_columns = list(source_columns)
+    
+    # Позиция каждой исходной колонки (при повторах берется первая)
+    source_positions = {}
+    for position, col in enumerate(source_columns):
+        source_positions.setdefault(col, position)
+    
+    template, sheetnames = load_excel_file(template_file, streaming=True)
+    try:
+        writer = open_book_writer(output, backend)
+    except Exception:
+        template.close()
+        raise
+    rows_written = 0
+    
+    try:
+        for sheet_name in sheetnames:
+            source_sheet = template[sheet_name]
+            output_sheet = writer.add_sheet(sheet_name)
+            
+            def translate(cell, output_sheet=output_sheet):
+                return writer.style_from_cell(output_sheet, cell)
+            
+            if sheet_name != target_sheet_name:
+                # Остальные листы копируем строка за строкой
+                for row in source_sheet.iter_rows(values_only=False):
+                    writer.append(output_sheet, [cell.value for cell in row], [translate(cell) for cell in row])
+                continue
+            
+            # Лениво читаем только заголовок и до 20 строк под ним
+            preamble = [list(row) for row in source_sheet.iter_rows(max_row=header_row + 20, values_only=False)]
+            while len(preamble) < header_row:
+                preamble.append([])
+            
+            def preamble_cell(row_idx, col_idx):
+                if row_idx > len(preamble) or col_idx > len(preamble[row_idx - 1]):
+                    return None
+                return preamble[row_idx - 1][col_idx - 1]
+            
+            def preamble_value(row_idx, col_idx):
+                cell = preamble_cell(row_idx, col_idx)
+                return cell.value if cell is not None else None
+            
+            target_column_indices = {}
+            for col_idx, cell in enumerate(preamble[header_row - 1], start=1):
+                if cell.value:
+                    target_column_indices[str(cell.value)] = col_idx
+            
+            # Подзаголовки непосредственно под заголовками
+            first_value = preamble_value(header_row + 1, 1)
+            has_subheaders = isinstance(first_value, str) and not any(char.isdigit() for char in first_value)
+            
+            # Строки с подсказками - по тем же правилам, что и при обычном заполнении
+            existing_values = {
+                row_idx: {col_name: preamble_value(row_idx, col_idx) for col_name, col_idx in target_column_indices.items()}
+                for row_idx in range(header_row + 1, len(preamble) + 1)
+            }
+            hint_rows = _detect_hint_rows(existing_values, header_row)
+            last_hint_row = max(hint_rows) if hint_rows else header_row
+            
+            # Строка-образец со стилями данных: первая строка с цифрами, не являющаяся подсказкой
+            data_sample_row = None
+            for row_idx in range(header_row + 1, min(len(preamble) + 1, header_row + 20)):
+                has_numeric_data = any(
+                    isinstance(value, (int, float)) or (isinstance(value, str) and any(c.isdigit() for c in value))
+                    for value in existing_values[row_idx].values()
+                )
+                if has_numeric_data and row_idx not in hint_rows:
+                    data_sample_row = row_idx
+                    break
+            if data_sample_row is None:
+                data_sample_row = last_hint_row + 1
+            
+            # Один прототип стиля на колонку, ячейкам данных достаются копии массива
+            style_info = {}
+            for col_name, col_idx in target_column_indices.items():
+                template_cell = preamble_cell(data_sample_row, col_idx)
+                if template_cell is not None:
+                    style_info[col_name] = translate(template_cell)
+            
+            # Заголовок, подзаголовки и подсказки переписываем как есть,
+            # а в прочих строках до последней подсказки очищаем заполняемые колонки
+            preamble_end = max(last_hint_row, header_row + 1 if has_subheaders else header_row)
+            mapped_indices = {target_column_indices[target_col] for target_col in column_mapping.values()
+                              if target_col in target_column_indices}
+            for row_idx in range(1, preamble_end + 1):
+                row = preamble[row_idx - 1] if row_idx <= len(preamble) else []
+                keep_values = (row_idx <= header_row or row_idx in hint_rows
+                               or (has_subheaders and row_idx == header_row + 1))
+                writer.append(
+                    output_sheet,
+                    [cell.value if keep_values or col_idx not in mapped_indices else None
+                     for col_idx, cell in enumerate(row, start=1)],
+                    [translate(cell) for cell in row]
+                )
+            
+            # Пары колонок, которые попадают в шаблон, и ширина строки данных
+            transfers = [(source_col, target_col, target_column_indices[target_col])
+                         for source_col, target_col in column_mapping.items()
+                         if target_col in target_column_indices]
+            row_width = max(target_column_indices.values(), default=0)
+            row_styles = [None] * row_width
+            for source_col, target_col, target_col_idx in transfers:
+                row_styles[target_col_idx - 1] = style_info.get(target_col)
+            
+            rows = iter(source_rows)
+            first_row = next(rows, None)
+            # Первая строка исходной таблицы может быть подзаголовком - тогда пропускаем ее
+            if first_row is not None and _is_numeric_row(first_row):
+                rows = itertools.chain([first_row], rows)
+            
+            for source_row in rows:
+                def get_source_value(col, default=None, source_row=source_row):
+                    position = source_positions.get(col)
+                    return source_row[position] if position is not None else default
+                
+                values = [None] * row_width
+                for source_col, target_col, target_col_idx in transfers:
+                    value, skip = _prepare_transfer_value(
+                        source_col, target_col, get_source_value(source_col), get_source_value,
+                        source_positions, column_mapping
+                    )
+                    if skip:
+                        continue
+                    values[target_col_idx - 1] = value
+                writer.append(output_sheet, values, row_styles)
+                rows_written += 1
+    finally:
+        # Книга закрывается и при ошибке, чтобы не оставлять открытыми файлы
+        try:
+            writer.close()
+        finally:
+            template.close()
+    
+    return rows_written
+
+
+def align_columns_to_marketplace(columns, marketplace, threshold=70):
+    """
+    Сопоставляет колонки загруженной таблицы с ожидаемыми колонками маркетплейса
+    
+    Колонки, уже совпадающие с ожидаемыми, не трогаются; остальные
+    сопоставляются через map_columns_automatically.
+    
+    Args:
+        columns: Колонки загруженной таблицы
+        marketplace: Маркетплейс, к формату которого приводятся названия
+        threshold: Порог схожести для сопоставления (0-100)
+        
+    Returns:
+        Dict: Словарь переименования {колонка файла: ожидаемая колонка}
+    """
+    expected_columns = get_marketplace_columns(marketplace)
+    present = set(columns)
+    source_columns = [col for col in columns if col not in expected_columns]
+    target_columns = [col for col in expected_columns if col not in present]
+    
+    if not source_columns or not target_columns:
+        return {}
+    return map_columns_automatically(source_columns, target_columns, threshold)
@@ -0,0 +1,256 @@
+import html
+import posixpath
+import re
+import zipfile
+import xml.etree.ElementTree as ET
+
+_MAIN = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_REL = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+_PACKAGE_REL = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+
+_ROW = f"{_MAIN}row"
+_CELL = f"{_MAIN}c"
+_VALUE = f"{_MAIN}v"
+_TEXT = f"{_MAIN}t"
+_RUN = f"{_MAIN}r"
+
+_SHARED_STRINGS_TYPE = "/sharedStrings"
+_CELL_REF_RE = re.compile(r"([A-Z]+)(\d*)")
+
+# sharedStrings.xml бывает больше самих листов, поэтому элементы <si> ищутся
+# регулярными выражениями по байтам, без построения дерева для каждой строки
+_SHARED_ITEM_RE = re.compile(rb"<(?:\w+:)?si(?:\s[^>]*)?>(.*?)</(?:\w+:)?si>|<(?:\w+:)?si\s*/>", re.S)
+_PHONETIC_RE = re.compile(rb"<(?:\w+:)?rPh\b.*?</(?:\w+:)?rPh>", re.S)
+_TEXT_RE = re.compile(rb"<(?:\w+:)?t(?:\s[^>]*)?>(.*?)</(?:\w+:)?t>", re.S)
+_ITEM_PREFIX_RE = re.compile(rb"<(\w+:)?si[\s>/]")
+_EMPTY_ITEM_RE = re.compile(rb"<(?:\w+:)?si\s*/>")
+_READ_BYTES = 64 * 1024
+
+# Сколько строк с начала листа читается по умолчанию
+SNIFF_ROWS = 10
+
+
+def _column_index(letters):
+    # "A" -> 0, "Z" -> 25, "AA" -> 26
+    index = 0
+    for letter in letters:
+        index = index * 26 + ord(letter) - 64
+    return index - 1
+
+
+def _item_text(item):
+    # Текст строки из <si>/<is>: простой <t> или набор <r><t> (фонетика <rPh> пропускается)
+    parts = []
+    for child in item:
+        if child.tag == _TEXT:
+            parts.append(child.text or "")
+        elif child.tag == _RUN:
+            text = child.find(_TEXT)
+            if text is not None:
+                parts.append(text.text or "")
+    return "".join(parts)
+
+
+def _shared_item_text(fragment):
+    # Текст содержимого <si> без фонетических подсказок <rPh>
+    if not fragment:
+        return ""
+    fragment = _PHONETIC_RE.sub(b"", fragment)
+    # Переводы строк нормализуются так же, как это делает XML-парсер
+    text = b"".join(_TEXT_RE.findall(fragment)).replace(b"\r\n", b"\n").replace(b"\r", b"\n")
+    return html.unescape(text.decode("utf-8"))
+
+
+def _number_text(value):
+    # Числа выводятся так же, как str() от значения openpyxl
+    try:
+        return str(int(value))
+    except ValueError:
+        try:
+            return str(float(value))
+        except ValueError:
+            return value
+
+
+class XlsxSniffer:
+    """
+    Чтение первых строк листов XLSX напрямую из zip-архива.
+
+    Книга не загружается: разбираются только xl/workbook.xml со связями,
+    начало XML нужных листов (разбор останавливается после последней
+    запрошенной строки) и начало sharedStrings.xml до последней строки,
+    на которую ссылаются прочитанные ячейки. Время не зависит от числа
+    строк в файле.
+    """
+
+    def __init__(self, source):
+        self.archive = zipfile.ZipFile(source)
+        try:
+            self._read_workbook()
+        except Exception:
+            self.archive.close()
+            raise
+
+    def _read_workbook(self):
+        rels = ET.fromstring(self.archive.read("xl/_rels/workbook.xml.rels"))
+        targets = {}
+        self.shared_strings_path = None
+        for rel in rels.iter(f"{_PACKAGE_REL}Relationship"):
+            target = rel.get("Target", "")
+            # Пути в связях указываются относительно xl/ или от корня архива
+            path = target.lstrip("/") if target.startswith("/") else posixpath.normpath(posixpath.join("xl", target))
+            targets[rel.get("Id")] = path
+            if rel.get("Type", "").endswith(_SHARED_STRINGS_TYPE):
+                self.shared_strings_path = path
+
+        workbook = ET.fromstring(self.archive.read("xl/workbook.xml"))
+        self.sheet_paths = {
+            sheet.get("name"): targets.get(sheet.get(f"{_REL}id"))
+            for sheet in workbook.iter(f"{_MAIN}sheet")
+        }
+        self.sheetnames = list(self.sheet_paths)
+
+    def _raw_rows(self, sheet_name, max_rows):
+        # Ячейки первых max_rows строк листа: {номер строки: {номер колонки: (тип, значение)}}
+        rows = {}
+        last_row = 0
+        with self.archive.open(self.sheet_paths[sheet_name]) as stream:
+            for _, elem in ET.iterparse(stream, events=("end",)):
+                if elem.tag != _ROW:
+                    continue
+                row_idx = int(elem.get("r") or last_row + 1)
+                if row_idx > max_rows:
+                    break
+                last_row = row_idx
+
+                cells = {}
+                for cell in elem.iter(_CELL):
+                    match = _CELL_REF_RE.match(cell.get("r") or "")
+                    col_idx = _column_index(match.group(1)) if match else len(cells)
+                    cell_type = cell.get("t", "n")
+                    if cell_type == "inlineStr":
+                        inline = cell.find(f"{_MAIN}is")
+                        value = _item_text(inline) if inline is not None else None
+                    else:
+                        value_elem = cell.find(_VALUE)
+                        value = value_elem.text if value_elem is not None else None
+                    if value is not None:
+                        cells[col_idx] = (cell_type, value)
+                rows[row_idx] = cells
+                elem.clear()
+        return rows
+
+    def _shared_strings(self, indices):
+        # Разбор останавливается на последнем нужном индексе
+        strings = {}
+        if not indices or self.shared_strings_path is None:
+            return strings
+        pending = sorted(indices, reverse=True)
+        index = 0
+        buffer = b""
+        close_tag = None
+        with self.archive.open(self.shared_strings_path) as stream:
+            while pending:
+                chunk = stream.read(_READ_BYTES)
+                if not chunk:
+                    break
+                buffer += chunk
+                if close_tag is None:
+                    # Префикс пространства имен известен только после начала первого <si>
+                    prefix = _ITEM_PREFIX_RE.search(buffer)
+                    if prefix is None:
+                        continue
+                    close_tag = b"</" + (prefix.group(1) or b"") + b"si>"
+
+                # Разбирается только часть буфера из целых элементов; незавершенный
+                # элемент остается в буфере до следующей порции
+                end = buffer.rfind(close_tag)
+                if end < 0:
+                    continue
+                end += len(close_tag)
+                complete = buffer[:end]
+                buffer = buffer[end:]
+
+                count = complete.count(close_tag)
+                if b"si/>" in complete:
+                    count += len(_EMPTY_ITEM_RE.findall(complete))
+                # Порции без нужных строк только подсчитываются, без регулярных выражений
+                if pending[-1] >= index + count:
+                    index += count
+                    continue
+                for match in _SHARED_ITEM_RE.finditer(complete):
+                    if index == pending[-1]:
+                        strings[index] = _shared_item_text(match.group(1))
+                        pending.pop()
+                        if not pending:
+                            break
+                    index += 1
+        return strings
+
+    def sheet_rows(self, sheet_names=None, max_rows=SNIFF_ROWS):
+        """
+        Читает первые строки листов
+
+        Args:
+            sheet_names: Листы для чтения (по умолчанию - все)
+            max_rows: Количество строк с начала листа
+
+        Returns:
+            dict: {имя листа: список строк}, строка - список строковых значений
+                (пустые ячейки - ""), пропущенные в XML строки - пустые списки
+        """
+        sheet_names = self.sheetnames if sheet_names is None else sheet_names
+        raw = {name: self._raw_rows(name, max_rows) for name in sheet_names}
+
+        shared_indices = {
+            int(value)
+            for rows in raw.values()
+            for cells in rows.values()
+            for cell_type, value in cells.values()
+            if cell_type == "s"
+        }
+        strings = self._shared_strings(shared_indices)
+
+        result = {}
+        for name, rows in raw.items():
+            n_rows = max(rows, default=0)
+            sheet_values = []
+            for row_idx in range(1, n_rows + 1):
+                cells = rows.get(row_idx, {})
+                values = [""] * (max(cells, default=-1) + 1)
+                for col_idx, (cell_type, value) in cells.items():
+                    if cell_type == "s":
+                        value = strings.get(int(value), "")
+                    elif cell_type == "n":
+                        value = _number_text(value)
+                    elif cell_type == "b":
+                        value = "True" if value == "1" else "False"
+                    values[col_idx] = value.strip()
+                sheet_values.append(values)
+            result[name] = sheet_values
+        return result
+
+    def close(self):
+        self.archive.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def sniff_sheet_rows(source, sheet_names=None, max_rows=SNIFF_ROWS):
+    """
+    Читает первые строки листов XLSX без загрузки книги
+
+    Args:
+        source: Путь к файлу или файловый объект
+        sheet_names: Листы для чтения (по умолчанию - все)
+        max_rows: Количество строк с начала листа
+
+    Returns:
+        dict: {имя листа: список строк (списки строковых значений)}
+    """
+    with XlsxSniffer(source) as sniffer:
+        return sniffer.sheet_rows(sheet_names, max_rows)